@@ -1,12 +1,81 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import asyncio
+import json
+import logging
+import math
+import os
 
 from chatbot import initialize_agent
+from response_cache import ResponseCache, normalize
+from scheduler import QueueFull, RunScheduler
+from tool_cache import ToolCache
+
+logger = logging.getLogger("Chatbot")
+
+# Build the agent in the background at start-up ("0": on the first request).
+AGENT_WARM_UP = os.getenv("AGENT_WARM_UP", "1") != "0"
+
+agent = {
+    "tool_cache": ToolCache(),
+    "responses": ResponseCache(),
+    "scheduler": RunScheduler(),
+}
+
+
+async def build_agent():
+    agent["executor"], agent["sessions"] = await initialize_agent(
+        tool_cache=agent["tool_cache"]
+    )
+
+
+def build_failed(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Could not build the agent: {task.exception()}")
+
+
+def start_agent():
+    """
+    Starts building the agent unless it is built or being built; a failed
+    build is started again. Returns the build task.
+    """
+    task = agent.get("build")
+    if task is None or (task.done() and "executor" not in agent):
+        task = agent["build"] = asyncio.create_task(build_agent())
+        task.add_done_callback(build_failed)
+    return task
+
 
-app = FastAPI()
+async def agent_ready():
+    """Waits until the agent is built; answers 503 if building it failed."""
+    if "executor" in agent:
+        return
+    try:
+        # Shielded, so a client hanging up does not cancel the build
+        await asyncio.shield(start_agent())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agent is unavailable: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The server accepts connections while the agent is still being built
+    if AGENT_WARM_UP:
+        start_agent()
+    yield
+    if "build" in agent:
+        agent["build"].cancel()
+    if "sessions" in agent:
+        await agent["sessions"].close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,32 +86,255 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Longest tool output forwarded to the browser in a progress event
+TOOL_RESULT_PREVIEW = 300
+
 
 class ChatRequest(BaseModel):
     message: str
+    # Omit to start a new session; the reply carries the id to send next time
+    session_id: str | None = None
+
+
+async def open_session(chat_request):
+    """Returns (session id, agent config) for a request, creating a session."""
+    await agent_ready()
+    sessions = agent["sessions"]
+    session_id = chat_request.session_id or sessions.new_id()
+    if not sessions.is_valid_id(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+    return session_id, await sessions.touch(session_id)
+
+
+async def cached_reply(user_message, config):
+    """
+    Returns the cached answer to `user_message`, or None. A cached answer is
+    still added to the session, so follow-up questions see it. Only for
+    sessions that pass can_cache().
+    """
+    reply = agent["responses"].get(user_message)
+    if reply is not None:
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        turn = [HumanMessage(content=user_message), AIMessage(content=reply)]
+        await agent["executor"].aupdate_state(
+            config, {"messages": turn}, as_node="agent"
+        )
+        await agent["sessions"].end_turn(agent["executor"], config)
+    return reply
+
 
+def admit(request):
+    """
+    Queues an agent run for the requesting client (by address). Answers 429
+    with the would-be queue position when the queue is already full.
+    """
+    try:
+        return agent["scheduler"].admit(request.client.host)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "message": "Too many requests are waiting, try again shortly",
+                "queue_position": e.position,
+                "retry_after": e.retry_after,
+            },
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
 
-agent_executor, config = initialize_agent()
+
+def rate_limited(e):
+    """Backs the scheduler off after an OpenAI 429; returns the pause (s)."""
+    retry_after = e.response.headers.get("retry-after")
+    try:
+        retry_after = float(retry_after) if retry_after else None
+    except ValueError:
+        retry_after = None
+    return agent["scheduler"].rate_limited(retry_after)
+
+
+async def can_cache(user_message, config):
+    """
+    Whether the answer may be cached, or come from the cache: a general
+    prompt in a new session. In an ongoing conversation even "yes" or "do
+    it" may answer the agent's last question (say, to confirm a swap).
+    """
+    if normalize(user_message) is None:
+        return False
+    state = await agent["executor"].aget_state(config)
+    return not state.values.get("messages")
 
 
 @app.post("/api/chat")
-async def chat_endpoint(chat_request: ChatRequest):
+async def chat_endpoint(chat_request: ChatRequest, request: Request):
     user_message = chat_request.message
+    session_id, config = await open_session(chat_request)
+    # Loaded with the agent, so only imported once the agent is ready
+    from langchain_core.messages import ToolMessage
+    from openai import RateLimitError
 
-    # Run agent for the input message and collect output
+    cacheable = await can_cache(user_message, config)
+    if cacheable:
+        reply = await cached_reply(user_message, config)
+        if reply is not None:
+            return {"reply": reply, "session_id": session_id, "cached": True}
+
+    # Wait for a free agent slot, then run agent and collect output
+    ticket = admit(request)
     responses = []
-    async for event in agent_executor.astream(
-        {"messages": [{"role": "user", "content": user_message}]},
-        config,
-        stream_mode="values",
-    ):
-        # Assuming last message is agent response
-        last_msg = event["messages"][-1].content
-        responses.append(last_msg)
+    try:
+        await ticket.wait()
+        async for event in agent["executor"].astream(
+            {"messages": [{"role": "user", "content": user_message}]},
+            config,
+            stream_mode="values",
+        ):
+            # Assuming last message is agent response
+            last_msg = event["messages"][-1]
+            responses.append(last_msg.content)
+            # Answers built from tool output are specific to this moment
+            cacheable = cacheable and not isinstance(last_msg, ToolMessage)
+        agent["scheduler"].succeeded()
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail="No agent slot became free")
+    except RateLimitError as e:
+        delay = rate_limited(e)
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "OpenAI rate limit reached", "retry_after": delay},
+            headers={"Retry-After": str(math.ceil(delay))},
+        )
+    finally:
+        ticket.release()
 
     # Return concatenated or last response
     reply = responses[-1] if responses else "No response"
-    return {"reply": reply}
+    if cacheable:
+        agent["responses"].put(user_message, reply)
+    await agent["sessions"].end_turn(agent["executor"], config)
+    return {"reply": reply, "session_id": session_id, "cached": False}
+
+
+@app.get("/api/ready")
+async def ready_endpoint():
+    """Readiness probe: 200 once the agent is built, 503 until then."""
+    if "executor" not in agent:
+        # Also starts the build without AGENT_WARM_UP (or after a failed one)
+        start_agent()
+        raise HTTPException(status_code=503, detail="Agent is starting")
+    return {"ready": True}
+
+
+@app.get("/api/metrics")
+async def metrics_endpoint():
+    compactor = agent["sessions"].compactor if "sessions" in agent else None
+    executor = agent.get("executor")
+    return {
+        "compaction": compactor.stats if compactor else None,
+        "tool_routing": executor.stats if executor else None,
+        "model_routing": executor.model_stats() if executor else None,
+        "tool_cache": agent["tool_cache"].stats(),
+        "response_cache": agent["responses"].stats(),
+        "scheduler": agent["scheduler"].stats(),
+    }
+
+
+def sse(event):
+    """Formats one event as a server-sent events frame."""
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def cached_events(session_id, reply):
+    yield sse({"type": "session", "session_id": session_id})
+    yield sse({"type": "token", "content": reply})
+    yield sse({"type": "done", "cached": True})
+
+
+async def stream_events(user_message, session_id, config, ticket, cacheable):
+    """
+    Runs the agent with stream_mode="messages" and yields SSE frames as they
+    are produced:
+
+    - {"type": "session", "session_id": ...} first, for the client to reuse
+    - {"type": "queued", "position": ...} while waiting for an agent slot
+    - {"type": "token", "content": ...} for every LLM token of the answer
+    - {"type": "tool_call", "name": ...} when the model decides to call a tool
+    - {"type": "tool_result", "name": ..., "content": ...} when a tool returns
+    - {"type": "done", "cached": false} or {"type": "error", "message": ...}
+      at the end
+    """
+    from langchain_core.messages import AIMessageChunk, ToolMessage
+    from openai import RateLimitError
+
+    yield sse({"type": "session", "session_id": session_id})
+    try:
+        async for position in ticket.positions():
+            yield sse({"type": "queued", "position": position})
+
+        tokens = []
+        async for chunk, metadata in agent["executor"].astream(
+            {"messages": [{"role": "user", "content": user_message}]},
+            config,
+            stream_mode="messages",
+        ):
+            if isinstance(chunk, AIMessageChunk):
+                # Tool call arguments arrive in pieces; the name only in the first
+                for call in chunk.tool_call_chunks:
+                    if call.get("name"):
+                        cacheable = False
+                        yield sse({"type": "tool_call", "name": call["name"]})
+                if chunk.content:
+                    tokens.append(chunk.content)
+                    yield sse({"type": "token", "content": chunk.content})
+            elif isinstance(chunk, ToolMessage):
+                yield sse(
+                    {
+                        "type": "tool_result",
+                        "name": chunk.name,
+                        "content": str(chunk.content)[:TOOL_RESULT_PREVIEW],
+                    }
+                )
+        agent["scheduler"].succeeded()
+        if cacheable:
+            agent["responses"].put(user_message, "".join(tokens))
+        await agent["sessions"].end_turn(agent["executor"], config)
+        yield sse({"type": "done", "cached": False})
+    except TimeoutError:
+        yield sse({"type": "error", "message": "No agent slot became free"})
+    except RateLimitError as e:
+        delay = rate_limited(e)
+        message = "OpenAI rate limit reached"
+        yield sse({"type": "error", "message": message, "retry_after": delay})
+    except Exception as e:
+        yield sse({"type": "error", "message": str(e)})
+    finally:
+        ticket.release()
+
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(chat_request: ChatRequest, request: Request):
+    session_id, config = await open_session(chat_request)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    cacheable = await can_cache(chat_request.message, config)
+    if cacheable:
+        reply = await cached_reply(chat_request.message, config)
+        if reply is not None:
+            return StreamingResponse(
+                cached_events(session_id, reply),
+                media_type="text/event-stream",
+                headers=headers,
+            )
+
+    # A full queue is refused here, with a 429 status, before streaming
+    ticket = admit(request)
+    return StreamingResponse(
+        stream_events(chat_request.message, session_id, config, ticket, cacheable),
+        media_type="text/event-stream",
+        headers=headers,
+        # Also frees the slot if the client left before the stream started
+        background=BackgroundTask(ticket.release),
+    )
 
 
 # Mount the frontend directory after defining all routes
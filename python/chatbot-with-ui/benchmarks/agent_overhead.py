@@ -0,0 +1,281 @@
+"""
+agent_overhead.py - Agent overhead per turn, memory over long sessions and
+/api/chat throughput, without OpenAI
+
+Runs the chat agent (chatbot.py, shared with langchain-chatbot) with
+ChatOpenAI swapped for a scripted local model that answers instantly, and
+the BNB Chain toolkit pointed at local dev chains. What is measured is
+everything around the model: the LangGraph ReAct loop, tool dispatch and
+RPC, checkpointing and session upkeep. Prints one JSON report:
+
+- turn_ms:  mean/p50/p95 per turn, for chat turns (one model call) and tool
+            turns (get_balance of a new account: two model calls, one RPC)
+- memory:   Python heap (tracemalloc), peak RSS and session database size
+            every --sample-every turns of one --turns long session
+- api_chat: requests/s and latency of POST /api/chat with --concurrency
+            clients, each continuing a session of its own
+
+Local chains (the toolkit checks for the BSC and opBNB chain ids):
+    anvil --chain-id 56 --port 8545
+    anvil --chain-id 204 --port 8546
+
+Usage (from the project directory):
+    python benchmarks/agent_overhead.py [--bsc-url http://127.0.0.1:8545] \\
+        [--opbnb-url http://127.0.0.1:8546] [--turns 1000] [--samples 200] \\
+        [--requests 500] [--concurrency 16] [--llm-latency 0] \\
+        [--output report.json]
+
+--llm-latency adds a fixed delay (seconds) to every model call, to see the
+overhead next to realistic model times.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# First anvil dev account; its key is public
+DEV_PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+CHAT_PROMPT = "Hello, what can you do?"
+TOOL_PROMPT = "What is the balance of {account}?"
+
+
+def scripted_llm(latency):
+    """A ChatOpenAI stand-in that calls get_balance when asked for a balance."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    def reply(messages):
+        last = messages[-1]
+        text = str(last.content)
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Here is what I found: {text[:80]}")
+        if "running summary" in text:
+            # History compaction asking for a summary
+            return AIMessage(content="The user greeted and asked for balances.")
+        if text.startswith("What is the balance of "):
+            account = text.removeprefix("What is the balance of ").rstrip("?")
+            call = {
+                "name": "get_balance",
+                "args": {"account": account},
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+            }
+            return AIMessage(content="", tool_calls=[call])
+        return AIMessage(content="I can check balances, send BNB, swap and more.")
+
+    class ScriptedChatModel(BaseChatModel):
+        model_name: str = "scripted"
+
+        @property
+        def _llm_type(self):
+            return "scripted"
+
+        def bind_tools(self, tools, **kwargs):
+            return self  # the script knows which tool to call
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(latency)
+            return ChatResult(generations=[ChatGeneration(message=reply(messages))])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(latency)
+            return ChatResult(generations=[ChatGeneration(message=reply(messages))])
+
+    return lambda model=None, **kwargs: ScriptedChatModel(model_name=model or "")
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "n": len(values),
+        "mean": round(statistics.mean(values), 2),
+        "p50": round(values[len(values) // 2], 2),
+        "p95": round(values[min(int(len(values) * 0.95), len(values) - 1)], 2),
+    }
+
+
+def prompt(turn):
+    """Even turns chat, odd turns look up the balance of a new account."""
+    if turn % 2 == 0:
+        return "chat", CHAT_PROMPT
+    # A new account every time, so the tool cache never answers
+    return "tool", TOOL_PROMPT.format(account="0x" + uuid.uuid4().hex[:40].zfill(40))
+
+
+async def run_turn(agent_executor, sessions, session_id, text):
+    """One turn as chatbot.py runs it; returns its duration in ms."""
+    from langchain_core.messages import HumanMessage
+
+    started = time.perf_counter()
+    config = await sessions.touch(session_id)
+    await agent_executor.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+    await sessions.end_turn(agent_executor, config)
+    return (time.perf_counter() - started) * 1000
+
+
+async def turn_overhead(agent_executor, sessions, samples, session_turns=20):
+    """Turn latency by kind, over sessions of `session_turns` turns."""
+    latencies = {"chat": [], "tool": []}
+    session_id = None
+    for turn in range(samples):
+        if turn % session_turns == 0:
+            session_id = sessions.new_id()
+        kind, text = prompt(turn)
+        latencies[kind].append(
+            await run_turn(agent_executor, sessions, session_id, text)
+        )
+    return {kind: summarize(values) for kind, values in latencies.items()}
+
+
+async def memory_growth(agent_executor, sessions, turns, sample_every, db_path):
+    """Heap, RSS and database size along one session of `turns` turns."""
+    session_id = sessions.new_id()
+    tracemalloc.start()
+    samples = []
+    window = []
+    for turn in range(1, turns + 1):
+        window.append(
+            await run_turn(agent_executor, sessions, session_id, prompt(turn)[1])
+        )
+        if turn % sample_every == 0:
+            heap, _ = tracemalloc.get_traced_memory()
+            samples.append(
+                {
+                    "turn": turn,
+                    "heap_mb": round(heap / 2**20, 2),
+                    "max_rss_mb": round(
+                        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+                    ),
+                    "db_mb": round(os.path.getsize(db_path) / 2**20, 2),
+                    # Slower than turn_ms: tracemalloc is on
+                    "turn_ms_mean": round(statistics.mean(window), 2),
+                }
+            )
+            window = []
+    tracemalloc.stop()
+    return samples
+
+
+def load_api():
+    spec = importlib.util.spec_from_file_location(
+        "api_wrapper", os.path.join(PROJECT_DIR, "api-wrapper.py")
+    )
+    api = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(api)
+    return api
+
+
+async def api_throughput(requests, concurrency):
+    """Requests/s of POST /api/chat, served in-process."""
+    import httpx
+
+    api = load_api()
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app):
+        await api.agent_ready()
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=120
+        ) as client:
+            latencies = []
+            statuses = {}
+            remaining = iter(range(requests))
+
+            async def session():
+                session_id = None
+                for turn in remaining:
+                    body = {"message": prompt(turn)[1], "session_id": session_id}
+                    started = time.perf_counter()
+                    response = await client.post("/api/chat", json=body)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses[response.status_code] = (
+                        statuses.get(response.status_code, 0) + 1
+                    )
+                    if response.status_code == 200:
+                        session_id = response.json()["session_id"]
+
+            started = time.perf_counter()
+            await asyncio.gather(*(session() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_s": round(requests / elapsed, 1),
+        "latency_ms": summarize(latencies),
+        "statuses": statuses,
+    }
+
+
+async def run(args, db_path):
+    from chatbot import initialize_agent
+
+    agent_executor, sessions = await initialize_agent()
+    try:
+        # Warm up imports, compiled agents and the tool cache's block number
+        await turn_overhead(agent_executor, sessions, 10)
+        report = {
+            "llm_latency_s": args.llm_latency,
+            "turn_ms": await turn_overhead(agent_executor, sessions, args.samples),
+            "memory": await memory_growth(
+                agent_executor, sessions, args.turns, args.sample_every, db_path
+            ),
+        }
+    finally:
+        await sessions.close()
+    report["api_chat"] = await api_throughput(args.requests, args.concurrency)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--bsc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--opbnb-url", default="http://127.0.0.1:8546")
+    parser.add_argument("--samples", type=int, default=200, help="turns timed")
+    parser.add_argument("--turns", type=int, default=1000, help="long session")
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="agent-overhead-")
+    db_path = os.path.join(tmp, "sessions.sqlite")
+    os.environ.update(
+        PRIVATE_KEY=os.getenv("PRIVATE_KEY") or DEV_PRIVATE_KEY,
+        BSC_PROVIDER_URL=args.bsc_url,
+        OPBNB_PROVIDER_URL=args.opbnb_url,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "unused",
+        SESSION_DB_PATH=db_path,
+        # Every in-process request comes from the same client address
+        MAX_QUEUED_PER_CLIENT=str(args.concurrency),
+        MAX_QUEUED_RUNS=str(max(args.concurrency, 64)),
+        # Time the agent, not answers replayed from the response cache
+        RESPONSE_CACHE_SIZE="0",
+    )
+    # api-wrapper serves frontend/ relative to the working directory
+    os.chdir(PROJECT_DIR)
+    sys.path.insert(0, PROJECT_DIR)
+
+    import langchain_openai
+
+    langchain_openai.ChatOpenAI = scripted_llm(args.llm_latency)
+
+    report = asyncio.run(run(args, db_path))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+cold_start.py - Import time and time to first answer of the chat server
+
+Starts the server (uvicorn api-wrapper:app) from scratch --runs times and
+reports, in seconds since the process was spawned:
+
+- import_s:         importing api-wrapper alone (in a fresh interpreter)
+- listening_s:      the server answers HTTP (GET /api/ready, any status)
+- ready_s:          GET /api/ready answers 200 (the agent is built)
+- first_response_s: the first POST /api/chat returns
+
+Each run uses a fresh session database. The agent talks to the real OpenAI
+API and RPC endpoints, so .env must be set up as for the server.
+
+Usage (from the project directory):
+    python benchmarks/cold_start.py [--runs 5] [--port 8765] \\
+        [--message "What is BNB Chain?"] [--no-warm-up] [--json]
+
+With --no-warm-up the agent is built on the first request (AGENT_WARM_UP=0),
+so ready_s is only reached through the first request.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+IMPORT_SNIPPET = (
+    "import importlib, time\n"
+    "started = time.perf_counter()\n"
+    "importlib.import_module('api-wrapper')\n"
+    "print(time.perf_counter() - started)\n"
+)
+
+
+def import_time(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=PROJECT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def wait_for(url, started, ok, timeout):
+    """Polls `url` until ok(response); returns seconds since `started`."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if ok(httpx.get(url, timeout=1)):
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not ready within {timeout}s")
+
+
+def cold_start(port, message, env, timeout):
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api-wrapper:app", "--port", str(port)],
+        cwd=PROJECT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        result = {
+            "listening_s": wait_for(f"{base}/api/ready", started, bool, timeout)
+        }
+        if env.get("AGENT_WARM_UP") != "0":
+            result["ready_s"] = wait_for(
+                f"{base}/api/ready", started, lambda r: r.status_code == 200, timeout
+            )
+        response = httpx.post(
+            f"{base}/api/chat", json={"message": message}, timeout=timeout
+        )
+        response.raise_for_status()
+        result["first_response_s"] = time.perf_counter() - started
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--message", default="What is BNB Chain?")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--no-warm-up", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            env = dict(
+                os.environ,
+                SESSION_DB_PATH=os.path.join(tmp, f"sessions-{i}.sqlite"),
+                AGENT_WARM_UP="0" if args.no_warm_up else "1",
+            )
+            run = {"import_s": import_time(env)}
+            run.update(cold_start(args.port, args.message, env, args.timeout))
+            runs.append(run)
+            if not args.json:
+                timings = ", ".join(f"{k}={v:.3f}" for k, v in run.items())
+                print(f"run {i + 1}: {timings}")
+
+    keys = runs[0].keys()
+    report = {
+        "runs": args.runs,
+        "warm_up": not args.no_warm_up,
+        "median": {k: round(statistics.median(r[k] for r in runs), 3) for k in keys},
+        "max": {k: round(max(r[k] for r in runs), 3) for k in keys},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
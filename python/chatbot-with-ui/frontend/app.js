@@ -1,6 +1,9 @@
 const { useState, useRef, useEffect } = React;
 
-function ChatMessage({ message, isUser }) {
+function ChatMessage({ message, isUser, tools = [], status }) {
+  // Streaming reply that has not produced anything yet
+  if (!isUser && !message && tools.length === 0 && !status) return null;
+
   const formattedMessage = !isUser ? marked.parse(message) : message;
 
   return (
@@ -52,6 +55,18 @@ function ChatMessage({ message, isUser }) {
               : "bg-[#1C1C1C] border border-[#2A2A2A] text-white"
           }`}
         >
+          {status && !message && (
+            <div className="text-xs text-gray-400">{status}</div>
+          )}
+          {tools.length > 0 && (
+            <ul className="text-xs text-gray-400 mb-2 space-y-1">
+              {tools.map((tool, index) => (
+                <li key={index}>
+                  {tool.done ? "✓" : "…"} <code>{tool.name}</code>
+                </li>
+              ))}
+            </ul>
+          )}
           {isUser ? (
             <div className="prose prose-invert max-w-none">{message}</div>
           ) : (
@@ -94,26 +109,88 @@ function ChatInterface() {
     setMessages((prev) => [...prev, { text: userMessage, isUser: true }]);
     setIsLoading(true);
 
+    // Placeholder bot message that is filled in as events arrive
+    setMessages((prev) => [...prev, { text: "", isUser: false, tools: [] }]);
+    const updateReply = (update) =>
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, ...update(last) }];
+      });
+
+    const handleEvent = (event) => {
+      if (event.type === "session") {
+        // Later messages in this tab continue the same conversation
+        sessionStorage.setItem("sessionId", event.session_id);
+      } else if (event.type === "queued") {
+        updateReply(() => ({
+          status: `Waiting for a free agent (position ${event.position})…`,
+        }));
+      } else if (event.type === "token") {
+        updateReply((last) => ({ text: last.text + event.content, status: null }));
+      } else if (event.type === "tool_call") {
+        updateReply((last) => ({
+          tools: [...last.tools, { name: event.name, done: false }],
+        }));
+      } else if (event.type === "tool_result") {
+        updateReply((last) => {
+          const tools = [...last.tools];
+          const index = tools.findIndex((t) => t.name === event.name && !t.done);
+          if (index !== -1) tools[index] = { ...tools[index], done: true };
+          return { tools };
+        });
+      } else if (event.type === "error") {
+        throw new Error(event.message);
+      }
+    };
+
     try {
-      const response = await fetch("/api/chat", {
+      const response = await fetch("/api/chat/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ message: userMessage }),
+        body: JSON.stringify({
+          message: userMessage,
+          session_id: sessionStorage.getItem("sessionId"),
+        }),
       });
 
-      const data = await response.json();
-      setMessages((prev) => [...prev, { text: data.reply, isUser: false }]);
+      if (response.status === 429) {
+        const { detail } = await response.json();
+        updateReply(() => ({
+          text: `The chatbot is busy right now. Please try again in ${Math.ceil(
+            detail.retry_after
+          )} seconds.`,
+        }));
+        return;
+      }
+
+      if (response.status === 503) {
+        updateReply(() => ({
+          text: "The chatbot is still starting up. Please try again in a few seconds.",
+        }));
+        return;
+      }
+
+      // Server-sent events over a POST response: "data: {...}\n\n" frames
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        for (const frame of frames) {
+          if (frame.startsWith("data: ")) handleEvent(JSON.parse(frame.slice(6)));
+        }
+      }
     } catch (error) {
       console.error("Error:", error);
-      setMessages((prev) => [
-        ...prev,
-        {
-          text: "Sorry, there was an error processing your request.",
-          isUser: false,
-        },
-      ]);
+      updateReply(() => ({
+        text: "Sorry, there was an error processing your request.",
+      }));
     } finally {
       setIsLoading(false);
     }
@@ -158,10 +235,15 @@ function ChatInterface() {
                 key={index}
                 message={message.text}
                 isUser={message.isUser}
+                tools={message.tools}
+                status={message.status}
               />
             ))
           )}
-          {isLoading && (
+          {isLoading &&
+            !messages[messages.length - 1]?.text &&
+            !messages[messages.length - 1]?.status &&
+            !messages[messages.length - 1]?.tools?.length && (
             <div className="flex justify-start mb-6">
               <div className="flex items-start space-x-3">
                 <div className="w-8 h-8 rounded-full bg-[#1C1C1C] border border-[#F3BA2F] flex items-center justify-center">
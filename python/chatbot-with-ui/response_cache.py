@@ -0,0 +1,143 @@
+"""
+Response cache in front of the chat agent for FAQ-style questions.
+
+Questions such as "what is BNB Chain" get the same answer every time, yet
+each one costs a full ReAct run. Answers are cached by normalized prompt
+text (case, punctuation and spacing ignored) in a size-bounded LRU, with
+an optional JSON file so the cache survives restarts.
+
+Only general-knowledge answers are cached:
+
+- Prompts about the user's wallet, addresses or live data (balances,
+  prices, gas, transactions) bypass the cache entirely.
+- An answer is stored only if the agent used no tools to produce it, so
+  transfers, swaps and other on-chain actions are never replayed. It must
+  also come from a session without earlier history, so it does not depend
+  on the conversation it came from.
+- Likewise, cached answers are only served to sessions without history: in
+  an ongoing conversation "yes" may be the confirmation of a swap.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("Chatbot")
+
+# Most cached answers; the least recently used are dropped first.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+# Seconds a cached answer is served (answers about the chain can go stale).
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 24 * 60 * 60))
+# Optional JSON file to persist the cache across restarts.
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+# Longest prompt (characters) considered for caching.
+RESPONSE_CACHE_MAX_PROMPT = int(os.getenv("RESPONSE_CACHE_MAX_PROMPT", 300))
+
+# Prompts about the user's wallet, specific addresses, or live chain and
+# market data; their answers change from user to user or minute to minute.
+STATEFUL_PROMPT = re.compile(
+    r"0x[0-9a-f]+|\b("
+    r"my|mine|our|wallet|account|address|balance|balances|price|prices|gas|"
+    r"fee|fees|tx|transaction|transactions|receipt|pending|recent|latest|"
+    r"current|now|today"
+    r")\b"
+)
+
+
+def normalize(prompt):
+    """Cache key of a prompt, or None when it must not be cached."""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = " ".join(re.sub(r"[^\w\s]", " ", text).split())
+    if not text or len(text) > RESPONSE_CACHE_MAX_PROMPT:
+        return None
+    if STATEFUL_PROMPT.search(text):
+        return None
+    return text
+
+
+class ResponseCache:
+    """Normalized prompt -> agent reply, LRU-bounded and optionally on disk."""
+
+    def __init__(
+        self,
+        max_size=RESPONSE_CACHE_SIZE,
+        ttl=RESPONSE_CACHE_TTL,
+        path=RESPONSE_CACHE_PATH,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (reply, unix time cached at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable response cache {self.path}: {e}")
+            return
+        now = time.time()
+        for key, (reply, cached_at) in entries.items():
+            if now - cached_at <= self.ttl:
+                self._entries[key] = (reply, cached_at)
+        logger.info(f"Loaded {len(self._entries)} cached responses from {self.path}")
+
+    def _save(self):
+        if not self.path:
+            return
+        # Write to a temporary file first so a crash never leaves half a file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, prompt):
+        """Returns the cached reply for `prompt`, or None."""
+        key = normalize(prompt)
+        with self._lock:
+            if key is None:
+                self.bypassed += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, prompt, reply):
+        key = normalize(prompt)
+        if key is None or not reply:
+            return
+        with self._lock:
+            self._entries[key] = (reply, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Could not persist response cache: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+        }
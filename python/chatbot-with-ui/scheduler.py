@@ -0,0 +1,226 @@
+"""
+Admission control for agent runs.
+
+Every agent run makes several OpenAI calls, so running an unbounded number
+at once only trips rate limits and slows every request down together. The
+scheduler lets MAX_CONCURRENT_RUNS runs proceed and queues the rest:
+
+- Queued runs are granted round-robin across clients, so one busy client
+  cannot starve the others.
+- The queue holds at most MAX_QUEUED_RUNS runs (MAX_QUEUED_PER_CLIENT per
+  client); requests beyond that are rejected at once with their would-be
+  queue position, so clients can back off instead of piling up.
+- After an OpenAI rate-limit error no new runs start until the backoff
+  (Retry-After, or exponential from RATE_LIMIT_BACKOFF) has passed.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger("Chatbot")
+
+# Agent runs allowed at the same time.
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", 8))
+# Runs allowed to wait for a slot; more are rejected with 429.
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", 64))
+# Runs one client may have waiting at once.
+MAX_QUEUED_PER_CLIENT = int(os.getenv("MAX_QUEUED_PER_CLIENT", 4))
+# Seconds a run may wait for a slot before giving up with 503.
+RUN_QUEUE_TIMEOUT = float(os.getenv("RUN_QUEUE_TIMEOUT", 60))
+# First pause (seconds) after a rate-limit error; doubled on each repeat.
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", 2))
+RATE_LIMIT_MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", 60))
+
+# Wait times kept for the metrics percentiles.
+WAIT_SAMPLES = 1000
+
+
+class QueueFull(Exception):
+    """Raised when a run cannot even be queued."""
+
+    def __init__(self, position, retry_after):
+        super().__init__(f"Queue is full (would be number {position} in line)")
+        self.position = position
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One agent run's place in the scheduler."""
+
+    def __init__(self, scheduler, client):
+        self.scheduler = scheduler
+        self.client = client
+        self.granted = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+        self.released = False
+
+    def position(self):
+        """Place in line (1 = next to run, 0 = running)."""
+        return self.scheduler.position(self)
+
+    async def wait(self, timeout=RUN_QUEUE_TIMEOUT):
+        """Waits for a slot; raises TimeoutError after `timeout` seconds."""
+        async for _ in self.positions(timeout):
+            pass
+
+    async def positions(self, timeout=RUN_QUEUE_TIMEOUT, interval=1):
+        """
+        Waits for a slot like wait(), yielding the place in line whenever it
+        changes (checked every `interval` seconds) in the meantime.
+        """
+        deadline = time.monotonic() + timeout
+        last = None
+        try:
+            while not self.granted.done():
+                position = self.position()
+                if position != last:
+                    last = position
+                    yield position
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.scheduler.counts["timed_out"] += 1
+                    raise TimeoutError(f"No free agent slot within {timeout}s")
+                await asyncio.wait([self.granted], timeout=min(interval, remaining))
+        except BaseException:
+            # Timed out, or the client went away while waiting
+            self.release()
+            raise
+        self.scheduler.record_wait(time.monotonic() - self.queued_at)
+
+    def release(self):
+        """Frees the slot (or the queue place) of this run; idempotent."""
+        if not self.released:
+            self.released = True
+            self.scheduler.release(self)
+
+
+class RunScheduler:
+    """Concurrency limit with fair per-client queues and rate-limit backoff."""
+
+    def __init__(
+        self,
+        max_running=MAX_CONCURRENT_RUNS,
+        max_queued=MAX_QUEUED_RUNS,
+        max_queued_per_client=MAX_QUEUED_PER_CLIENT,
+    ):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.running = 0
+        self._queues = OrderedDict()  # client -> deque of tickets, in turn order
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        self._resume = None
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.counts = {"admitted": 0, "rejected": 0, "timed_out": 0, "rate_limited": 0}
+
+    @property
+    def queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def admit(self, client):
+        """
+        Returns a Ticket for a new run of `client`; await ticket.wait() before
+        running and call ticket.release() afterwards. Raises QueueFull.
+        """
+        queued = len(self._queues.get(client, ()))
+        if self.queued >= self.max_queued or queued >= self.max_queued_per_client:
+            self.counts["rejected"] += 1
+            raise QueueFull(self.queued + 1, self.retry_after())
+
+        ticket = Ticket(self, client)
+        self.counts["admitted"] += 1
+        self._queues.setdefault(client, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket):
+        if ticket.granted.done():
+            return 0
+        queue = self._queues.get(ticket.client, ())
+        if ticket not in queue:
+            return 0
+        # Round-robin: each waiting client gets up to index + 1 turns before it
+        index = queue.index(ticket)
+        return sum(min(len(q), index + 1) for q in self._queues.values())
+
+    def release(self, ticket):
+        queue = self._queues.get(ticket.client)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.client]
+        elif ticket.granted.done():
+            self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        if time.monotonic() < self._paused_until:
+            return
+        while self.running < self.max_running and self._queues:
+            client, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # The client goes to the back of the line for its next run
+            del self._queues[client]
+            if queue:
+                self._queues[client] = queue
+            self.running += 1
+            ticket.granted.set_result(True)
+
+    def rate_limited(self, retry_after=None):
+        """
+        Pauses new runs after an OpenAI rate-limit error, for `retry_after`
+        seconds if the API said so, or exponentially longer on each repeat.
+        """
+        self._backoff = min(
+            max(self._backoff * 2, RATE_LIMIT_BACKOFF), RATE_LIMIT_MAX_BACKOFF
+        )
+        delay = retry_after if retry_after is not None else self._backoff
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.counts["rate_limited"] += 1
+        logger.warning(f"OpenAI rate limit hit; pausing new agent runs for {delay}s")
+        if self._resume is not None:
+            self._resume.cancel()
+        self._resume = asyncio.get_running_loop().call_later(
+            self._paused_until - time.monotonic(), self._dispatch
+        )
+        return delay
+
+    def succeeded(self):
+        """Resets the rate-limit backoff after a run that went through."""
+        self._backoff = 0.0
+
+    def retry_after(self):
+        """Rough seconds until a new request would get a slot."""
+        paused = max(self._paused_until - time.monotonic(), 0)
+        wait = self.wait_stats()["p50_s"] or 1
+        return round(paused + wait * (self.queued / max(self.max_running, 1) + 1), 1)
+
+    def record_wait(self, seconds):
+        self._waits.append(seconds)
+
+    def wait_stats(self):
+        waits = sorted(self._waits)
+        if not waits:
+            return {"samples": 0, "avg_s": None, "p50_s": None, "p95_s": None}
+        return {
+            "samples": len(waits),
+            "avg_s": round(sum(waits) / len(waits), 3),
+            "p50_s": round(waits[len(waits) // 2], 3),
+            "p95_s": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 3),
+        }
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "max_running": self.max_running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "clients_waiting": len(self._queues),
+            "paused_for_s": round(max(self._paused_until - time.monotonic(), 0), 1),
+            "wait": self.wait_stats(),
+            **self.counts,
+        }
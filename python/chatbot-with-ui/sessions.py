@@ -0,0 +1,159 @@
+"""
+Per-client chat sessions on a disk-backed checkpointer.
+
+Each session is a LangGraph thread in a SQLite database, so conversation
+state lives on disk instead of in process memory. Sessions are evicted
+least-recently-used first once there are more than MAX_SESSIONS of them,
+and after SESSION_IDLE_TIMEOUT seconds without a message. Every session is
+also capped at MAX_SESSION_MESSAGES messages: older turns are dropped so the
+prompt sent to the model on each turn stays bounded. With a compactor, long
+histories are summarized before the cap applies (see compaction.py).
+"""
+
+import logging
+import os
+import re
+import time
+import uuid
+
+import aiosqlite
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+logger = logging.getLogger("Chatbot")
+
+# SQLite file holding every session's checkpoints.
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite")
+# Most sessions kept on disk; the least recently used are evicted first.
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 1000))
+# Seconds without a message before a session is evicted.
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", 24 * 60 * 60))
+# Most messages (including tool calls and results) kept per session.
+MAX_SESSION_MESSAGES = int(os.getenv("MAX_SESSION_MESSAGES", 40))
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionStore:
+    """Session ids mapped to checkpointer threads, with LRU eviction."""
+
+    def __init__(
+        self,
+        checkpointer,
+        max_sessions=MAX_SESSIONS,
+        idle_timeout=SESSION_IDLE_TIMEOUT,
+        max_messages=MAX_SESSION_MESSAGES,
+        compactor=None,
+    ):
+        self.checkpointer = checkpointer
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.compactor = compactor
+
+    @classmethod
+    async def open(cls, path=SESSION_DB_PATH, **kwargs):
+        """Opens (or creates) the session database at `path`."""
+        checkpointer = AsyncSqliteSaver(await aiosqlite.connect(path))
+        await checkpointer.setup()
+        store = cls(checkpointer, **kwargs)
+        await store._execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(thread_id TEXT PRIMARY KEY, last_used REAL NOT NULL)"
+        )
+        await store._execute(
+            "CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)"
+        )
+        return store
+
+    async def close(self):
+        await self.checkpointer.conn.close()
+
+    async def _execute(self, query, params=()):
+        # Shares the checkpointer's connection, so it also shares its lock
+        async with self.checkpointer.lock, self.checkpointer.conn.cursor() as cur:
+            await cur.execute(query, params)
+            rows = await cur.fetchall()
+            await self.checkpointer.conn.commit()
+            return rows
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_valid_id(session_id):
+        return bool(SESSION_ID_PATTERN.match(session_id or ""))
+
+    async def touch(self, session_id):
+        """
+        Marks a session as used and returns its agent config. Sessions over
+        the LRU limit or idle for too long are evicted on the way.
+        """
+        now = time.time()
+        await self._execute(
+            "INSERT INTO sessions (thread_id, last_used) VALUES (?, ?) "
+            "ON CONFLICT (thread_id) DO UPDATE SET last_used = excluded.last_used",
+            (session_id, now),
+        )
+        await self.evict(now)
+        return {"configurable": {"thread_id": session_id}}
+
+    async def evict(self, now=None):
+        """Deletes idle sessions and the least recently used over the limit."""
+        now = time.time() if now is None else now
+        rows = await self._execute(
+            "SELECT thread_id FROM sessions WHERE last_used < ? "
+            "UNION SELECT thread_id FROM ("
+            "SELECT thread_id FROM sessions ORDER BY last_used DESC "
+            "LIMIT -1 OFFSET ?)",
+            (now - self.idle_timeout, self.max_sessions),
+        )
+        for (thread_id,) in rows:
+            await self.checkpointer.adelete_thread(thread_id)
+            await self._execute(
+                "DELETE FROM sessions WHERE thread_id = ?", (thread_id,)
+            )
+        if rows:
+            logger.info(f"Evicted {len(rows)} chat session(s)")
+        return len(rows)
+
+    async def end_turn(self, agent_executor, config):
+        """
+        Compacts and trims a session after a turn. Returns the tokens the
+        next turn saves thanks to compaction (0 without a compactor).
+        """
+        saved = 0
+        if self.compactor is not None:
+            saved = await self.compactor.compact(agent_executor, config)
+        await self.trim(agent_executor, config)
+        return saved
+
+    async def trim(self, agent_executor, config):
+        """
+        Drops the oldest messages of a session beyond `max_messages`. The
+        kept history always starts at a user message, so a tool result is
+        never separated from the tool call that produced it. System messages
+        (the rolling summary) are kept. When the latest turn alone is over the
+        cap, it is kept whole and every earlier turn is dropped.
+        """
+        state = await agent_executor.aget_state(config)
+        messages = state.values.get("messages", [])
+        if len(messages) <= self.max_messages:
+            return 0
+        cap = len(messages) - self.max_messages
+        start = cap
+        while start < len(messages) and not isinstance(messages[start], HumanMessage):
+            start += 1
+        if start == len(messages):
+            # No user message within the cap: cut at the latest one before it
+            start = cap
+            while start > 0 and not isinstance(messages[start], HumanMessage):
+                start -= 1
+        removed = [m for m in messages[:start] if not isinstance(m, SystemMessage)]
+        if not removed:
+            return 0
+        await agent_executor.aupdate_state(
+            config, {"messages": [RemoveMessage(id=m.id) for m in removed]}
+        )
+        return len(removed)
@@ -0,0 +1,82 @@
+"""
+Concurrent execution of the tool calls of an agent turn.
+
+The model often asks for several tool calls in one step (the balances of
+five tokens, say). LangGraph's ToolNode awaits them together, but most BNB
+Chain toolkit tools are synchronous: their async entry point makes the
+blocking RPC call right on the event loop, so the calls still run one after
+another and stall every other request in the meantime. Wrapped tools run
+their synchronous implementation in a worker thread instead:
+
+- At most TOOL_CONCURRENCY calls of the same session run at once.
+- Read-only tools (see tool_cache.READ_ONLY_TOOLS) run side by side. Tools
+  that change state (transfers, swaps, ...) run one at a time, in the order
+  the model asked for them, so they never race for the account's nonce.
+
+ToolNode returns the results in the order of the calls.
+"""
+
+import asyncio
+import os
+import weakref
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+
+from tool_cache import READ_ONLY_TOOLS
+
+# Tool calls of one session allowed to run at the same time.
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", 8))
+
+
+def has_coroutine(tool):
+    """Whether the tool is natively async (a BnbChainTool with an async_func)."""
+    return getattr(tool, "async_func", None) is not None
+
+
+class ToolRunner:
+    """Runs tool calls in worker threads, capped per session."""
+
+    def __init__(self, concurrency=TOOL_CONCURRENCY):
+        self.concurrency = concurrency
+        self._slots = weakref.WeakValueDictionary()  # thread id -> Semaphore
+        self._writes = asyncio.Lock()
+
+    def slots(self, config):
+        """The semaphore shared by the tool calls of a session."""
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        slots = self._slots.get(thread_id)
+        if slots is None:
+            slots = self._slots[thread_id] = asyncio.Semaphore(self.concurrency)
+        return slots
+
+    async def call(self, tool, kwargs, config):
+        if has_coroutine(tool):
+            return await tool.ainvoke(kwargs, config)
+        # Keep the blocking RPC call off the event loop
+        return await asyncio.to_thread(tool.invoke, kwargs)
+
+    def wrap(self, tool):
+        """Returns `tool` running in a worker thread under the session's cap."""
+        read_only = tool.name in READ_ONLY_TOOLS
+
+        def run(**kwargs):
+            return tool.invoke(kwargs)
+
+        async def arun(config: RunnableConfig, **kwargs):
+            async with self.slots(config):
+                if read_only:
+                    return await self.call(tool, kwargs, config)
+                async with self._writes:
+                    return await self.call(tool, kwargs, config)
+
+        return StructuredTool.from_function(
+            func=run,
+            coroutine=arun,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+        )
+
+    def wrap_tools(self, tools):
+        return [self.wrap(tool) for tool in tools]
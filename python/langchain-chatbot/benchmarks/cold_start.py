@@ -0,0 +1,123 @@
+"""
+cold_start.py - Import time and time to first answer of the CLI chatbot
+
+Runs chatbot.py from scratch --runs times with the message piped to its
+standard input and reports, in seconds since the process was spawned:
+
+- import_s:       importing chatbot alone (in a fresh interpreter)
+- prompt_s:       the "User:" prompt is shown (the agent may still be
+                  building in the background)
+- first_answer_s: the answer to the first message is printed and the
+                  prompt comes back
+
+The message is sent as soon as the prompt appears, like a fast typist.
+Each run uses a fresh session database. The agent talks to the real OpenAI
+API and RPC endpoints, so .env must be set up as for the chatbot.
+
+Usage (from the project directory):
+    python benchmarks/cold_start.py [--runs 5] \\
+        [--message "What is BNB Chain?"] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+IMPORT_SNIPPET = (
+    "import time\n"
+    "started = time.perf_counter()\n"
+    "import chatbot\n"
+    "print(time.perf_counter() - started)\n"
+)
+PROMPT = b"\nUser: "
+
+
+def import_time(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=PROJECT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def read_until(stream, marker, output, timeout, started):
+    """Reads `stream` into `output` until `marker`; returns seconds since start."""
+    deadline = time.monotonic() + timeout
+    while not output.endswith(marker):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"No {marker!r} within {timeout}s")
+        chunk = stream.read1(4096)
+        if not chunk:
+            raise RuntimeError(f"chatbot.py exited early:\n{output.decode()}")
+        output += chunk
+    return time.perf_counter() - started, output
+
+
+def cold_start(message, env, timeout):
+    started = time.perf_counter()
+    chatbot = subprocess.Popen(
+        [sys.executable, "-u", "chatbot.py"],
+        cwd=PROJECT_DIR,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        prompt_s, output = read_until(chatbot.stdout, PROMPT, b"", timeout, started)
+        chatbot.stdin.write(message.encode() + b"\n")
+        chatbot.stdin.flush()
+        first_answer_s, _ = read_until(
+            chatbot.stdout, PROMPT, output[: -len(PROMPT)], timeout, started
+        )
+        chatbot.stdin.write(b"exit\n")
+        chatbot.stdin.flush()
+        chatbot.wait(timeout)
+        return {"prompt_s": prompt_s, "first_answer_s": first_answer_s}
+    finally:
+        chatbot.kill()
+        chatbot.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--message", default="What is BNB Chain?")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            env = dict(
+                os.environ, SESSION_DB_PATH=os.path.join(tmp, f"sessions-{i}.sqlite")
+            )
+            run = {"import_s": import_time(env)}
+            run.update(cold_start(args.message, env, args.timeout))
+            runs.append(run)
+            if not args.json:
+                timings = ", ".join(f"{k}={v:.3f}" for k, v in run.items())
+                print(f"run {i + 1}: {timings}")
+
+    keys = runs[0].keys()
+    report = {
+        "runs": args.runs,
+        "median": {k: round(statistics.median(r[k] for r in runs), 3) for k in keys},
+        "max": {k: round(max(r[k] for r in runs), 3) for k in keys},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
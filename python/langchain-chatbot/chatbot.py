@@ -1,15 +1,14 @@
+import argparse
 import asyncio
+import codecs
+import importlib
+import json
 import logging
+import os
 import sys
+import time
 
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import create_react_agent
-
-from bnb_chain_agentkit.agent_toolkits import BnbChainToolkit
-from bnb_chain_agentkit.utils import BnbChainAPIWrapper
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -22,10 +21,27 @@ logger.addHandler(console_handler)
 load_dotenv()
 
 
-def initialize_agent():
-    """Initialize the agent with BNB Chain."""
-    # Initialize LLM.
-    llm = ChatOpenAI(model="gpt-4o")
+def build_agent(sessions, tool_cache=None):
+    """Build the React Agent with BNB Chain tools on the session store."""
+    # langchain, langgraph and the toolkit are slow to import, so they are
+    # only loaded here, off the event loop (see initialize_agent).
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+
+    from bnb_chain_agentkit.agent_toolkits import BnbChainToolkit
+    from bnb_chain_agentkit.utils import BnbChainAPIWrapper
+
+    from compaction import SUMMARY_MODEL, HistoryCompactor
+    from tool_cache import ToolCache
+    from tool_runner import ToolRunner
+    from routing import LARGE_MODEL, SMALL_MODEL, AgentRouter
+
+    # Initialize LLMs: a small one for simple turns, a large one for the rest.
+    # stream_usage reports token counts when streaming too.
+    llms = {
+        model: ChatOpenAI(model=model, stream_usage=True)
+        for model in (LARGE_MODEL, SMALL_MODEL)
+    }
 
     # Configure BNB Chain Langchain Extension.
     bnb_chain = BnbChainAPIWrapper()
@@ -37,31 +53,118 @@ def initialize_agent():
     # for tool in tools:
     #     print(tool.name)
 
-    # Store buffered conversation history in memory.
-    memory = MemorySaver()
-    config = {"configurable": {"thread_id": "BNB Chain Chatbot Example!"}}
+    # Run the tool calls of a turn side by side, off the event loop.
+    tools = ToolRunner().wrap_tools(tools)
+
+    # Reuse results of read-only tools until the next block.
+    tool_cache = tool_cache or ToolCache()
+    tools = tool_cache.wrap_tools(tools, bnb_chain.provider)
 
-    # Create React Agent using the LLM and BNB Chain tools.
-    return (
-        create_react_agent(
+    # Fold old turns of long sessions into a summary written by a smaller model.
+    sessions.compactor = HistoryCompactor(ChatOpenAI(model=SUMMARY_MODEL))
+
+    def create_agent(llm, tools):
+        # Create React Agent using the LLM and BNB Chain tools.
+        return create_react_agent(
             llm,
             tools=tools,
-            checkpointer=memory,
+            checkpointer=sessions.checkpointer,
             prompt="You are a helpful agent that can interact onchain using the BNB Chain toolkit. You are empowered to interact onchain using your tools. If you ever need funds, you can provide your wallet details and request funds from the user. If someone asks you to do something you can't do with your currently available tools, you must say so, and encourage them to implement it themselves using the BNB Chain. Be concise and helpful with your responses. Refrain from restating your tools' descriptions unless it is explicitly requested.",
-        ),
-        config,
-    )
+        )
+
+    # Pick the model and the tools each message needs (see routing.py).
+    return AgentRouter(tools, create_agent, llms)
+
+
+async def initialize_agent(tool_cache=None):
+    """
+    Initialize the agent with BNB Chain and its session store.
 
+    Imports and the RPC connection setup run in worker threads, so an event
+    loop serving requests stays responsive while the agent is built.
+    """
+    started = time.perf_counter()
+    # Store conversation history per session in a SQLite database.
+    await asyncio.to_thread(importlib.import_module, "sessions")
+    from sessions import SessionStore
 
-async def run_chat_mode(agent_executor, config):
-    """Run the agent interactively based on user input."""
+    sessions = await SessionStore.open()
+    try:
+        agent_executor = await asyncio.to_thread(build_agent, sessions, tool_cache)
+    except BaseException:
+        # Failed, or cancelled on exit: the open database would keep the
+        # process alive
+        await sessions.close()
+        raise
+    logger.info(f"Agent ready in {time.perf_counter() - started:.1f}s")
+    return agent_executor, sessions
+
+
+class StdinReader:
+    """
+    Reads lines from stdin on the event loop rather than blocking it in
+    input(), so the agent keeps building while the first message is typed.
+    Falls back to input() where stdin cannot be watched (Windows, or a
+    file redirected to stdin).
+    """
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder(sys.stdin.encoding or "utf-8")(
+            errors="replace"
+        )
+        self.buffer = ""
+        self.eof = False
+
+    async def readable(self, fd):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+
+    async def readline(self, prompt):
+        """Like input(prompt); raises EOFError at the end of input."""
+        print(prompt, end="", flush=True)
+        fd = sys.stdin.fileno()
+        while "\n" not in self.buffer and not self.eof:
+            try:
+                await self.readable(fd)
+            except (NotImplementedError, OSError):
+                return input()
+            data = os.read(fd, 4096)
+            self.eof = not data
+            self.buffer += self.decoder.decode(data, final=self.eof)
+        if not self.buffer:
+            raise EOFError
+        line, _, self.buffer = self.buffer.partition("\n")
+        return line.rstrip("\r")
+
+
+async def run_chat_mode(agent, session_id=None):
+    """
+    Run the agent interactively based on user input.
+
+    `agent` is the initialize_agent() task; the agent may still be building
+    while the first message is typed.
+    """
     print("Starting chat mode... Type 'exit' to end.")
+    stdin = StdinReader()
     while True:
         try:
-            user_input = input("\nUser: ")
+            user_input = await stdin.readline("\nUser: ")
             if user_input.lower() == "exit":
                 break
 
+            agent_executor, sessions = await agent
+            from langchain_core.messages import HumanMessage
+
+            if session_id is None:
+                session_id = sessions.new_id()
+                print(f"(session {session_id})")
+            config = await sessions.touch(session_id)
+
             # Run agent with the user's input in chat mode
             async for event in agent_executor.astream(
                 {"messages": [HumanMessage(content=user_input)]},
@@ -70,7 +173,11 @@ async def run_chat_mode(agent_executor, config):
             ):
                 event["messages"][-1].pretty_print()
 
-        except KeyboardInterrupt:
+            # Keep the session under its token budget and message cap
+            await sessions.end_turn(agent_executor, config)
+
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # asyncio.run() turns Ctrl+C into a cancellation of main()
             print("Goodbye Agent!")
             sys.exit(0)
         except EOFError:  # Catch EOFError for handling Ctrl+D
@@ -78,12 +185,139 @@ async def run_chat_mode(agent_executor, config):
             sys.exit(0)
 
 
+def load_prompts(path):
+    """Reads a batch file: one {"prompt": ..., "id": ...} object per line."""
+    items = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not isinstance(item, dict) or not isinstance(item.get("prompt"), str):
+                raise ValueError(f"{path}:{line_number}: expected a \"prompt\" string")
+            item.setdefault("id", line_number)
+            items.append(item)
+    return items
+
+
+def tool_trace(messages):
+    """The answer and the tool calls (with results) of a single-turn session."""
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    calls = {}
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                calls[call["id"]] = {"name": call["name"], "args": call["args"]}
+        elif isinstance(message, ToolMessage) and message.tool_call_id in calls:
+            calls[message.tool_call_id]["result"] = str(message.content)
+    last = messages[-1] if messages else None
+    answer = last.content if isinstance(last, AIMessage) else None
+    return {"answer": answer, "tools": list(calls.values())}
+
+
+async def run_batch_mode(agent, prompts_path, output_path="-", concurrency=4):
+    """
+    Answer every prompt of a JSONL file, at most `concurrency` at a time and
+    each in a session of its own. A result line (answer, tool calls and
+    latency) is written to `output_path` ("-" for stdout) as soon as its
+    prompt is done. Returns the number of failed prompts.
+    """
+    items = load_prompts(prompts_path)
+    agent_executor, sessions = await agent
+    from langchain_core.messages import HumanMessage
+
+    slots = asyncio.Semaphore(concurrency)
+    output = sys.stdout if output_path == "-" else open(output_path, "w")
+    latencies = []
+
+    async def answer(item):
+        async with slots:
+            session_id = sessions.new_id()
+            result = {"id": item["id"], "prompt": item["prompt"]}
+            started = time.perf_counter()
+            try:
+                config = await sessions.touch(session_id)
+                state = await agent_executor.ainvoke(
+                    {"messages": [HumanMessage(content=item["prompt"])]}, config
+                )
+                result.update(tool_trace(state["messages"]))
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["latency_s"] = round(time.perf_counter() - started, 3)
+            result["session_id"] = session_id
+        latencies.append(result["latency_s"])
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        return "error" not in result
+
+    started = time.perf_counter()
+    try:
+        succeeded = await asyncio.gather(*(answer(item) for item in items))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    failed = succeeded.count(False)
+    latencies.sort()
+    logger.info(
+        f"Batch done: {len(items)} prompts ({failed} failed) in "
+        f"{time.perf_counter() - started:.1f}s, median latency "
+        f"{latencies[len(latencies) // 2] if latencies else 0:.2f}s"
+    )
+    return failed
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="BNB Chain agent chatbot")
+    parser.add_argument(
+        "--batch",
+        metavar="PROMPTS_JSONL",
+        help="answer the prompts of a JSONL file instead of chatting",
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        metavar="ANSWERS_JSONL",
+        help="where batch results go (default: stdout)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=positive_int,
+        default=4,
+        help="prompts answered at the same time in batch mode (default: 4)",
+    )
+    return parser.parse_args()
+
+
 async def main():
     """Start the chatbot agent."""
-    agent_executor, config = initialize_agent()
-    await run_chat_mode(agent_executor=agent_executor, config=config)
+    args = parse_args()
+    # Build the agent in the background while the first message is typed
+    agent = asyncio.create_task(initialize_agent())
+    await asyncio.sleep(0)
+    try:
+        if args.batch:
+            failed = await run_batch_mode(
+                agent, args.batch, args.output, args.concurrency
+            )
+            return 1 if failed else 0
+        print("Starting Agent...")
+        # Resume an earlier conversation with CHAT_SESSION_ID=<id>
+        await run_chat_mode(agent=agent, session_id=os.getenv("CHAT_SESSION_ID"))
+    finally:
+        if agent.done() and not agent.cancelled() and agent.exception() is None:
+            await agent.result()[1].close()
+        else:
+            agent.cancel()
 
 
 if __name__ == "__main__":
-    print("Starting Agent...")
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
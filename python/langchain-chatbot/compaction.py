@@ -0,0 +1,140 @@
+"""
+Rolling summarization of long chat histories.
+
+The ReAct agent replays a session's whole history on every turn, so cost
+and latency grow with the conversation. Once a session's history goes over
+COMPACT_TOKEN_BUDGET (approximate tokens), the older turns are folded into
+a running summary, kept as a system message at the start of the history.
+The most recent turns, up to COMPACT_KEEP_TOKENS, stay verbatim.
+"""
+
+import logging
+import os
+
+from langchain_core.messages import (
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+    get_buffer_string,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+logger = logging.getLogger("Chatbot")
+
+# Approximate history tokens above which older turns are summarized.
+COMPACT_TOKEN_BUDGET = int(os.getenv("COMPACT_TOKEN_BUDGET", 6000))
+# Approximate tokens of recent turns kept verbatim after a compaction.
+COMPACT_KEEP_TOKENS = int(os.getenv("COMPACT_KEEP_TOKENS", 2000))
+# Model that writes the summaries (a small one is enough).
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+# Characters of each tool output shown to the summarizer.
+SUMMARY_TOOL_OUTPUT_CHARS = int(os.getenv("SUMMARY_TOOL_OUTPUT_CHARS", 1000))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and a BNB "
+    "Chain assistant with the new messages below. Keep every fact that may "
+    "matter later: addresses, token symbols, amounts, balances, transaction "
+    "hashes and what the user asked for. Drop pleasantries. Reply with the "
+    "summary only.\n\nCurrent summary:\n{summary}\n\nNew messages:\n{messages}"
+)
+
+
+def clip(content):
+    content = str(content)
+    if len(content) <= SUMMARY_TOOL_OUTPUT_CHARS:
+        return content
+    return content[:SUMMARY_TOOL_OUTPUT_CHARS] + " ..."
+
+
+def is_summary(message):
+    return isinstance(message, SystemMessage) and message.additional_kwargs.get(
+        "summary", False
+    )
+
+
+class HistoryCompactor:
+    """Folds old turns of a session into a running summary message."""
+
+    def __init__(
+        self,
+        llm,
+        token_budget=COMPACT_TOKEN_BUDGET,
+        keep_tokens=COMPACT_KEEP_TOKENS,
+    ):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_tokens = keep_tokens
+        self.stats = {"turns": 0, "compactions": 0, "tokens_saved": 0}
+
+    def _split(self, history):
+        """Index of the first kept message: a user message, within keep_tokens."""
+        split = None
+        for i in range(len(history) - 1, -1, -1):
+            if not isinstance(history[i], HumanMessage):
+                continue
+            if split is not None and (
+                count_tokens_approximately(history[i:]) > self.keep_tokens
+            ):
+                break
+            split = i
+        return split or 0
+
+    async def _summarize(self, summary, messages):
+        # Large tool outputs (balance dumps, transaction lists) are cut short
+        rendered = get_buffer_string(
+            [
+                (
+                    m.model_copy(update={"content": clip(m.content)})
+                    if isinstance(m, ToolMessage)
+                    else m
+                )
+                for m in messages
+            ]
+        )
+        current = summary.content[len(SUMMARY_PREFIX) :] if summary else "(none)"
+        response = await self.llm.ainvoke(
+            SUMMARY_PROMPT.format(summary=current, messages=rendered)
+        )
+        return response.content
+
+    async def compact(self, agent_executor, config):
+        """
+        Compacts a session if it is over the token budget. Returns the number
+        of tokens the next turn saves thanks to the summary.
+        """
+        state = await agent_executor.aget_state(config)
+        messages = state.values.get("messages", [])
+        summary = messages[0] if messages and is_summary(messages[0]) else None
+        saved = summary.additional_kwargs.get("tokens_saved", 0) if summary else 0
+
+        if count_tokens_approximately(messages) > self.token_budget:
+            history = messages[1:] if summary else messages
+            old = history[: self._split(history)]
+            if old:
+                text = await self._summarize(summary, old)
+                replaced = old + ([summary] if summary else [])
+                new_summary = SystemMessage(
+                    content=SUMMARY_PREFIX + text,
+                    # Same id as the message it replaces, so it stays first
+                    id=summary.id if summary else old[0].id,
+                )
+                saved += count_tokens_approximately(replaced)
+                saved -= count_tokens_approximately([new_summary])
+                new_summary.additional_kwargs = {"summary": True, "tokens_saved": saved}
+                removed = [m for m in old if m.id != new_summary.id]
+                await agent_executor.aupdate_state(
+                    config,
+                    {
+                        "messages": [new_summary]
+                        + [RemoveMessage(id=m.id) for m in removed]
+                    },
+                )
+                self.stats["compactions"] += 1
+
+        self.stats["turns"] += 1
+        self.stats["tokens_saved"] += saved
+        if saved:
+            logger.info(f"History compaction: next turn replays {saved} fewer tokens")
+        return saved
@@ -0,0 +1,294 @@
+"""
+Per-message tool and model selection for the chat agent.
+
+The ReAct agent sends the schema of every bound tool with every model call,
+and the BNB Chain toolkit has sixteen of them. Before each turn the user's
+message is matched against keyword groups (balances, transfers, swaps, gas,
+transactions, ...) and only the tools of the matching groups are bound.
+Messages that match no group (greetings, follow-ups such as "yes, do it")
+get the full toolkit, so routing never takes a tool away when unsure.
+
+The message also picks the model. Greetings, thanks and general questions
+("what is BNB Chain?") that match no tool group go to SMALL_MODEL; all
+other turns go to LARGE_MODEL. The small model still gets the full toolkit,
+in case the turn needs a tool after all. Latency, tokens and cost are
+recorded per model, so the rules and SMALL_MODEL_MAX_CHARS can be tuned.
+
+Every (model, tool subset) pair gets its own compiled agent, cached and
+sharing one checkpointer, so a session can switch from turn to turn.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, deque
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger("Chatbot")
+
+# Set to 0 to always bind the full toolkit.
+TOOL_ROUTING = os.getenv("TOOL_ROUTING", "1") != "0"
+# Set to 0 to send every turn to LARGE_MODEL.
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") != "0"
+# Model for turns that likely need tools, and whenever unsure.
+LARGE_MODEL = os.getenv("LARGE_MODEL", "gpt-4o")
+# Small, fast model for greetings and general questions.
+SMALL_MODEL = os.getenv("SMALL_MODEL", "gpt-4o-mini")
+# Longest message (characters) that may go to SMALL_MODEL.
+SMALL_MODEL_MAX_CHARS = int(os.getenv("SMALL_MODEL_MAX_CHARS", 200))
+
+# Compiled agents kept, one per model and tool subset in use.
+MAX_ROUTED_AGENTS = 32
+# Turn latencies kept per model for the metrics percentiles.
+LATENCY_SAMPLES = 1000
+
+# USD per million input and output tokens, for the cost estimates.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Keyword groups and the tools they need; a message gets the union of the
+# tools of every group it matches.
+TOOL_GROUPS = {
+    "balance": (
+        r"balances?|holdings?|how much|funds|portfolio|wallet",
+        ["get_balance"],
+    ),
+    "transfer": (r"send|transfer|pay", ["transfer", "get_balance"]),
+    "swap": (
+        r"swap|exchange|convert|trade|buy|sell",
+        ["swap", "get_balance", "token_price_query"],
+    ),
+    "bridge": (r"bridge|opbnb|cross.?chain", ["bridge", "get_balance"]),
+    "stake": (r"stake|staking|unstake|delegat\w*|rewards?", ["stake", "get_balance"]),
+    "deploy": (
+        r"deploy\w*|contract|nft|[eb]rc.?(20|721|1155)|mint",
+        ["deploy"],
+    ),
+    "faucet": (r"faucet|testnet|test tokens?", ["faucet"]),
+    "price": (r"prices?|worth|value|usd|market", ["token_price_query"]),
+    "gas": (
+        r"gas|gwei|fees?",
+        ["get_gas_fee", "gas_price_trend", "transaction_fee_estimator"],
+    ),
+    "transactions": (
+        r"tx|txs|transactions?|receipt|hash|pending|history|volume|activity"
+        r"|0x[0-9a-f]{64}",
+        [
+            "get_transaction_receipt",
+            "recent_transactions",
+            "pending_transactions",
+            "transaction_volume_analyzer",
+            "token_transfer_history",
+        ],
+    ),
+}
+
+# Messages that need no tools, unless they also match a tool group or
+# mention an address.
+SIMPLE_MESSAGE = re.compile(
+    r"^(hi|hello|hey|good (morning|afternoon|evening)|thanks|thank you|bye"
+    r"|what (is|are)|who|why|how (does|do|is|are)|explain|tell me about|define)\b"
+)
+
+
+def schema_tokens(tool):
+    """Approximate prompt tokens of a tool's schema (4 characters per token)."""
+    return len(json.dumps(convert_to_openai_tool(tool))) // 4
+
+
+def message_text(input):
+    """Text of the newest user message in an agent input, or None."""
+    messages = input.get("messages") if isinstance(input, dict) else None
+    if not messages:
+        return None
+    message = messages[-1]
+    if isinstance(message, dict):
+        return str(message.get("content", ""))
+    return str(message.content)
+
+
+def cost(model, input_tokens, output_tokens):
+    """Estimated USD cost, or None for a model without a known price."""
+    if model not in MODEL_PRICES:
+        return None
+    input_price, output_price = MODEL_PRICES[model]
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+class AgentRouter:
+    """
+    Stands in for the agent: runs each turn on an agent with the model and
+    the tools its message needs. Other agent methods (aget_state,
+    aupdate_state, ...) go to the large model's agent with the full toolkit.
+    """
+
+    def __init__(
+        self,
+        tools,
+        create_agent,
+        llms,
+        tool_routing=TOOL_ROUTING,
+        model_routing=MODEL_ROUTING,
+    ):
+        """
+        `create_agent(llm, tools)` builds an agent; `llms` maps the model
+        names LARGE_MODEL and SMALL_MODEL to chat models.
+        """
+        self.tools = tools
+        self.create_agent = create_agent
+        self.llms = llms
+        self.tool_routing = tool_routing
+        self.model_routing = model_routing and SMALL_MODEL in llms
+        self.schema_tokens = {tool.name: schema_tokens(tool) for tool in tools}
+        self.full = create_agent(llms[LARGE_MODEL], tools)
+        self._agents = OrderedDict()  # (model, frozenset of tool names) -> agent
+        self.stats = {"turns": 0, "routed": 0, "model_calls": 0, "tokens_saved": 0}
+        self.models = {}  # model -> turns, tokens, cost and latencies
+        self.patterns = {
+            group: re.compile(rf"\b({pattern})\b")
+            for group, (pattern, _) in TOOL_GROUPS.items()
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.full, name)
+
+    def select(self, text):
+        """
+        Returns (model, matched groups, tool names); groups and names are
+        None when every tool is bound.
+        """
+        if text is None:
+            return LARGE_MODEL, None, None
+        text = " ".join(text.lower().split())
+        groups = [
+            group for group, pattern in self.patterns.items() if pattern.search(text)
+        ]
+        model = LARGE_MODEL
+        if (
+            self.model_routing
+            and not groups
+            and "0x" not in text
+            and len(text) <= SMALL_MODEL_MAX_CHARS
+            and SIMPLE_MESSAGE.match(text)
+        ):
+            model = SMALL_MODEL
+        names = {name for group in groups for name in TOOL_GROUPS[group][1]}
+        names &= self.schema_tokens.keys()
+        if not self.tool_routing or not names or len(names) == len(self.tools):
+            return model, None, None
+        return model, groups, frozenset(names)
+
+    def agent_for(self, model, names):
+        if model == LARGE_MODEL and names is None:
+            return self.full
+        key = (model, names)
+        agent = self._agents.get(key)
+        if agent is None:
+            tools = self.tools
+            if names is not None:
+                tools = [tool for tool in tools if tool.name in names]
+            agent = self.create_agent(self.llms[model], tools)
+            self._agents[key] = agent
+            while len(self._agents) > MAX_ROUTED_AGENTS:
+                self._agents.popitem(last=False)
+        self._agents.move_to_end(key)
+        return agent
+
+    async def astream(self, input, config=None, **kwargs):
+        route = self.select(message_text(input))
+        started = time.perf_counter()
+        async for event in self.agent_for(route[0], route[2]).astream(
+            input, config, **kwargs
+        ):
+            yield event
+        await self._record(route, config, time.perf_counter() - started)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        route = self.select(message_text(input))
+        started = time.perf_counter()
+        result = await self.agent_for(route[0], route[2]).ainvoke(
+            input, config, **kwargs
+        )
+        await self._record(route, config, time.perf_counter() - started)
+        return result
+
+    async def _record(self, route, config, seconds):
+        """Records the turn's model calls, tokens, cost and schema tokens saved."""
+        model, groups, names = route
+        state = await self.full.aget_state(config)
+        turn = []
+        for message in reversed(state.values.get("messages", [])):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, AIMessage):
+                turn.append(message)
+        usage = [m.usage_metadata or {} for m in turn]
+        input_tokens = sum(u.get("input_tokens", 0) for u in usage)
+        output_tokens = sum(u.get("output_tokens", 0) for u in usage)
+
+        stats = self.models.setdefault(
+            model,
+            {
+                "turns": 0,
+                "model_calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "latencies": deque(maxlen=LATENCY_SAMPLES),
+            },
+        )
+        stats["turns"] += 1
+        stats["model_calls"] += len(turn)
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["latencies"].append(seconds)
+        turn_cost = cost(model, input_tokens, output_tokens)
+
+        self.stats["turns"] += 1
+        saved = 0
+        if names is not None:
+            per_call = sum(self.schema_tokens.values()) - sum(
+                self.schema_tokens[name] for name in names
+            )
+            saved = per_call * len(turn)
+            self.stats["routed"] += 1
+            self.stats["model_calls"] += len(turn)
+            self.stats["tokens_saved"] += saved
+        bound = "all tools"
+        if names is not None:
+            bound = f"{len(names)}/{len(self.tools)} tools ({', '.join(groups)})"
+        details = [f"{seconds:.2f}s", f"{input_tokens}+{output_tokens} tokens"]
+        if turn_cost is not None:
+            details.append(f"${turn_cost:.4f}")
+        if saved:
+            details.append(f"{saved} fewer schema tokens")
+        logger.info(f"Turn on {model} with {bound}: {', '.join(details)}")
+
+    def model_stats(self):
+        """Turns, latency, tokens and estimated cost per model."""
+        report = {}
+        for model, stats in self.models.items():
+            latencies = sorted(stats["latencies"])
+            total_cost = cost(model, stats["input_tokens"], stats["output_tokens"])
+            report[model] = {
+                "turns": stats["turns"],
+                "model_calls": stats["model_calls"],
+                "input_tokens": stats["input_tokens"],
+                "output_tokens": stats["output_tokens"],
+                "latency_avg_s": round(sum(latencies) / len(latencies), 3),
+                "latency_p95_s": round(
+                    latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 3
+                ),
+                "cost_usd": round(total_cost, 6) if total_cost is not None else None,
+                "cost_per_turn_usd": (
+                    round(total_cost / stats["turns"], 6)
+                    if total_cost is not None
+                    else None
+                ),
+            }
+        return report
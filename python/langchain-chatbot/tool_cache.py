@@ -0,0 +1,207 @@
+"""
+Block-aware cache for the read-only BNB Chain toolkit tools.
+
+Agents often repeat the same lookups (balances, gas price, receipts), both
+within a conversation and across users. Results of read-only tools are
+memoized by tool name and normalized arguments:
+
+- "block" tools read chain state; a result is reused only while the chain
+  head is still the block it was read at, and for at most TOOL_CACHE_TTL
+  seconds.
+- "ttl" tools do not depend on the chain head (off-chain prices, pure
+  arithmetic); a result is reused for TOOL_CACHE_TTL seconds.
+
+Every other tool (transfers, swaps, deploys, ...) is never cached, and
+calling one clears the cache so no stale balance is served afterwards.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("Chatbot")
+
+# Seconds a cached tool result may be reused at most.
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", 30))
+# Most tool results kept; the least recently used are dropped first.
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", 512))
+# Seconds between chain head checks (shared by every cached lookup).
+TOOL_CACHE_BLOCK_POLL = float(os.getenv("TOOL_CACHE_BLOCK_POLL", 1))
+
+READ_ONLY_TOOLS = {
+    "get_balance": "block",
+    "get_gas_fee": "block",
+    "get_transaction_receipt": "block",
+    "recent_transactions": "block",
+    "pending_transactions": "block",
+    "gas_price_trend": "block",
+    "transaction_volume_analyzer": "block",
+    "token_transfer_history": "block",
+    "token_price_query": "ttl",
+    "transaction_fee_estimator": "ttl",
+}
+
+
+def normalize(value):
+    """Cache key form of a tool argument (addresses are case-insensitive)."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value.lower() if value.startswith(("0x", "0X")) else value
+    return value
+
+
+class ToolCache:
+    """LRU cache of read-only tool results, invalidated by new blocks."""
+
+    def __init__(
+        self,
+        ttl=TOOL_CACHE_TTL,
+        max_size=TOOL_CACHE_SIZE,
+        block_poll=TOOL_CACHE_BLOCK_POLL,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.block_poll = block_poll
+        self.provider = None
+        self._entries = OrderedDict()  # key -> (result, block number, time)
+        self._head = (None, 0.0)  # (block number, checked at)
+        self._lock = threading.Lock()
+        self._stats = {}  # tool name -> {"hits": n, "misses": n}
+        self.invalidations = 0
+
+    def head(self):
+        """Latest block number, refreshed at most every `block_poll` seconds."""
+        block_number, checked_at = self._head
+        now = time.monotonic()
+        if block_number is None or now - checked_at >= self.block_poll:
+            client = self.provider.get_current_client()
+            block_number = client.eth.block_number
+            self._head = (block_number, now)
+        return block_number
+
+    def key(self, tool, kwargs):
+        if tool.args_schema is not None:
+            # Fill in defaults so omitted and explicit arguments share a key
+            kwargs = tool.args_schema(**kwargs).model_dump()
+        return (tool.name,) + tuple(
+            sorted((name, normalize(value)) for name, value in kwargs.items())
+        )
+
+    def get(self, key, policy):
+        block_number = self.head() if policy == "block" else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, block_number
+            result, cached_block, cached_at = entry
+            if time.monotonic() - cached_at > self.ttl or (
+                policy == "block" and cached_block != block_number
+            ):
+                del self._entries[key]
+                return None, block_number
+            self._entries.move_to_end(key)
+            return result, block_number
+
+    def put(self, key, result, block_number):
+        with self._lock:
+            self._entries[key] = (result, block_number, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def _count(self, name, outcome):
+        with self._lock:
+            counts = self._stats.setdefault(name, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+        if outcome == "hits":
+            total = counts["hits"] + counts["misses"]
+            logger.info(
+                f"Tool cache hit for {name} ({counts['hits']}/{total} calls cached)"
+            )
+
+    def stats(self):
+        hits = sum(counts["hits"] for counts in self._stats.values())
+        misses = sum(counts["misses"] for counts in self._stats.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "tools": self._stats,
+        }
+
+    def _lookup(self, tool, policy, kwargs):
+        """Returns (cached result or None, cache key, block number)."""
+        try:
+            key = self.key(tool, kwargs)
+            result, block_number = self.get(key, policy)
+        except Exception as e:
+            # Invalid arguments or an RPC hiccup: let the tool itself handle it
+            logger.warning(f"Tool cache bypassed for {tool.name}: {e}")
+            return None, None, None
+        self._count(tool.name, "hits" if result is not None else "misses")
+        return result, key, block_number
+
+    def _store(self, key, result, block_number):
+        # Tools report most failures as "Error ..." strings; retry those
+        if key is not None and not str(result).startswith("Error"):
+            self.put(key, result, block_number)
+
+    def wrap(self, tool):
+        """Returns `tool` with caching (read-only) or cache invalidation."""
+        # Only imported once the agent is built (see chatbot.build_agent), so
+        # creating a ToolCache at start-up stays cheap
+        from langchain_core.runnables import RunnableConfig
+        from langchain_core.tools import StructuredTool
+
+        policy = READ_ONLY_TOOLS.get(tool.name)
+
+        def run(**kwargs):
+            if policy is None:
+                try:
+                    return tool.invoke(kwargs)
+                finally:
+                    self.invalidate()
+            result, key, block_number = self._lookup(tool, policy, kwargs)
+            if result is None:
+                result = tool.invoke(kwargs)
+                self._store(key, result, block_number)
+            return result
+
+        async def arun(config: RunnableConfig, **kwargs):
+            # The config carries the session, for tool_runner's per-session cap
+            if policy is None:
+                try:
+                    return await tool.ainvoke(kwargs, config)
+                finally:
+                    self.invalidate()
+            # Checking the chain head is an RPC call; keep it off the event loop
+            result, key, block_number = await asyncio.to_thread(
+                self._lookup, tool, policy, kwargs
+            )
+            if result is None:
+                result = await tool.ainvoke(kwargs, config)
+                self._store(key, result, block_number)
+            return result
+
+        return StructuredTool.from_function(
+            func=run,
+            coroutine=arun,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+        )
+
+    def wrap_tools(self, tools, provider):
+        """Wraps every toolkit tool; `provider` is used to follow the chain head."""
+        self.provider = provider
+        return [self.wrap(tool) for tool in tools]
@@ -0,0 +1,229 @@
+"""
+allowance.py - Cached BEP-20 allowances so repeat swaps skip the approve step
+
+The router can only pull token_in after `approve`. Instead of approving before
+every swap, AllowanceManager reads allowance(owner, router) once, tracks it
+locally as swaps spend it, and only sends an approve transaction when the
+remaining allowance is too small for the next swap.
+
+How much to approve is controlled by APPROVAL_AMOUNT:
+- "max" (default): approve 2**256-1 once, so later swaps never re-approve.
+                   The router can then move all of the wallet's token_in,
+                   so only use it with a router you trust.
+- a number:        approve that many tokens (at least the swap amount), so
+                   swaps re-approve once the standing allowance runs out
+- "exact":         approve just the amount of the current swap; every swap
+                   then sends approve + swap
+"""
+
+import os
+import json
+import logging
+import threading
+from decimal import Decimal, InvalidOperation
+from web3 import Web3
+
+MAX_UINT256 = 2**256 - 1
+
+
+
+def parse_approval_amount(value):
+    """
+    Validates an APPROVAL_AMOUNT setting.
+
+    Returns:
+        "max", "exact" or a positive Decimal token amount
+
+    Raises:
+        ValueError: If the value is none of those.
+    """
+    value = str(value).strip().lower()
+    if value in ("max", "exact"):
+        return value
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or amount <= 0:
+        raise ValueError(
+            f"APPROVAL_AMOUNT must be 'max', 'exact' or a positive amount, "
+            f"not {value!r}"
+        )
+    return amount
+
+
+APPROVAL_AMOUNT = parse_approval_amount(os.getenv("APPROVAL_AMOUNT", "max"))
+
+ERC20_ALLOWANCE_ABI = json.loads(
+    """[
+      {
+        "constant": true,
+        "inputs": [
+          {"name": "owner", "type": "address"},
+          {"name": "spender", "type": "address"}
+        ],
+        "name": "allowance",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "type": "function"
+      },
+      {
+        "constant": false,
+        "inputs": [
+          {"name": "spender", "type": "address"},
+          {"name": "amount", "type": "uint256"}
+        ],
+        "name": "approve",
+        "outputs": [{"name": "", "type": "bool"}],
+        "type": "function"
+      }
+    ]"""
+)
+
+
+class AllowanceManager:
+    """Tracks allowances per (token, owner, spender) and approves only when short."""
+
+    def __init__(self, web3, approval_amount=APPROVAL_AMOUNT):
+        self.web3 = web3
+        self.approval_amount = parse_approval_amount(approval_amount)
+        self._allowances = {}
+        self._lock = threading.Lock()
+
+    def _key(self, token, owner, spender):
+        return (
+            Web3.to_checksum_address(token),
+            Web3.to_checksum_address(owner),
+            Web3.to_checksum_address(spender),
+        )
+
+    def get_allowance(self, token, owner, spender):
+        """Returns the cached allowance, reading it on-chain the first time."""
+        key = self._key(token, owner, spender)
+        with self._lock:
+            if key in self._allowances:
+                return self._allowances[key]
+        contract = self.web3.eth.contract(address=key[0], abi=ERC20_ALLOWANCE_ABI)
+        allowance = contract.functions.allowance(key[1], key[2]).call()
+        with self._lock:
+            self._allowances.setdefault(key, allowance)
+            return self._allowances[key]
+
+    def approval_target(self, amount, decimals=18):
+        """Allowance to request when `amount` (in base units) is not covered."""
+        if self.approval_amount == "max":
+            return MAX_UINT256
+        if self.approval_amount == "exact":
+            return amount
+        configured = int(self.approval_amount * 10**decimals)
+        return max(configured, amount)
+
+    def ensure_allowance(
+        self, wallet, token, spender, amount, nonce, gas_price, decimals=18
+    ):
+        """
+        Sends an approve transaction only if the allowance is below `amount`.
+
+        Args:
+            wallet (LocalAccount): Token owner that signs the approval
+            token (str): BEP-20 token to approve
+            spender (str): Router that will call transferFrom
+            amount (int): Amount (base units) the next swap will spend
+            nonce (int): Nonce to use for the approval, if one is needed
+            gas_price (int): Gas price in wei for the approval
+            decimals (int): Token decimals, used for a numeric APPROVAL_AMOUNT
+
+        Returns:
+            str | None: Approval tx hash, or None when no approval was needed
+        """
+        key = self._key(token, wallet.address, spender)
+        if self.get_allowance(*key) >= amount:
+            return None
+
+        target = self.approval_target(amount, decimals)
+        contract = self.web3.eth.contract(address=key[0], abi=ERC20_ALLOWANCE_ABI)
+        approval_txn = contract.functions.approve(key[2], target).build_transaction(
+            self._approval_params(wallet, nonce, gas_price)
+        )
+        signed = self.web3.eth.account.sign_transaction(
+            approval_txn, private_key=wallet.key
+        )
+        tx_hash = self.web3.eth.send_raw_transaction(
+            getattr(signed, "rawTransaction", getattr(signed, "raw_transaction"))
+        )
+        self._approved(key, target)
+        return self.web3.to_hex(tx_hash)
+
+    def _approval_params(self, wallet, nonce, gas_price, chain_id=None):
+        params = {
+            "from": wallet.address,
+            "gas": 100000,
+            "gasPrice": gas_price,
+            "nonce": nonce,
+        }
+        if chain_id is not None:
+            # Saves the eth_chainId round trip build_transaction would make
+            params["chainId"] = chain_id
+        return params
+
+    def _approved(self, key, target):
+        with self._lock:
+            self._allowances[key] = target
+        logging.info(f"✅ Approved router to spend {target} of {key[0]}")
+
+    def record_spend(self, token, owner, spender, amount):
+        """Deducts a submitted swap's input from the cached allowance."""
+        key = self._key(token, owner, spender)
+        with self._lock:
+            if key in self._allowances and self._allowances[key] != MAX_UINT256:
+                self._allowances[key] = max(self._allowances[key] - amount, 0)
+
+    def invalidate(self, token, owner, spender):
+        """Forgets a cached allowance so the next swap re-reads it on-chain."""
+        with self._lock:
+            self._allowances.pop(self._key(token, owner, spender), None)
+
+
+class AsyncAllowanceManager(AllowanceManager):
+    """AllowanceManager for an AsyncWeb3 client; shares the same cache logic."""
+
+    async def get_allowance(self, token, owner, spender):
+        key = self._key(token, owner, spender)
+        with self._lock:
+            if key in self._allowances:
+                return self._allowances[key]
+        contract = self.web3.eth.contract(address=key[0], abi=ERC20_ALLOWANCE_ABI)
+        allowance = await contract.functions.allowance(key[1], key[2]).call()
+        with self._lock:
+            self._allowances.setdefault(key, allowance)
+            return self._allowances[key]
+
+    async def ensure_allowance(
+        self,
+        wallet,
+        token,
+        spender,
+        amount,
+        nonce,
+        gas_price,
+        decimals=18,
+        chain_id=None,
+    ):
+        key = self._key(token, wallet.address, spender)
+        if await self.get_allowance(*key) >= amount:
+            return None
+
+        target = self.approval_target(amount, decimals)
+        contract = self.web3.eth.contract(address=key[0], abi=ERC20_ALLOWANCE_ABI)
+        approval_txn = await contract.functions.approve(
+            key[2], target
+        ).build_transaction(
+            self._approval_params(wallet, nonce, gas_price, chain_id)
+        )
+        signed = self.web3.eth.account.sign_transaction(
+            approval_txn, private_key=wallet.key
+        )
+        tx_hash = await self.web3.eth.send_raw_transaction(
+            getattr(signed, "rawTransaction", getattr(signed, "raw_transaction"))
+        )
+        self._approved(key, target)
+        return self.web3.to_hex(tx_hash)
@@ -12,12 +12,23 @@ Description:
 
     - Supports swapping tBNB → token
     - Supports swapping BEP-20 → BEP-20 (with auto WBNB routing)
+    - Quotes many swaps at once against a single reserve snapshot
+    - Tracks submitted swaps block by block (status lookup + SSE stream)
+    - Splits large token swaps into TWAP/DCA child swaps
+    - Streams live pair prices from Sync events (one upstream log poll)
     - Provides live Swagger documentation at /apidocs
 
 Endpoints:
     1. GET  /              - Renders the frontend (MetaMask-enabled swap UI)
     2. POST /swap          - Performs a swap from tBNB to another token
     3. POST /token-swap    - Swaps one BEP-20 token for another
+    4. POST /quote/batch   - Quotes a matrix of (token_in, token_out, amount)
+    5. GET  /tx/<tx_hash>  - Status of a submitted swap
+    6. GET  /tx/stream     - Server-sent events for every confirmed swap
+    7. POST /orders        - Schedules a TWAP/DCA token swap order
+    8. GET  /orders/<id>   - Progress of a scheduled order (DELETE cancels)
+    9. GET  /prices        - Latest prices of the tracked pairs
+   10. GET  /prices/stream - Server-sent events with throttled price updates
 
 Swagger Docs:
     Accessible at http://localhost:5000/apidocs
@@ -28,14 +39,25 @@ Environment:
         - RPC_URL pointing to BNB Testnet
 
 Dependencies:
-    Flask, flasgger, web3, eth-account, python-dotenv, mnemonic
+    Flask, flasgger, web3, eth-account, python-dotenv, mnemonic, numpy
 
 ===============================================================================
 """
 
-from flask import Flask, jsonify, request, render_template
+import os
+import json
+import time
+import queue
+from decimal import Decimal, InvalidOperation
+from flask import Flask, Response, jsonify, request, render_template
 from flasgger import Swagger
-from swapper import perform_swap, perform_token_to_token_swap
+from web3 import Web3
+from swapper import perform_swap, perform_token_to_token_swap, tokens, web3
+from tx_tracker import TxTracker
+from order_scheduler import OrderScheduler
+from price_feed import configured_feed, client_interval, client_pairs
+from batch_quoter import quote_batch
+from token_registry import to_base_units, from_base_units
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -43,6 +65,29 @@ app = Flask(__name__)
 # Initialize Swagger UI (accessible at /apidocs)
 swagger = Swagger(app)
 
+# Resolves submitted swaps from one receipt fetch per block
+tracker = TxTracker(web3)
+
+# Executes scheduled TWAP/DCA orders; state survives restarts
+scheduler = OrderScheduler(tracker)
+
+# Live prices of PRICE_PAIRS, shared by every /prices/stream client
+prices = configured_feed(web3)
+
+
+def start_background_services():
+    """
+    Starts the tracker, order scheduler and price feed threads.
+
+    Call it once in the process that serves requests (see __main__), never
+    at import time: the debug reloader imports this module in a watcher
+    process too, which would then send every scheduled child swap a second
+    time.
+    """
+    tracker.start()
+    scheduler.start()
+    prices.start()
+
 
 @app.route("/")
 def index():
@@ -93,6 +138,8 @@ def swap():
               type: string
             bscscan_url:
               type: string
+            status_url:
+              type: string
       400:
         description: Missing input
       500:
@@ -111,11 +158,19 @@ def swap():
         )
 
     try:
-        # Call backend swapper logic
+        # Call backend swapper logic; the swap may be mined before it is
+        # tracked, so the tracker rescans from the block seen before sending
+        from_block = tracker.last_block
         tx_hash = perform_swap(token_out, amount_bnb, slippage, router_address)
+        tracker.track(tx_hash, from_block)
         bscscan_url = f"https://testnet.bscscan.com/tx/{tx_hash}"
         return jsonify(
-            {"status": "success", "tx_hash": tx_hash, "bscscan_url": bscscan_url}
+            {
+                "status": "success",
+                "tx_hash": tx_hash,
+                "bscscan_url": bscscan_url,
+                "status_url": f"/tx/{tx_hash}",
+            }
         )
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -168,6 +223,8 @@ def token_swap():
               type: string
             bscscan_url:
               type: string
+            status_url:
+              type: string
       400:
         description: Missing input
       500:
@@ -184,18 +241,411 @@ def token_swap():
         return jsonify({"status": "error", "message": "Missing required fields"}), 400
 
     try:
-        # Call backend swapper logic
+        # Call backend swapper logic (see /swap for from_block)
+        from_block = tracker.last_block
         tx_hash = perform_token_to_token_swap(
             token_in, token_out, amount_in, slippage, router_address
         )
+        tracker.track(tx_hash, from_block)
         bscscan_url = f"https://testnet.bscscan.com/tx/{tx_hash}"
         return jsonify(
-            {"status": "success", "tx_hash": tx_hash, "bscscan_url": bscscan_url}
+            {
+                "status": "success",
+                "tx_hash": tx_hash,
+                "bscscan_url": bscscan_url,
+                "status_url": f"/tx/{tx_hash}",
+            }
+        )
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+def parse_amount(value):
+    """
+    A positive, finite token amount from a JSON number or numeric string.
+
+    Raises:
+        ValueError: If the value is not one.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"amount must be a number, not {value!r}")
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"amount must be a number, not {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"amount must be a finite number, not {value!r}")
+    if amount <= 0:
+        raise ValueError(f"amount must be above zero, not {value!r}")
+    return amount
+
+
+@app.route("/quote/batch", methods=["POST"])
+def batch_quote():
+    """
+    Quote many swaps against one reserve snapshot without sending transactions
+    ---
+    summary: Batch quote (token_in, token_out, amount) entries
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            quotes:
+              type: array
+              description: Matrix of [token_in, token_out, amount_in] rows
+              items:
+                type: array
+                items: {}
+              example:
+                - ["0xae13d989dac2f0debff460ac112a837c89baa7cd", "0xFa60D973F7642B748046464e165A65B7323b0DEE", 0.01]
+                - ["0xae13d989dac2f0debff460ac112a837c89baa7cd", "0xFa60D973F7642B748046464e165A65B7323b0DEE", 1]
+            router_address:
+              type: string
+              description: Router contract address
+              example: "0x9ac64cc6e4415144c455bd8e4837fea55603e5c3"
+    responses:
+      200:
+        description: One row per quote, in request order
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+            block_number:
+              type: integer
+            columns:
+              type: array
+              items:
+                type: string
+              example: ["amount_out", "amount_out_wei", "path"]
+            results:
+              type: array
+              items:
+                type: array
+                items: {}
+            errors:
+              type: object
+              description: Row index → error message for rows that failed
+      400:
+        description: Missing or malformed input
+      500:
+        description: Quote error
+    """
+    data = request.json
+    quotes = data.get("quotes")
+    router_address = data.get("router_address")
+
+    if not router_address or not isinstance(quotes, list) or not quotes:
+        return (
+            jsonify(
+                {"status": "error", "message": "quotes and router_address are required"}
+            ),
+            400,
+        )
+
+    rows = []
+    for i, quote in enumerate(quotes):
+        try:
+            token_in, token_out, amount = quote
+            rows.append(
+                (
+                    Web3.to_checksum_address(token_in),
+                    Web3.to_checksum_address(token_out),
+                    parse_amount(amount),
+                )
+            )
+        except (TypeError, ValueError) as e:
+            return (
+                jsonify({"status": "error", "message": f"Invalid quote row {i}: {e}"}),
+                400,
+            )
+
+    try:
+        # One bulk metadata lookup covers every token in the matrix; a row
+        # with a token that is not a BEP-20 fails on its own
+        metadata, token_errors = tokens.lookup({t for row in rows for t in row[:2]})
+        errors, quoted, entries = {}, [], []
+        for i, (token_in, token_out, amount) in enumerate(rows):
+            error = token_errors.get(token_in) or token_errors.get(token_out)
+            if not error:
+                amount_in = to_base_units(amount, metadata[token_in].decimals)
+                if amount_in == 0:
+                    error = f"{amount} is less than one base unit of {token_in}"
+            if error:
+                errors[i] = error
+            else:
+                quoted.append(i)
+                entries.append((token_in, token_out, amount_in))
+        block_number, amounts_out, paths, quote_errors = quote_batch(
+            entries, router_address
+        )
+        errors.update({quoted[j]: message for j, message in quote_errors.items()})
+        results = [[None, None, None] for _ in rows]
+        for i, amount, path in zip(quoted, amounts_out, paths):
+            results[i] = [
+                (
+                    None
+                    if amount is None
+                    else from_base_units(amount, metadata[rows[i][1]].decimals)
+                ),
+                None if amount is None else str(amount),
+                path,
+            ]
+        return jsonify(
+            {
+                "status": "success",
+                "block_number": block_number,
+                "columns": ["amount_out", "amount_out_wei", "path"],
+                "results": results,
+                "errors": {str(i): message for i, message in errors.items()},
+            }
+        )
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/tx/<tx_hash>")
+def tx_status(tx_hash):
+    """
+    Status of a swap submitted through /swap or /token-swap
+    ---
+    summary: Swap confirmation status
+    parameters:
+      - in: path
+        name: tx_hash
+        type: string
+        required: true
+    responses:
+      200:
+        description: pending, success, failed or dropped
+        schema:
+          type: object
+          properties:
+            tx_hash:
+              type: string
+            status:
+              type: string
+            block_number:
+              type: integer
+            gas_used:
+              type: integer
+      404:
+        description: Hash was not submitted through this server
+    """
+    status = tracker.status(tx_hash)
+    if status is None:
+        return jsonify({"status": "error", "message": "Unknown transaction"}), 404
+    return jsonify(status)
+
+
+@app.route("/tx/stream")
+def tx_stream():
+    """
+    Server-sent events stream of swap confirmations
+    ---
+    summary: Stream swap confirmations (text/event-stream)
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: One `data:` event (status JSON) per resolved swap
+    """
+    subscriber = tracker.subscribe()
+
+    def events():
+        try:
+            while True:
+                try:
+                    status = subscriber.get(timeout=15)
+                    yield f"data: {json.dumps(status)}\n\n"
+                except queue.Empty:
+                    # Comment line keeps idle connections open through proxies
+                    yield ": keep-alive\n\n"
+        finally:
+            tracker.unsubscribe(subscriber)
+
+    return Response(events(), mimetype="text/event-stream")
+
+
+@app.route("/orders", methods=["POST"])
+def create_order():
+    """
+    Split a large BEP-20 → BEP-20 swap into child swaps over time or blocks
+    ---
+    summary: Schedule a TWAP/DCA token swap
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            token_in:
+              type: string
+              description: Address of input BEP-20 token
+              example: "0x..."
+            token_out:
+              type: string
+              description: Address of output BEP-20 token
+              example: "0x..."
+            amount_in:
+              type: number
+              description: Total amount of input token to swap
+              example: 100
+            slippage:
+              type: number
+              description: Slippage percentage per child swap
+              example: 1
+            router_address:
+              type: string
+              description: Router contract address
+              example: "0x9ac64cc6e4415144c455bd8e4837fea55603e5c3"
+            interval:
+              type: integer
+              description: Gap between child swaps
+              example: 60
+            interval_unit:
+              type: string
+              enum: [seconds, blocks]
+              example: seconds
+            max_impact_percent:
+              type: number
+              description: Price impact cap used to size each child swap
+              example: 0.5
+    responses:
+      200:
+        description: Order scheduled
+      400:
+        description: Missing or invalid input
+      500:
+        description: Scheduling error
+    """
+    data = request.json
+    token_in = data.get("token_in")
+    token_out = data.get("token_out")
+    amount_in = float(data.get("amount_in", 0))
+    router_address = data.get("router_address")
+
+    if not all([token_in, token_out, amount_in, router_address]):
+        return jsonify({"status": "error", "message": "Missing required fields"}), 400
+
+    try:
+        order = scheduler.create_order(
+            token_in,
+            token_out,
+            amount_in,
+            float(data.get("slippage", 1)),
+            router_address,
+            int(data.get("interval", 60)),
+            data.get("interval_unit", "seconds"),
+            float(data.get("max_impact_percent", 1)),
         )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "success", "order": scheduler.get_order(order["id"])})
+
+
+@app.route("/orders/<order_id>", methods=["GET", "DELETE"])
+def order_progress(order_id):
+    """
+    Progress of a scheduled order, or cancel it with DELETE
+    ---
+    summary: Get or cancel a TWAP/DCA order
+    parameters:
+      - in: path
+        name: order_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: Order state with filled amount, progress and child swaps
+      404:
+        description: Unknown order
+    """
+    if request.method == "DELETE":
+        order = scheduler.cancel_order(order_id)
+    else:
+        order = scheduler.get_order(order_id)
+    if order is None:
+        return jsonify({"status": "error", "message": "Unknown order"}), 404
+    return jsonify({"status": "success", "order": order})
+
+
+@app.route("/prices")
+def price_snapshot():
+    """
+    Latest prices of the tracked pairs
+    ---
+    summary: Current price of every tracked pair
+    responses:
+      200:
+        description: One entry per pair (price = token1 per token0)
+    """
+    _, snapshot = prices.changes_since(0)
+    return jsonify({"status": "success", "prices": snapshot})
+
+
+@app.route("/prices/stream")
+def price_stream():
+    """
+    Server-sent events stream of tracked pair prices
+    ---
+    summary: Stream live prices (text/event-stream)
+    produces:
+      - text/event-stream
+    parameters:
+      - in: query
+        name: interval
+        type: number
+        description: Minimum seconds between events (at least PRICE_MIN_INTERVAL)
+      - in: query
+        name: pairs
+        type: string
+        description: Comma-separated pair addresses to receive (default all)
+    responses:
+      200:
+        description: >
+          The first event holds every price; later events hold only the pairs
+          that changed since the previous one
+      400:
+        description: Invalid pair address
+    """
+    interval = client_interval(request.args.get("interval"))
+    try:
+        pairs = client_pairs(request.args.get("pairs"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    def events():
+        version, sent_at = 0, 0.0
+        while True:
+            # Per-client throttle: at most one event per interval, and only
+            # the latest price of each pair is sent
+            time.sleep(max(sent_at + interval - time.monotonic(), 0))
+            if not prices.wait(version, timeout=15):
+                yield ": keep-alive\n\n"
+                continue
+            version, changed = prices.changes_since(version, pairs)
+            if changed:
+                sent_at = time.monotonic()
+                yield f"data: {json.dumps(changed)}\n\n"
+
+    return Response(events(), mimetype="text/event-stream")
 
 
 # Run Flask app
 if __name__ == "__main__":
+    # With the reloader, this runs in the watcher process and again in the
+    # server process, which Werkzeug marks with WERKZEUG_RUN_MAIN
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     app.run(debug=True)
@@ -0,0 +1,250 @@
+"""
+===============================================================================
+  async_app.py - Async (ASGI) variant of the BNB Smart Chain DEX API Server
+===============================================================================
+
+Description:
+    FastAPI counterpart of app.py for serving many concurrent swap requests
+    from a single process. Request handlers await the AsyncWeb3-based
+    functions in async_swapper.py, so a worker is never blocked on an RPC
+    round trip, and all swaps share one pooled keep-alive RPC session.
+
+    - Same /swap and /token-swap request and response bodies as app.py
+    - At most MAX_CONCURRENT_SWAPS swaps are in flight at once; requests
+      waiting longer than SWAP_QUEUE_TIMEOUT seconds get a 503
+    - Provides live Swagger documentation at /apidocs
+
+Endpoints:
+    1. GET  /              - Renders the frontend (MetaMask-enabled swap UI)
+    2. POST /swap          - Performs a swap from tBNB to another token
+    3. POST /token-swap    - Swaps one BEP-20 token for another
+    4. GET  /tx/{tx_hash}  - Status of a submitted swap
+    5. GET  /prices        - Latest prices of the tracked pairs
+    6. GET  /prices/stream - Server-sent events with throttled price updates
+
+Run:
+    uvicorn async_app:app --workers 1 --port 5000
+
+===============================================================================
+"""
+
+import os
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import async_swapper
+from swapper import web3
+from tx_tracker import TxTracker
+from price_feed import configured_feed, client_interval, client_pairs
+
+# Swaps processed at the same time; further requests queue for a free slot
+MAX_CONCURRENT_SWAPS = int(os.getenv("MAX_CONCURRENT_SWAPS", 32))
+# Seconds a request may wait for a slot before it is rejected with 503
+SWAP_QUEUE_TIMEOUT = float(os.getenv("SWAP_QUEUE_TIMEOUT", 30))
+
+INDEX_HTML = os.path.join(os.path.dirname(__file__), "templates", "index.html")
+
+# Confirmation tracking polls in its own thread, off the request path
+tracker = TxTracker(web3)
+prices = configured_feed(web3)
+swap_slots = asyncio.Semaphore(MAX_CONCURRENT_SWAPS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await async_swapper.connect()
+    tracker.start()
+    prices.start()
+    yield
+    await async_swapper.disconnect()
+
+
+app = FastAPI(
+    title="PancakeSwap Testnet Swap API",
+    docs_url="/apidocs",
+    lifespan=lifespan,
+)
+
+
+class SwapRequest(BaseModel):
+    token_out: Optional[str] = Field(
+        None,
+        description="Address of the token to buy",
+        examples=["0xFa60D973F7642B748046464e165A65B7323b0DEE"],
+    )
+    amount_bnb: float = Field(0.01, description="Amount of tBNB to swap")
+    slippage: float = Field(1, description="Slippage percentage")
+    router_address: Optional[str] = Field(
+        None,
+        description="PancakeSwap-compatible router contract",
+        examples=["0x9ac64cc6e4415144c455bd8e4837fea55603e5c3"],
+    )
+
+
+class TokenSwapRequest(BaseModel):
+    token_in: Optional[str] = Field(None, description="Address of input BEP-20 token")
+    token_out: Optional[str] = Field(None, description="Address of output BEP-20 token")
+    amount_in: float = Field(0, description="Amount of input token to swap")
+    slippage: float = Field(1, description="Slippage percentage")
+    router_address: Optional[str] = Field(
+        None,
+        description="Router contract address",
+        examples=["0x9ac64cc6e4415144c455bd8e4837fea55603e5c3"],
+    )
+
+
+class SwapResponse(BaseModel):
+    status: str
+    tx_hash: str
+    bscscan_url: str
+    status_url: str
+
+
+SWAP_ERRORS = {
+    400: {"description": "Missing input"},
+    500: {"description": "Swap error"},
+    503: {"description": "Too many swaps in flight"},
+}
+
+
+def error(message, status_code):
+    return JSONResponse({"status": "error", "message": message}, status_code)
+
+
+async def run_swap(swap, *args):
+    """Runs one swap inside a concurrency slot and builds the response body."""
+    try:
+        await asyncio.wait_for(swap_slots.acquire(), SWAP_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return error("Server busy, retry later", 503)
+    # The swap may be mined before it is tracked; rescan from here
+    from_block = tracker.last_block
+    try:
+        tx_hash = await swap(*args)
+    except Exception as e:
+        return error(str(e), 500)
+    finally:
+        swap_slots.release()
+
+    tracker.track(tx_hash, from_block)
+    return {
+        "status": "success",
+        "tx_hash": tx_hash,
+        "bscscan_url": f"https://testnet.bscscan.com/tx/{tx_hash}",
+        "status_url": f"/tx/{tx_hash}",
+    }
+
+
+@app.get("/", include_in_schema=False)
+async def index():
+    # Serve the frontend (MetaMask-based index.html)
+    return FileResponse(INDEX_HTML)
+
+
+@app.post(
+    "/swap",
+    summary="Swap tBNB for a token",
+    response_model=SwapResponse,
+    responses=SWAP_ERRORS,
+)
+async def swap(body: SwapRequest):
+    """
+    Swap tBNB for selected token using a PancakeSwap-compatible router on BNB Testnet
+    """
+    if not body.router_address:
+        return error("router_address is required", 400)
+    return await run_swap(
+        async_swapper.perform_swap,
+        body.token_out,
+        body.amount_bnb,
+        body.slippage,
+        body.router_address,
+    )
+
+
+@app.post(
+    "/token-swap",
+    summary="Swap BEP20 → BEP20 tokens",
+    response_model=SwapResponse,
+    responses=SWAP_ERRORS,
+)
+async def token_swap(body: TokenSwapRequest):
+    """
+    Swap one BEP-20 token for another using a custom router on BNB Testnet
+    """
+    if not all([body.token_in, body.token_out, body.amount_in, body.router_address]):
+        return error("Missing required fields", 400)
+    return await run_swap(
+        async_swapper.perform_token_to_token_swap,
+        body.token_in,
+        body.token_out,
+        body.amount_in,
+        body.slippage,
+        body.router_address,
+    )
+
+
+@app.get(
+    "/tx/{tx_hash}",
+    summary="Swap confirmation status",
+    responses={404: {"description": "Hash was not submitted through this server"}},
+)
+async def tx_status(tx_hash: str):
+    """Status of a swap submitted through /swap or /token-swap"""
+    status = tracker.status(tx_hash)
+    if status is None:
+        return error("Unknown transaction", 404)
+    return status
+
+
+@app.get("/prices", summary="Current price of every tracked pair")
+async def price_snapshot():
+    """Latest prices of the tracked pairs (price = token1 per token0)"""
+    _, snapshot = prices.changes_since(0)
+    return {"status": "success", "prices": snapshot}
+
+
+@app.get(
+    "/prices/stream",
+    summary="Stream live prices (text/event-stream)",
+    responses={400: {"description": "Invalid pair address"}},
+)
+async def price_stream(interval: Optional[float] = None, pairs: Optional[str] = None):
+    """
+    The first event holds every price; later events hold only the pairs that
+    changed since the previous one, at most one event per `interval` seconds.
+    """
+    interval = client_interval(interval)
+    try:
+        pairs = client_pairs(pairs)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    async def events():
+        # Each client only compares the feed version once per interval, so
+        # idle connections cost a timer instead of a thread
+        version, idle = 0, 0.0
+        while True:
+            if prices.version > version:
+                version, changed = prices.changes_since(version, pairs)
+                if changed:
+                    idle = 0.0
+                    yield f"data: {json.dumps(changed)}\n\n"
+            elif idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(interval)
+            idle += interval
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# Run with a single worker: the wallet pool's local nonces are per process
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,345 @@
+"""
+async_swapper.py - AsyncWeb3 versions of the swapper functions
+
+Used by async_app.py. The swap flow is the same as in swapper.py (local
+quote from per-block reserves, route finder, cached allowances, eth_call
+simulation, wallet pool with local nonces), but every RPC round trip is
+awaited on one AsyncWeb3 client instead of blocking a server thread:
+
+- The client keeps a single aiohttp session (see connect()), so all swaps
+  share up to RPC_MAX_CONNECTIONS keep-alive connections to the node.
+- Independent reads of one swap - reserves of every hop and the wallet
+  nonce - are sent concurrently.
+- ABIs, quoting math, the pair graph and the token registry are shared with
+  swapper.py. Route search and first-time token metadata lookups are
+  blocking and run in a worker thread.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import aiohttp
+from web3 import AsyncWeb3, Web3
+import swapper
+from swapper import (
+    RPC_URL,
+    WBNB,
+    BLOCK_POLL_INTERVAL,
+    ENABLE_SIMULATION,
+    ROUTER_FACTORY_ABI,
+    FACTORY_ABI,
+    PAIR_ABI,
+    SWAP_ETH_ABI,
+    SWAP_TOKENS_ABI,
+    ZERO_ADDRESS,
+    sort_tokens,
+    get_amount_out,
+    min_amount_out,
+    apply_simulation,
+)
+from allowance import AsyncAllowanceManager
+from simulator import AsyncSwapSimulator
+from token_registry import after_transfer_fees, to_base_units
+from wallet_pool import AsyncWalletPool
+
+# Keep-alive connections the shared aiohttp session may open to RPC_URL
+RPC_MAX_CONNECTIONS = int(os.getenv("RPC_MAX_CONNECTIONS", 100))
+
+web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(RPC_URL))
+allowances = AsyncAllowanceManager(web3)
+simulator = AsyncSwapSimulator(web3)
+
+# Same cache layout as swapper.py, owned by the event loop
+_factories = {}  # router -> factory
+_pairs = {}  # (factory, token0, token1) -> pair
+_reserves = {}  # pair -> (block_number, reserve0, reserve1)
+_block = {"number": None, "checked_at": 0.0}
+_chain = {"id": None}
+_pool = None  # AsyncWalletPool, created by connect()
+_block_lock = asyncio.Lock()
+
+
+async def connect():
+    """
+    Opens the shared RPC session and the wallet pool. Call once at startup,
+    from the event loop that serves requests.
+    """
+    global _pool
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=RPC_MAX_CONNECTIONS)
+    )
+    await web3.provider.cache_async_session(session)
+    _chain["id"] = await web3.eth.chain_id
+    _pool = AsyncWalletPool(web3)
+    _pool.start_rebalancer()
+
+
+async def disconnect():
+    """Closes the shared RPC session."""
+    await web3.provider.disconnect()
+
+
+async def current_block_number():
+    """Returns the latest block number, polling the node at most once per interval."""
+    # Concurrent swaps wait for one eth_blockNumber instead of each sending one
+    async with _block_lock:
+        now = time.monotonic()
+        if (
+            _block["number"] is None
+            or now - _block["checked_at"] >= BLOCK_POLL_INTERVAL
+        ):
+            _block["number"] = await web3.eth.block_number
+            _block["checked_at"] = now
+        return _block["number"]
+
+
+async def get_factory(router_address):
+    router_address = Web3.to_checksum_address(router_address)
+    factory = _factories.get(router_address)
+    if factory is None:
+        router = web3.eth.contract(address=router_address, abi=ROUTER_FACTORY_ABI)
+        factory = await router.functions.factory().call()
+        _factories[router_address] = factory
+    return factory
+
+
+async def get_pair_address(factory, token_a, token_b):
+    token0, token1 = sort_tokens(token_a, token_b)
+    key = (factory, token0, token1)
+    if key not in _pairs:
+        contract = web3.eth.contract(address=factory, abi=FACTORY_ABI)
+        pair = await contract.functions.getPair(token0, token1).call()
+        if pair == ZERO_ADDRESS:
+            return None
+        _pairs[key] = pair
+    return _pairs[key]
+
+
+async def get_reserves(token_a, token_b, router_address):
+    """
+    Returns (reserve_a, reserve_b) for a token pair, read once per block.
+
+    Raises:
+        ValueError: If the router's factory has no pair for the two tokens.
+    """
+    token_a = Web3.to_checksum_address(token_a)
+    token_b = Web3.to_checksum_address(token_b)
+    factory, block_number = await asyncio.gather(
+        get_factory(router_address), current_block_number()
+    )
+    pair = await get_pair_address(factory, token_a, token_b)
+    if pair is None:
+        raise ValueError(f"No liquidity pair for {token_a} / {token_b}")
+
+    cached = _reserves.get(pair)
+    if cached is None or cached[0] != block_number:
+        contract = web3.eth.contract(address=pair, abi=PAIR_ABI)
+        reserve0, reserve1, _ = await contract.functions.getReserves().call(
+            block_identifier=block_number
+        )
+        cached = (block_number, reserve0, reserve1)
+        _reserves[pair] = cached
+
+    _, reserve0, reserve1 = cached
+    if sort_tokens(token_a, token_b)[0] == token_a:
+        return reserve0, reserve1
+    return reserve1, reserve0
+
+
+async def quote_amounts_out(amount_in, path, router_address):
+    """Local router.getAmountsOut; the reserves of all hops are read concurrently."""
+    reserves = await asyncio.gather(
+        *(get_reserves(a, b, router_address) for a, b in zip(path, path[1:]))
+    )
+    amounts = [amount_in]
+    for reserve_in, reserve_out in reserves:
+        amounts.append(get_amount_out(amounts[-1], reserve_in, reserve_out))
+    return amounts
+
+
+async def find_route(token_in, token_out, amount_in, router_address):
+    """swapper.find_route, run off the event loop."""
+    return await asyncio.to_thread(
+        swapper.find_route, token_in, token_out, amount_in, router_address
+    )
+
+
+async def get_tokens(addresses):
+    """Token metadata from the shared registry; unknown tokens fetched in a thread."""
+    return await asyncio.to_thread(swapper.tokens.get_many, addresses)
+
+
+def get_wallet_pool():
+    if _pool is None:
+        raise RuntimeError("async_swapper.connect() has not been awaited")
+    return _pool
+
+
+async def _send(txn, wallet):
+    signed = web3.eth.account.sign_transaction(txn, private_key=wallet.key)
+    tx_hash = await web3.eth.send_raw_transaction(
+        getattr(signed, "rawTransaction", getattr(signed, "raw_transaction"))
+    )
+    return web3.to_hex(tx_hash)
+
+
+async def perform_swap(token_out, amount_bnb, slippage_percent, router_address):
+    """
+    Async swapper.perform_swap: tBNB → token from any free pool wallet that
+    can cover it (else the home wallet), delivered to the home wallet.
+    """
+    pool = get_wallet_pool()
+    # value + the swap's gas budget; pool wallets only hold gas money, so
+    # larger swaps are sent from the home wallet
+    spend = web3.to_wei(amount_bnb, "ether") + 250000 * web3.to_wei("5", "gwei")
+    async with pool.acquire(spend=spend) as wallet:
+        try:
+            return await _swap_exact_eth_for_tokens(
+                wallet,
+                pool.home.address,
+                token_out,
+                amount_bnb,
+                slippage_percent,
+                router_address,
+            )
+        except Exception:
+            wallet.reset_nonce()
+            raise
+
+
+async def _swap_exact_eth_for_tokens(
+    wallet, recipient, token_out, amount_bnb, slippage_percent, router_address
+):
+    router = web3.eth.contract(
+        address=Web3.to_checksum_address(router_address), abi=SWAP_ETH_ABI
+    )
+    logging.info(
+        f"Swapping {amount_bnb} tBNB → {token_out} via router {router_address}"
+    )
+
+    amount_in_wei = web3.to_wei(amount_bnb, "ether")
+    deadline = int(time.time()) + 600
+
+    path = await find_route(
+        WBNB, Web3.to_checksum_address(token_out), amount_in_wei, router_address
+    )
+    amounts, metadata, nonce = await asyncio.gather(
+        quote_amounts_out(amount_in_wei, path, router_address),
+        get_tokens(path[1:]),
+        wallet.next_nonce(),
+    )
+    # The quote ignores transfer fees, so take them off before the slippage
+    expected_out = after_transfer_fees(amounts[-1], metadata.values())
+    amount_out_min = min_amount_out(expected_out, slippage_percent)
+
+    if any(token.fee_on_transfer for token in metadata.values()):
+        swap_fn = router.functions.swapExactETHForTokensSupportingFeeOnTransferTokens
+    else:
+        swap_fn = router.functions.swapExactETHForTokens
+
+    txn = await swap_fn(amount_out_min, path, recipient, deadline).build_transaction(
+        {
+            "from": wallet.address,
+            "value": amount_in_wei,
+            "gas": 250000,
+            "gasPrice": web3.to_wei("5", "gwei"),
+            "nonce": nonce,
+            "chainId": _chain["id"],
+        }
+    )
+
+    if ENABLE_SIMULATION:
+        intent = (wallet.address, tuple(path), amount_in_wei, amount_out_min, recipient)
+        apply_simulation(
+            txn, await simulator.simulate(txn, await current_block_number(), intent)
+        )
+
+    tx_hex = await _send(txn, wallet)
+    logging.info(f"✅ Swap submitted: https://testnet.bscscan.com/tx/{tx_hex}")
+    return tx_hex
+
+
+async def perform_token_to_token_swap(
+    token_in, token_out, amount_in, slippage_percent, router_address
+):
+    """Async swapper.perform_token_to_token_swap, sent from the home wallet."""
+    async with get_wallet_pool().acquire(index=0) as wallet:
+        try:
+            return await _swap_exact_tokens_for_tokens(
+                wallet, token_in, token_out, amount_in, slippage_percent, router_address
+            )
+        except Exception:
+            wallet.reset_nonce()
+            raise
+
+
+async def _swap_exact_tokens_for_tokens(
+    wallet, token_in, token_out, amount_in, slippage_percent, router_address
+):
+    token_in = Web3.to_checksum_address(token_in)
+    token_out = Web3.to_checksum_address(token_out)
+    router_address = Web3.to_checksum_address(router_address)
+    router = web3.eth.contract(address=router_address, abi=SWAP_TOKENS_ABI)
+
+    token_in_decimals = (await get_tokens([token_in]))[token_in].decimals
+    amount_in_wei = to_base_units(amount_in, token_in_decimals)
+    gas_price = web3.to_wei("5", "gwei")
+    deadline = int(time.time()) + 600
+
+    path = await find_route(token_in, token_out, amount_in_wei, router_address)
+    amounts, metadata, nonce = await asyncio.gather(
+        quote_amounts_out(amount_in_wei, path, router_address),
+        get_tokens(path),
+        wallet.next_nonce(),
+    )
+    # The quote ignores transfer fees, so take them off before the slippage
+    expected_out = after_transfer_fees(amounts[-1], metadata.values())
+    amount_out_min = min_amount_out(expected_out, slippage_percent)
+
+    approval_tx = await allowances.ensure_allowance(
+        wallet,
+        token_in,
+        router_address,
+        amount_in_wei,
+        nonce,
+        gas_price,
+        decimals=token_in_decimals,
+        chain_id=_chain["id"],
+    )
+    if approval_tx is not None:
+        nonce = await wallet.next_nonce()
+
+    if any(token.fee_on_transfer for token in metadata.values()):
+        swap_fn = router.functions.swapExactTokensForTokensSupportingFeeOnTransferTokens
+    else:
+        swap_fn = router.functions.swapExactTokensForTokens
+
+    swap_txn = await swap_fn(
+        amount_in_wei, amount_out_min, path, wallet.address, deadline
+    ).build_transaction(
+        {
+            "from": wallet.address,
+            "gas": 300000,
+            "gasPrice": gas_price,
+            "nonce": nonce,
+            "chainId": _chain["id"],
+        }
+    )
+
+    if ENABLE_SIMULATION and approval_tx is None:
+        intent = (wallet.address, tuple(path), amount_in_wei, amount_out_min)
+        apply_simulation(
+            swap_txn,
+            await simulator.simulate(swap_txn, await current_block_number(), intent),
+        )
+
+    try:
+        tx_hex = await _send(swap_txn, wallet)
+    except Exception:
+        allowances.invalidate(token_in, wallet.address, router_address)
+        raise
+    allowances.record_spend(token_in, wallet.address, router_address, amount_in_wei)
+
+    logging.info(f"✅ Token swap submitted: https://testnet.bscscan.com/tx/{tx_hex}")
+    return tx_hex
@@ -0,0 +1,120 @@
+"""
+load_test.py - Requests per second of the swap API against a local chain
+
+Fires --requests swap requests at --concurrency in flight and reports
+throughput and latency percentiles, so the Flask server (app.py) and the
+ASGI server (async_app.py) can be compared at the same worker count.
+
+Local chain (anvil fork of BNB Testnet; dev mnemonic accounts are funded):
+    anvil --fork-url https://data-seed-prebsc-1-s1.bnbchain.org:8545 \\
+          --mnemonic "test test test test test test test test test test test junk"
+
+Servers (one worker process each):
+    export RPC_URL=http://127.0.0.1:8545 WALLET_POOL_SIZE=8 \\
+           MNEMONIC="test test test test test test test test test test test junk"
+    flask --app app run --port 5000
+    uvicorn async_app:app --workers 1 --port 5001
+
+Usage:
+    python benchmarks/load_test.py --url http://127.0.0.1:5001 \\
+        [--endpoint /swap] [--requests 500] [--concurrency 50] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+import httpx
+
+# tCAKE on the PancakeSwap testnet router, as in the README walkthrough
+DEFAULT_BODIES = {
+    "/swap": {
+        "token_out": "0xFa60D973F7642B748046464e165A65B7323b0DEE",
+        "amount_bnb": 0.001,
+        "slippage": 5,
+        "router_address": "0x9ac64cc6e4415144c455bd8e4837fea55603e5c3",
+    },
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run(url, endpoint, body, requests, concurrency, timeout):
+    latencies = []
+    statuses = Counter()
+    slots = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as c:
+
+        async def one():
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    response = await c.post(endpoint, json=body)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "url": url,
+        "endpoint": endpoint,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests / elapsed, 2),
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 1)
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+        },
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", default="/swap")
+    parser.add_argument(
+        "--body", help="JSON request body (defaults to a small tBNB → tCAKE swap)"
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--json", action="store_true", help="Print raw JSON only")
+    args = parser.parse_args()
+
+    body = json.loads(args.body) if args.body else DEFAULT_BODIES.get(args.endpoint)
+    if body is None:
+        parser.error(f"--body is required for {args.endpoint}")
+
+    report = asyncio.run(
+        run(
+            args.url, args.endpoint, body, args.requests, args.concurrency, args.timeout
+        )
+    )
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"{args.requests} × POST {args.url}{args.endpoint} @ {args.concurrency}")
+    print(f"  throughput: {report['requests_per_s']} req/s")
+    latency = report["latency_ms"]
+    print(
+        f"  latency:    p50 {latency['p50']} ms, "
+        f"p95 {latency['p95']} ms, p99 {latency['p99']} ms"
+    )
+    print(f"  statuses:   {report['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
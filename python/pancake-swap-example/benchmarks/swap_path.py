@@ -0,0 +1,430 @@
+"""
+swap_path.py - Per-stage swap latency, RPC calls per swap and swaps/s
+
+Deploys a PancakeSwap V2-compatible stack to a local dev chain (WETH9 as
+WBNB, factory, router and two test tokens with liquidity), then runs
+swapper.perform_swap and swapper.perform_token_to_token_swap at scale and
+prints one JSON report, so results can be tracked across commits.
+
+The report has one entry per swap function:
+- swaps_per_s:        completed swaps / wall time
+- latency_ms:         mean/p50/p95 per swap, in total and per stage
+                      (exclusive time: nested stages are not double counted;
+                      "other" is ABI encoding, tx building and glue code)
+- rpc_calls_per_swap: JSON-RPC calls per swap by method, plus HTTP round trips
+                      (a batch counts as one round trip)
+
+Local chain and contracts (any chain id works):
+    anvil
+    npm install @uniswap/v2-core@1.0.1 @uniswap/v2-periphery@1.1.0-beta.0
+
+Usage:
+    python benchmarks/swap_path.py --artifacts node_modules/@uniswap \\
+        [--rpc-url http://127.0.0.1:8545] [--swaps 200] [--concurrency 1] \\
+        [--output report.json] [--baseline previous.json --max-regression 20]
+
+Exits with status 1 when --baseline is given and swaps/s or p50 latency of
+either swap function is more than --max-regression percent worse.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from eth_account import Account
+from web3 import Web3
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+DEV_MNEMONIC = "test test test test test test test test test test test junk"
+ARTIFACT_NAMES = {
+    "factory": ["UniswapV2Factory"],
+    "router": ["UniswapV2Router02"],
+    "weth": ["WETH9", "WETH9Mock"],
+    "token": ["ERC20", "ERC20Mock"],
+}
+TOKEN_SUPPLY = 10**9 * 10**18
+LIQUIDITY_TOKENS = 10**6 * 10**18
+LIQUIDITY_BNB = 100 * 10**18
+
+# Functions timed as stages, as (label, owner, attribute) resolved on swapper
+STAGES = [
+    ("wallet", "swapper", "get_wallet_pool"),
+    ("nonce", "PooledWallet", "next_nonce"),
+    ("token_metadata", "tokens", "get_many"),
+    ("route", "swapper", "find_route"),
+    ("quote", "swapper", "quote_amounts_out"),
+    ("allowance", "allowances", "ensure_allowance"),
+    ("abi_contract", "eth", "contract"),
+    ("simulate", "simulator", "simulate"),
+    ("sign", "account", "sign_transaction"),
+    ("send", "eth", "send_raw_transaction"),
+]
+
+
+# ------------------------------------------------------------------ deployment
+
+
+def load_artifacts(root):
+    """Finds compiled artifacts ({abi, bytecode} JSON) below `root` by name."""
+    found = {}
+    files = {path.stem: path for path in sorted(Path(root).rglob("*.json"))}
+    for role, names in ARTIFACT_NAMES.items():
+        for name in names:
+            if name not in files:
+                continue
+            artifact = json.loads(files[name].read_text())
+            bytecode = artifact.get("bytecode")
+            if isinstance(bytecode, dict):
+                bytecode = bytecode.get("object")
+            if bytecode:
+                found[role] = (artifact["abi"], Web3.to_hex(hexstr=bytecode))
+                break
+        else:
+            raise SystemExit(f"No {' / '.join(names)} artifact with bytecode in {root}")
+    return found
+
+
+def constructor_args(abi, name, symbol, supply):
+    """Arguments for test token constructors (supply) or (name, symbol, supply...)."""
+    inputs = next((e["inputs"] for e in abi if e["type"] == "constructor"), [])
+    args = []
+    for item in inputs:
+        if item["type"] == "string":
+            args.append(symbol if "symbol" in item["name"].lower() else name)
+        elif item["type"] == "uint8":
+            args.append(18)
+        else:
+            args.append(supply)
+    return args
+
+
+class Deployer:
+    """Sends deployment transactions from the home wallet of the mnemonic."""
+
+    def __init__(self, web3, account):
+        self.web3 = web3
+        self.account = account
+        self.nonce = web3.eth.get_transaction_count(account.address, "pending")
+        self.chain_id = web3.eth.chain_id
+
+    def send(self, build, value=0):
+        txn = build(
+            {
+                "from": self.account.address,
+                "value": value,
+                "gas": 6_000_000,
+                "gasPrice": self.web3.to_wei("5", "gwei"),
+                "nonce": self.nonce,
+                "chainId": self.chain_id,
+            }
+        )
+        signed = self.account.sign_transaction(txn)
+        tx_hash = self.web3.eth.send_raw_transaction(
+            getattr(signed, "rawTransaction", getattr(signed, "raw_transaction"))
+        )
+        self.nonce += 1
+        receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt["status"] != 1:
+            raise SystemExit(f"Deployment transaction reverted: {txn.get('to')}")
+        return receipt
+
+    def deploy(self, abi, bytecode, *args):
+        contract = self.web3.eth.contract(abi=abi, bytecode=bytecode)
+        receipt = self.send(contract.constructor(*args).build_transaction)
+        return self.web3.eth.contract(address=receipt["contractAddress"], abi=abi)
+
+    def call(self, fn, value=0):
+        return self.send(fn.build_transaction, value)
+
+
+def deploy_stack(rpc_url, artifacts, account):
+    """Deploys WBNB, factory, router and two liquid test tokens."""
+    web3 = Web3(Web3.HTTPProvider(rpc_url))
+    deployer = Deployer(web3, account)
+    owner = account.address
+
+    weth = deployer.deploy(*artifacts["weth"])
+    factory = deployer.deploy(*artifacts["factory"], owner)
+    router = deployer.deploy(*artifacts["router"], factory.address, weth.address)
+
+    tokens = {}
+    for symbol in ("BENCHA", "BENCHB"):
+        abi, bytecode = artifacts["token"]
+        args = constructor_args(abi, f"Benchmark {symbol}", symbol, TOKEN_SUPPLY)
+        token = deployer.deploy(abi, bytecode, *args)
+        deployer.call(token.functions.approve(router.address, 2**256 - 1))
+        deadline = int(time.time()) + 3600
+        deployer.call(
+            router.functions.addLiquidityETH(
+                token.address, LIQUIDITY_TOKENS, 0, 0, owner, deadline
+            ),
+            value=LIQUIDITY_BNB,
+        )
+        tokens[symbol] = token.address
+
+    deployer.call(
+        router.functions.addLiquidity(
+            tokens["BENCHA"],
+            tokens["BENCHB"],
+            LIQUIDITY_TOKENS,
+            LIQUIDITY_TOKENS,
+            0,
+            0,
+            owner,
+            int(time.time()) + 3600,
+        )
+    )
+    return {"weth": weth.address, "router": router.address, **tokens}
+
+
+# ----------------------------------------------------------------- measurement
+
+
+class Recorder:
+    """Collects exclusive per-stage time and RPC calls of the current swap."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def begin(self):
+        self.local.stages = defaultdict(float)
+        self.local.rpc = Counter()
+        self.local.stack = []
+
+    def active(self):
+        return getattr(self.local, "stack", None) is not None
+
+    def end(self):
+        stages, rpc = self.local.stages, self.local.rpc
+        self.local.stack = None
+        return stages, rpc
+
+    def timed(self, label, fn):
+        def wrapper(*args, **kwargs):
+            if not self.active():
+                return fn(*args, **kwargs)
+            stack = self.local.stack
+            stack.append(0.0)  # time spent in nested stages
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                self.local.stages[label] += elapsed - nested
+                if stack:
+                    stack[-1] += elapsed
+
+        return wrapper
+
+    def counted(self, fn, batch=False):
+        def wrapper(*args, **kwargs):
+            if self.active():
+                self.local.rpc["http_requests"] += 1
+                requests = args[0] if batch else [args]
+                for method, _ in requests:
+                    self.local.rpc[method] += 1
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def instrument(swapper, recorder):
+    from wallet_pool import PooledWallet
+
+    owners = {
+        "swapper": swapper,
+        "PooledWallet": PooledWallet,
+        "tokens": swapper.tokens,
+        "allowances": swapper.allowances,
+        "simulator": swapper.simulator,
+        "eth": swapper.web3.eth,
+        "account": swapper.web3.eth.account,
+    }
+    for label, owner, attribute in STAGES:
+        target = owners[owner]
+        setattr(target, attribute, recorder.timed(label, getattr(target, attribute)))
+
+    provider = swapper.web3.provider
+    provider.make_request = recorder.counted(provider.make_request)
+    provider.make_batch_request = recorder.counted(
+        provider.make_batch_request, batch=True
+    )
+    # Rebuild the middleware chain so it calls the counting make_request
+    provider._request_func_cache = (None, None)
+    provider._batch_request_func_cache = (None, None)
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "mean": round(statistics.fmean(values) * 1000, 3),
+        "p50": round(values[len(values) // 2] * 1000, 3),
+        "p95": round(values[min(int(len(values) * 0.95), len(values) - 1)] * 1000, 3),
+    }
+
+
+def run(recorder, swap, swaps, concurrency):
+    records, errors = [], Counter()
+
+    def one(_):
+        recorder.begin()
+        start = time.perf_counter()
+        try:
+            swap()
+        except Exception as e:
+            recorder.end()
+            errors[str(e)[:120]] += 1
+            return
+        total = time.perf_counter() - start
+        stages, rpc = recorder.end()
+        records.append((total, stages, rpc))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(swaps)))
+    elapsed = time.perf_counter() - started
+
+    if not records:
+        return {"swaps": 0, "errors": dict(errors)}
+    labels = [label for label, _, _ in STAGES]
+    latency = {"total": summarize([total for total, _, _ in records])}
+    for label in labels:
+        latency[label] = summarize([stages.get(label, 0.0) for _, stages, _ in records])
+    latency["other"] = summarize(
+        [total - sum(stages.values()) for total, stages, _ in records]
+    )
+    methods = sorted({method for _, _, rpc in records for method in rpc})
+    return {
+        "swaps": len(records),
+        "errors": dict(errors),
+        "swaps_per_s": round(len(records) / elapsed, 2),
+        "latency_ms": latency,
+        "rpc_calls_per_swap": {
+            method: round(sum(rpc[method] for _, _, rpc in records) / len(records), 2)
+            for method in methods
+        },
+    }
+
+
+def regressions(report, baseline, max_percent):
+    """Metrics more than max_percent worse than the baseline report."""
+    failures = []
+    for name, result in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not result.get("swaps") or not previous.get("swaps"):
+            continue
+        before, after = previous["swaps_per_s"], result["swaps_per_s"]
+        if after < before * (1 - max_percent / 100):
+            failures.append(f"{name} swaps_per_s {before} → {after}")
+        before = previous["latency_ms"]["total"]["p50"]
+        after = result["latency_ms"]["total"]["p50"]
+        if after > before * (1 + max_percent / 100):
+            failures.append(f"{name} p50 latency {before} ms → {after} ms")
+    return failures
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--artifacts", required=True, help="Directory of V2 builds")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--mnemonic", default=DEV_MNEMONIC)
+    parser.add_argument("--swaps", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previous JSON report to compare with")
+    parser.add_argument("--max-regression", type=float, default=20)
+    args = parser.parse_args()
+
+    Account.enable_unaudited_hdwallet_features()
+    home = Account.from_mnemonic(args.mnemonic, account_path="m/44'/60'/0'/0/0")
+    stack = deploy_stack(args.rpc_url, load_artifacts(args.artifacts), home)
+
+    # Known token metadata is seeded through the registry's disk cache, since
+    # a bare dev chain has no Multicall3 to fetch it from
+    cache = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump(
+        {
+            stack[symbol]: {"decimals": 18, "symbol": symbol, "fee_on_transfer": False}
+            for symbol in ("weth", "BENCHA", "BENCHB")
+        },
+        cache,
+    )
+    cache.close()
+    os.environ.update(
+        {
+            "RPC_URL": args.rpc_url,
+            "MNEMONIC": args.mnemonic,
+            "TOKEN_CACHE_PATH": cache.name,
+            "WALLET_POOL_SIZE": str(max(args.concurrency, 1) + 1),
+            "SWAP_FEE_BPS": "30",  # Uniswap V2 artifacts charge 0.3%
+            "PAIR_INDEX_FROM_BLOCK": "0",
+            "PAIR_INDEX_DIR": "",  # Fresh chain: never resume an old index
+        }
+    )
+
+    import swapper
+
+    logging.getLogger().setLevel(logging.WARNING)
+    swapper.WBNB = stack["weth"]
+    swapper.get_wallet_pool()
+    if swapper.ENABLE_ROUTE_FINDER:
+        swapper.get_pair_graph(stack["router"]).ready.wait(60)
+
+    recorder = Recorder()
+    instrument(swapper, recorder)
+    swaps = {
+        "perform_swap": lambda: swapper.perform_swap(
+            stack["BENCHA"], 0.001, 5, stack["router"]
+        ),
+        "perform_token_to_token_swap": lambda: swapper.perform_token_to_token_swap(
+            stack["BENCHA"], stack["BENCHB"], 1, 5, stack["router"]
+        ),
+    }
+    report = {
+        "commit": git_commit(),
+        "chain_id": swapper.web3.eth.chain_id,
+        "concurrency": args.concurrency,
+        "results": {},
+    }
+    for name, swap in swaps.items():
+        swap()  # warm-up: caches, first approval
+        report["results"][name] = run(recorder, swap, args.swaps, args.concurrency)
+    os.unlink(cache.name)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        failures = regressions(report, baseline, args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
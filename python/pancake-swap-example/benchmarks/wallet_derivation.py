@@ -0,0 +1,65 @@
+"""
+wallet_derivation.py - Per-swap wallet loading cost, before and after caching
+
+Compares the CPU time spent loading the signing wallet for each swap:
+- before: Account.from_mnemonic on every call (BIP-39 PBKDF2 each time)
+- after:  wallet_utils.get_wallet(), which derives once per (mnemonic, path)
+
+Usage:
+    python benchmarks/wallet_derivation.py [--swaps 200] [--pool-size 8]
+
+Uses MNEMONIC from the environment, or the well-known dev-chain test mnemonic.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault(
+    "MNEMONIC", "test test test test test test test test test test test junk"
+)
+
+from eth_account import Account  # noqa: E402
+import wallet_utils  # noqa: E402
+
+
+def cpu_per_call(fn, calls):
+    start = time.process_time()
+    for _ in range(calls):
+        fn()
+    return (time.process_time() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--swaps", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    mnemonic = os.environ["MNEMONIC"]
+    path = wallet_utils.ACCOUNT_PATH.format(index=0)
+
+    before = cpu_per_call(
+        lambda: Account.from_mnemonic(mnemonic, account_path=path), args.swaps
+    )
+
+    wallet_utils.clear_wallet_cache()
+    after = cpu_per_call(wallet_utils.get_wallet, args.swaps)
+
+    wallet_utils.clear_wallet_cache()
+    start = time.process_time()
+    wallet_utils.get_wallets(args.pool_size)
+    pool = time.process_time() - start
+
+    print(f"swaps:                        {args.swaps}")
+    print(f"per-swap CPU before (ms):     {before * 1000:.3f}")
+    print(f"per-swap CPU after (ms):      {after * 1000:.3f}")
+    print(f"speedup:                      {before / max(after, 1e-9):.1f}x")
+    print(f"derive {args.pool_size} pool wallets (ms):  {pool * 1000:.3f}")
+
+
+if __name__ == "__main__":
+    main()
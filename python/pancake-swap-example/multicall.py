@@ -0,0 +1,94 @@
+"""
+multicall.py - Bulk contract reads through Multicall3
+
+Packs many read-only calls into a single eth_call against the Multicall3
+contract (deployed at the same address on BSC mainnet and testnet), so
+fetching e.g. reserves for hundreds of pairs costs one RPC round trip per
+MULTICALL_BATCH_SIZE calls instead of one per pair.
+"""
+
+import os
+from web3 import Web3
+
+MULTICALL3_ADDRESS = Web3.to_checksum_address(
+    os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")
+)
+
+# Max calls packed into a single aggregate3 eth_call
+MULTICALL_BATCH_SIZE = int(os.getenv("MULTICALL_BATCH_SIZE", 500))
+
+MULTICALL3_ABI = [
+    {
+        "name": "aggregate3",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+            }
+        ],
+        "outputs": [
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+            }
+        ],
+    }
+]
+
+
+def selector(signature):
+    """4-byte function selector, e.g. selector("getReserves()")."""
+    return bytes(Web3.keccak(text=signature)[:4])
+
+
+def encode_address(address):
+    """ABI-encodes an address argument as a 32-byte word."""
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def decode_uints(data):
+    """Splits ABI return data into 32-byte unsigned integers."""
+    data = bytes(data)
+    return [int.from_bytes(data[i : i + 32], "big") for i in range(0, len(data), 32)]
+
+
+def decode_address(data):
+    return Web3.to_checksum_address(bytes(data)[12:32])
+
+
+def aggregate(web3, calls, block_identifier="latest"):
+    """
+    Executes read-only calls in bulk.
+
+    Args:
+        web3 (Web3): Connected Web3 instance
+        calls (list): (target, calldata) tuples
+        block_identifier: Block every call is evaluated at, so all results
+            come from one consistent state snapshot
+
+    Returns:
+        list: Return data (bytes) per call, or None for calls that reverted
+    """
+    multicall = web3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    results = []
+    for i in range(0, len(calls), MULTICALL_BATCH_SIZE):
+        chunk = [
+            (target, True, calldata)
+            for target, calldata in calls[i : i + MULTICALL_BATCH_SIZE]
+        ]
+        returned = multicall.functions.aggregate3(chunk).call(
+            block_identifier=block_identifier
+        )
+        results.extend(data if success else None for success, data in returned)
+    return results
@@ -0,0 +1,369 @@
+"""
+order_scheduler.py - TWAP/DCA execution of large token swaps
+
+A parent order is split into child swaps executed every `interval` seconds
+(or every `interval` blocks). Each child is sized from the cached pair
+reserves so its price impact stays below the order's `max_impact_percent`:
+the largest amount whose quoted output is within that percentage of the
+mid-price output is found by binary search on local quotes, then capped by
+what is left of the order.
+
+A child is saved (as "sending", with its signed tx hash) before it is
+broadcast and counts as filled only once the TxTracker reports a successful
+receipt; failed or dropped children are retried by later children instead.
+Order state is written to ORDER_STATE_PATH after every change, so active
+orders resume where they left off after a restart: children that were in
+flight are looked up on chain first, so none is ever sent twice.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from decimal import Decimal
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+import swapper
+from token_registry import from_base_units
+
+ORDER_STATE_PATH = os.getenv(
+    "ORDER_STATE_PATH", os.path.join(os.path.dirname(__file__), ".orders.json")
+)
+# Seconds between scheduler passes over active orders
+ORDER_POLL_INTERVAL = float(os.getenv("ORDER_POLL_INTERVAL", 1))
+# Consecutive child failures before a parent order is marked failed
+ORDER_MAX_FAILURES = int(os.getenv("ORDER_MAX_FAILURES", 3))
+
+# Child statuses whose amount is neither filled nor free to re-send
+IN_FLIGHT = ("sending", "pending")
+
+
+def max_amount_for_impact(path, router_address, max_impact_percent, upper):
+    """
+    Largest amount_in (base units, <= upper) whose price impact along `path`
+    stays within max_impact_percent, computed from cached reserves.
+    """
+    # Output per unit at the mid price, i.e. for an infinitesimal trade
+    mid_numerator, mid_denominator = 1, 1
+    for token_in, token_out in zip(path, path[1:]):
+        reserve_in, reserve_out = swapper.get_reserves(
+            token_in, token_out, router_address
+        )
+        mid_numerator *= reserve_out * (10000 - swapper.SWAP_FEE_BPS)
+        mid_denominator *= reserve_in * 10000
+
+    limit = Decimal(1) - Decimal(str(max_impact_percent)) / 100
+
+    def within_impact(amount):
+        out = swapper.quote_amounts_out(amount, path, router_address)[-1]
+        ideal = Decimal(amount * mid_numerator) / mid_denominator
+        return out >= ideal * limit
+
+    if within_impact(upper):
+        return upper
+    low, high = 0, upper
+    # Bisect down to 0.01% of the current upper bound
+    while high - low > max(high // 10000, 1):
+        middle = (low + high) // 2
+        if within_impact(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def chain_status(tx_hash):
+    """
+    "success" or "failed" for a mined transaction, "pending" for one the node
+    knows but has not mined, None for one it has never seen.
+    """
+    try:
+        receipt = swapper.web3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        try:
+            swapper.web3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return None
+        return "pending"
+    return "success" if receipt["status"] == 1 else "failed"
+
+
+def remaining(order):
+    """Base units of an order neither filled nor in flight."""
+    in_flight = sum(
+        int(child["amount_in"])
+        for child in order["children"]
+        if child.get("status") in IN_FLIGHT
+    )
+    return int(order["amount_in"]) - int(order["filled_in"]) - in_flight
+
+
+class OrderScheduler:
+    """Runs persisted TWAP/DCA parent orders as a sequence of child swaps."""
+
+    def __init__(self, tracker, state_path=ORDER_STATE_PATH):
+        self.tracker = tracker
+        self.state_path = state_path
+        self.orders = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._load()
+
+    def _load(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.orders = json.load(f)
+        # Children that were in flight when the process stopped
+        in_flight = [
+            (order, child)
+            for order in self.orders.values()
+            for child in order["children"]
+            if child.get("status") in IN_FLIGHT
+        ]
+        for order, child in in_flight:
+            try:
+                status = chain_status(child["tx_hash"])
+            except Exception as e:
+                logging.warning(f"Could not look up {child['tx_hash']}: {e}")
+                status = "pending"  # the tracker settles it later
+            if status is None:
+                # A "sending" child never reached the node; a "pending" one
+                # may still be in another node's mempool
+                status = "dropped" if child["status"] == "sending" else "pending"
+            self._update(order, child, status)
+        if in_flight:
+            self._save()
+
+    def _save(self):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.orders, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def create_order(
+        self,
+        token_in,
+        token_out,
+        amount_in,
+        slippage_percent,
+        router_address,
+        interval,
+        interval_unit="seconds",
+        max_impact_percent=1,
+    ):
+        """
+        Registers a parent order and returns its state dict.
+
+        Args:
+            amount_in (float): Total amount of token_in to sell
+            interval (int): Time between children, in `interval_unit`
+            interval_unit (str): "seconds" or "blocks"
+            max_impact_percent (float): Price impact cap per child swap
+        """
+        if interval_unit not in ("seconds", "blocks"):
+            raise ValueError("interval_unit must be 'seconds' or 'blocks'")
+        if interval <= 0 or max_impact_percent <= 0:
+            raise ValueError("interval and max_impact_percent must be positive")
+
+        token_in = Web3.to_checksum_address(token_in)
+        decimals = swapper.tokens.get(token_in).decimals
+        total = int(Decimal(str(amount_in)) * 10**decimals)
+        order = {
+            "id": uuid.uuid4().hex,
+            "token_in": token_in,
+            "token_out": Web3.to_checksum_address(token_out),
+            "router_address": Web3.to_checksum_address(router_address),
+            "amount_in": str(total),
+            "filled_in": "0",
+            "decimals": decimals,
+            "slippage_percent": slippage_percent,
+            "max_impact_percent": max_impact_percent,
+            "interval": interval,
+            "interval_unit": interval_unit,
+            "next_run": 0,
+            "status": "active",
+            "failures": 0,
+            "children": [],
+            "created_at": int(time.time()),
+        }
+        with self._lock:
+            self.orders[order["id"]] = order
+            self._save()
+        return order
+
+    def get_order(self, order_id):
+        with self._lock:
+            order = self.orders.get(order_id)
+            return None if order is None else self._progress(order)
+
+    def cancel_order(self, order_id):
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is not None and order["status"] == "active":
+                order["status"] = "cancelled"
+                self._save()
+            return None if order is None else self._progress(order)
+
+    def _progress(self, order):
+        total, filled = int(order["amount_in"]), int(order["filled_in"])
+        pending = total - filled - remaining(order)
+        return {
+            **order,
+            "amount_in": from_base_units(total, order["decimals"]),
+            "filled_in": from_base_units(filled, order["decimals"]),
+            "pending_in": from_base_units(pending, order["decimals"]),
+            "progress_percent": round(filled * 100 / total, 2) if total else 100,
+        }
+
+    def _now(self, order):
+        if order["interval_unit"] == "blocks":
+            return swapper.current_block_number()
+        return time.time()
+
+    def _fail(self, order, error):
+        order["failures"] += 1
+        if order["failures"] >= ORDER_MAX_FAILURES and order["status"] == "active":
+            order["status"] = "failed"
+            order["error"] = error
+
+    def _update(self, order, child, status, from_block=None):
+        """
+        Applies a child's transaction status: a success counts as filled,
+        "failed" and "dropped" free its amount for later children.
+        """
+        if status == "pending":
+            child["status"] = "pending"
+            self.tracker.track(child["tx_hash"], from_block)
+            return
+        child["status"] = status
+        if status == "success":
+            order["filled_in"] = str(int(order["filled_in"]) + int(child["amount_in"]))
+            order["failures"] = 0
+            filled = int(order["filled_in"]) >= int(order["amount_in"])
+            if filled and order["status"] == "active":
+                order["status"] = "completed"
+        else:
+            logging.warning(f"Order {order['id']} child {child['tx_hash']} {status}")
+            self._fail(order, f"Child swap {child['tx_hash']} {status}")
+
+    def _settle_children(self):
+        """Applies the tracker's outcome to every pending child."""
+        changed = False
+        for order in self.orders.values():
+            for child in order["children"]:
+                if child.get("status") != "pending":
+                    continue
+                status = self.tracker.status(child["tx_hash"])
+                if status is None:
+                    # Unknown to the tracker (evicted from its history)
+                    self.tracker.track(child["tx_hash"])
+                elif status["status"] != "pending":
+                    self._update(order, child, status["status"])
+                    changed = True
+        if changed:
+            self._save()
+
+    def run_child(self, order):
+        """
+        Sizes and submits the next child swap of an active order. The child
+        is saved before its broadcast and settled later from its receipt.
+        """
+        amount_left = remaining(order)
+        path = swapper.find_route(
+            order["token_in"], order["token_out"], amount_left, order["router_address"]
+        )
+        size = max_amount_for_impact(
+            path, order["router_address"], order["max_impact_percent"], amount_left
+        )
+        if size == 0:
+            raise ValueError("Pool too thin for the impact target")
+
+        child = {
+            "tx_hash": None,
+            "amount_in": str(size),
+            "status": "sending",
+            "at": int(time.time()),
+        }
+
+        def before_send(tx_hash):
+            # Saved first, so a crash after the broadcast cannot resend it
+            with self._lock:
+                child["tx_hash"] = tx_hash
+                order["children"].append(child)
+                self._save()
+
+        amount = Decimal(size) / 10 ** order["decimals"]
+        # The swap may be mined before it is tracked; rescan from here
+        from_block = self.tracker.last_block
+        try:
+            swapper.perform_token_to_token_swap(
+                order["token_in"],
+                order["token_out"],
+                amount,
+                order["slippage_percent"],
+                order["router_address"],
+                before_send=before_send,
+            )
+        except Exception:
+            if child["tx_hash"] is None:
+                raise
+            # The node may have accepted the swap before the error
+            try:
+                status = chain_status(child["tx_hash"])
+            except Exception:
+                status = None
+            with self._lock:
+                if status is None:
+                    child["status"] = "dropped"
+                    self._save()
+                    raise
+                self._update(order, child, status, from_block)
+                self._save()
+            return child
+        with self._lock:
+            self._update(order, child, "pending", from_block)
+            self._save()
+        return child
+
+    def tick(self):
+        """Settles pending children, then runs every order whose child is due."""
+        with self._lock:
+            self._settle_children()
+            due = [o for o in self.orders.values() if o["status"] == "active"]
+        for order in due:
+            now = self._now(order)
+            if now < order["next_run"] or remaining(order) <= 0:
+                # Not due, or the rest is in flight and waits for receipts
+                continue
+            try:
+                self.run_child(order)
+            except Exception as e:
+                logging.warning(f"Order {order['id']} child failed: {e}")
+                with self._lock:
+                    self._fail(order, str(e))
+                    order["next_run"] = now + order["interval"]
+                    self._save()
+                continue
+
+            with self._lock:
+                order["next_run"] = now + order["interval"]
+                self._save()
+
+    def start(self):
+        """Runs tick() every ORDER_POLL_INTERVAL seconds in the background."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                logging.warning(f"Order scheduler pass failed: {e}")
+            time.sleep(ORDER_POLL_INTERVAL)
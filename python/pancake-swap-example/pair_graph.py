@@ -0,0 +1,350 @@
+"""
+pair_graph.py - In-memory PancakeSwap V2 pair graph and best-route search
+
+Indexes every pair of a factory from its PairCreated events into an
+adjacency graph (token -> [(neighbour, pair)]), keeps pair reserves current
+from Sync events, and finds the best-output path between two tokens using at
+most `max_hops` pairs.
+
+The initial index walks PairCreated logs from PAIR_INDEX_FROM_BLOCK in
+LOG_CHUNK_SIZE-block steps, which can take thousands of eth_getLogs calls on
+mainnet. Each chunk's pairs and the block reached are appended to an index
+file (PAIR_INDEX_DIR), so a failed request or a restart resumes from the last
+completed chunk instead of rescanning from the start.
+
+Search runs on in-memory state:
+- A reverse BFS from token_out bounds which tokens can still reach it in the
+  remaining hops, so hub tokens with thousands of pairs are not expanded
+  blindly.
+- Each hop keeps only the best amount reached per token (layered relaxation),
+  so work grows with hops × frontier edges rather than the number of paths.
+- Reserves missing for a frontier are fetched in one JSON-RPC batch. Early
+  queries through hub tokens may load the reserves of thousands of pairs
+  this way; only once those are loaded (and followed via Sync) does a
+  search make no RPC calls.
+
+Usage:
+    graph = PairGraph(web3, factory_address)
+    graph.start()                      # initial index + Sync follower thread
+    amount_out, path = graph.best_route(token_in, token_out, amount_in)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from web3 import Web3
+
+# keccak("PairCreated(address,address,address,uint256)")
+PAIR_CREATED_TOPIC = Web3.to_hex(
+    Web3.keccak(text="PairCreated(address,address,address,uint256)")
+)
+# keccak("Sync(uint112,uint112)")
+SYNC_TOPIC = Web3.to_hex(Web3.keccak(text="Sync(uint112,uint112)"))
+
+PAIR_ABI = [
+    {
+        "name": "getReserves",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [
+            {"name": "reserve0", "type": "uint112"},
+            {"name": "reserve1", "type": "uint112"},
+            {"name": "blockTimestampLast", "type": "uint32"},
+        ],
+    }
+]
+
+# First block scanned for PairCreated events: the factory's deployment block.
+# Required; without it the route finder is off rather than scanning from
+# genesis (or missing every pair created before a guessed start block).
+PAIR_INDEX_FROM_BLOCK = os.getenv("PAIR_INDEX_FROM_BLOCK")
+PAIR_INDEX_FROM_BLOCK = int(PAIR_INDEX_FROM_BLOCK) if PAIR_INDEX_FROM_BLOCK else None
+# Directory of the per-factory index files (.pairs-<factory>.jsonl)
+PAIR_INDEX_DIR = os.getenv("PAIR_INDEX_DIR", os.path.dirname(__file__))
+# Max block range per eth_getLogs request
+LOG_CHUNK_SIZE = int(os.getenv("LOG_CHUNK_SIZE", 5000))
+# Max pair addresses per eth_getLogs request for Sync events
+LOG_ADDRESS_CHUNK_SIZE = int(os.getenv("LOG_ADDRESS_CHUNK_SIZE", 500))
+# Max calls per JSON-RPC batch when loading reserves
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", 500))
+# Seconds between polls for new PairCreated / Sync events
+SYNC_POLL_INTERVAL = float(os.getenv("SYNC_POLL_INTERVAL", 3))
+
+
+def _topic_address(topic):
+    return Web3.to_checksum_address(bytes(topic)[-20:])
+
+
+def _words(data):
+    data = bytes(data)
+    return [int.from_bytes(data[i : i + 32], "big") for i in range(0, len(data), 32)]
+
+
+class PairGraph:
+    """Adjacency graph of a V2 factory's pairs with Sync-maintained reserves."""
+
+    def __init__(
+        self,
+        web3,
+        factory_address,
+        fee_bps=25,
+        from_block=PAIR_INDEX_FROM_BLOCK,
+        index_dir=PAIR_INDEX_DIR,
+    ):
+        if from_block is None:
+            raise ValueError("Set PAIR_INDEX_FROM_BLOCK to the factory's deploy block")
+        self.web3 = web3
+        self.factory = Web3.to_checksum_address(factory_address)
+        self.fee_bps = fee_bps
+        self.adjacency = defaultdict(list)  # token -> [(neighbour, pair)]
+        self.pairs = {}  # pair -> (token0, token1)
+        self.reserves = {}  # pair -> (reserve0, reserve1)
+        self.from_block = from_block
+        self.last_block = from_block - 1
+        self.ready = threading.Event()
+        self._lock = threading.RLock()
+        self._thread = None
+        self.index_path = index_dir and os.path.join(
+            index_dir, f".pairs-{self.factory}.jsonl"
+        )
+        self._load_index()
+
+    # ---------------------------------------------------------------- indexing
+
+    def add_pair(self, token0, token1, pair):
+        with self._lock:
+            if pair in self.pairs:
+                return
+            self.pairs[pair] = (token0, token1)
+            self.adjacency[token0].append((token1, pair))
+            self.adjacency[token1].append((token0, pair))
+
+    def _load_index(self):
+        """Restores the pairs and the block reached from the index file."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        lines, complete = [], True
+        try:
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        lines.append(json.loads(line))
+                    except ValueError:
+                        # Cut short by a crash mid-write; keep what came before
+                        complete = False
+                        break
+        except OSError as e:
+            logging.warning(f"Ignoring unreadable pair index {self.index_path}: {e}")
+            return
+        if not lines or lines[0].get("from_block") != self.from_block:
+            # Indexed from another start block: start a new file
+            os.remove(self.index_path)
+            return
+        if not complete:
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(json.dumps(line) + "\n" for line in lines)
+            os.replace(tmp_path, self.index_path)
+        for entry in lines[1:]:
+            for token0, token1, pair in entry["pairs"]:
+                self.add_pair(token0, token1, pair)
+            self.last_block = entry["to_block"]
+        logging.info(
+            f"Resuming pair index of {self.factory} at block {self.last_block + 1} "
+            f"({len(self.pairs)} pairs)"
+        )
+
+    def _save_chunk(self, to_block, pairs):
+        """Appends one indexed chunk, so a restart resumes after it."""
+        if not self.index_path:
+            return
+        new_file = not os.path.exists(self.index_path)
+        with open(self.index_path, "a") as f:
+            if new_file:
+                f.write(json.dumps({"from_block": self.from_block}) + "\n")
+            f.write(json.dumps({"to_block": to_block, "pairs": pairs}) + "\n")
+
+    def _apply_syncs(self, from_block, to_block):
+        """
+        Applies Sync events of the pairs whose reserves are loaded, requested
+        LOG_ADDRESS_CHUNK_SIZE addresses at a time, so the node does not
+        return the Sync events of every pair on chain (other DEXes emit the
+        same event).
+        """
+        with self._lock:
+            followed = list(self.reserves)
+        updates = 0
+        for i in range(0, len(followed), LOG_ADDRESS_CHUNK_SIZE):
+            logs = self.web3.eth.get_logs(
+                {
+                    "fromBlock": from_block,
+                    "toBlock": to_block,
+                    "address": followed[i : i + LOG_ADDRESS_CHUNK_SIZE],
+                    "topics": [SYNC_TOPIC],
+                }
+            )
+            for log in logs:
+                pair = Web3.to_checksum_address(log["address"])
+                if pair in self.reserves:
+                    reserve0, reserve1 = _words(log["data"])[:2]
+                    with self._lock:
+                        self.reserves[pair] = (reserve0, reserve1)
+                    updates += 1
+        return updates
+
+    def sync(self):
+        """
+        Applies PairCreated and Sync events since the last processed block,
+        LOG_CHUNK_SIZE blocks at a time. last_block advances (and the index
+        file grows) after every chunk, so an RPC error only repeats the
+        chunk it happened in.
+        """
+        head = self.web3.eth.block_number
+        applied = 0
+        while self.last_block < head:
+            start = self.last_block + 1
+            end = min(start + LOG_CHUNK_SIZE - 1, head)
+            created = self.web3.eth.get_logs(
+                {
+                    "fromBlock": start,
+                    "toBlock": end,
+                    "address": self.factory,
+                    "topics": [PAIR_CREATED_TOPIC],
+                }
+            )
+            pairs = []
+            for log in created:
+                pair = Web3.to_checksum_address(bytes(log["data"])[12:32])
+                token0 = _topic_address(log["topics"][1])
+                token1 = _topic_address(log["topics"][2])
+                self.add_pair(token0, token1, pair)
+                pairs.append((token0, token1, pair))
+            applied += len(created)
+
+            # Reserves are only followed once a pair has been loaded; the
+            # first sync just builds the topology and reserves are fetched
+            # on demand.
+            if self.ready.is_set():
+                applied += self._apply_syncs(start, end)
+
+            # Following the head, only chunks with new pairs are worth a line
+            if pairs or end - start + 1 == LOG_CHUNK_SIZE:
+                self._save_chunk(end, pairs)
+            self.last_block = end
+        return applied
+
+    def load_reserves(self, pairs):
+        """Fetches reserves for pairs not yet loaded, batching getReserves calls."""
+        missing = [pair for pair in pairs if pair not in self.reserves]
+        for i in range(0, len(missing), RPC_BATCH_SIZE):
+            chunk = missing[i : i + RPC_BATCH_SIZE]
+            with self.web3.batch_requests() as batch:
+                for pair in chunk:
+                    contract = self.web3.eth.contract(address=pair, abi=PAIR_ABI)
+                    batch.add(contract.functions.getReserves())
+                results = batch.execute()
+            with self._lock:
+                for pair, (reserve0, reserve1, _) in zip(chunk, results):
+                    self.reserves[pair] = (reserve0, reserve1)
+
+    def start(self):
+        """Builds the index and follows new events in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+                if not self.ready.is_set():
+                    self.ready.set()
+                    logging.info(
+                        f"Indexed {len(self.pairs)} pairs for factory {self.factory}"
+                    )
+            except Exception as e:
+                logging.warning(f"Pair graph sync failed: {e}")
+            time.sleep(SYNC_POLL_INTERVAL)
+
+    # ------------------------------------------------------------------ search
+
+    def _distances_to(self, token_out, max_hops):
+        """Hop distance from every token that can reach token_out in max_hops."""
+        distance = {token_out: 0}
+        queue = deque([token_out])
+        while queue:
+            token = queue.popleft()
+            if distance[token] == max_hops:
+                continue
+            for neighbour, _ in self.adjacency.get(token, ()):
+                if neighbour not in distance:
+                    distance[neighbour] = distance[token] + 1
+                    queue.append(neighbour)
+        return distance
+
+    def _amount_out(self, amount_in, pair, token_in):
+        reserve0, reserve1 = self.reserves[pair]
+        token0, _ = self.pairs[pair]
+        reserve_in, reserve_out = (
+            (reserve0, reserve1) if token_in == token0 else (reserve1, reserve0)
+        )
+        if reserve_in == 0 or reserve_out == 0:
+            return 0
+        amount_in_with_fee = amount_in * (10000 - self.fee_bps)
+        return (amount_in_with_fee * reserve_out) // (
+            reserve_in * 10000 + amount_in_with_fee
+        )
+
+    def best_route(self, token_in, token_out, amount_in, max_hops=3):
+        """
+        Finds the path with the highest output for amount_in.
+
+        Returns:
+            (amount_out, path) where path is a list of token addresses,
+            or (0, None) when no route of at most max_hops pairs exists.
+        """
+        token_in = Web3.to_checksum_address(token_in)
+        token_out = Web3.to_checksum_address(token_out)
+
+        with self._lock:
+            distance = self._distances_to(token_out, max_hops)
+        if token_in not in distance:
+            return 0, None
+
+        best_amount, best_path = 0, None
+        frontier = {token_in: (amount_in, [token_in])}
+        for hop in range(1, max_hops + 1):
+            remaining = max_hops - hop
+            with self._lock:
+                edges = [
+                    (token, neighbour, pair)
+                    for token in frontier
+                    for neighbour, pair in self.adjacency.get(token, ())
+                    if distance.get(neighbour, max_hops + 1) <= remaining
+                ]
+            self.load_reserves({pair for _, _, pair in edges})
+
+            next_frontier = {}
+            with self._lock:
+                for token, neighbour, pair in edges:
+                    amount, path = frontier[token]
+                    if neighbour in path:
+                        continue
+                    out = self._amount_out(amount, pair, token)
+                    if out == 0:
+                        continue
+                    if neighbour == token_out:
+                        if out > best_amount:
+                            best_amount, best_path = out, path + [neighbour]
+                    elif out > next_frontier.get(neighbour, (0,))[0]:
+                        next_frontier[neighbour] = (out, path + [neighbour])
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        return best_amount, best_path
@@ -0,0 +1,211 @@
+"""
+price_feed.py - Live pair prices from Sync events for the /prices/stream feed
+
+PriceFeed keeps the reserves of a fixed set of tracked pairs in memory.
+After one Multicall3 snapshot at startup, it follows the chain with a single
+eth_getLogs request per poll: the Sync topic, filtered to the tracked pair
+addresses. Every Sync log replaces that pair's reserves and price.
+
+Clients do not get their own upstream subscription or queue. Each update
+bumps a version number and every stream reads the latest prices changed
+since the version it last sent. A slow or throttled client therefore skips
+intermediate prices instead of falling behind, and the RPC load stays the
+same no matter how many viewers are connected.
+
+Tracked pairs come from PRICE_PAIRS ("tokenA:tokenB,..." on PRICE_ROUTER)
+and are resolved to pair addresses on the first poll.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from web3 import Web3
+import swapper
+from multicall import aggregate, selector, decode_uints
+from pair_graph import SYNC_TOPIC, LOG_CHUNK_SIZE
+
+# Pairs to stream, as comma-separated tokenA:tokenB (defaults: the UI tokens)
+PRICE_PAIRS = os.getenv(
+    "PRICE_PAIRS",
+    "0xae13d989dac2f0debff460ac112a837c89baa7cd:"
+    "0xFa60D973F7642B748046464e165A65B7323b0DEE,"
+    "0xae13d989dac2f0debff460ac112a837c89baa7cd:"
+    "0x64544969ed7ebf5f083679233325356ebe738930",
+)
+PRICE_ROUTER = os.getenv("PRICE_ROUTER", "0x9ac64cc6e4415144c455bd8e4837fea55603e5c3")
+# Seconds between eth_getLogs polls for new Sync events
+PRICE_POLL_INTERVAL = float(os.getenv("PRICE_POLL_INTERVAL", 1))
+# Smallest gap between two events sent to one client (clients may ask for more)
+PRICE_MIN_INTERVAL = float(os.getenv("PRICE_MIN_INTERVAL", 1))
+# Largest gap a client may ask for, so no stream goes silent for long
+PRICE_MAX_INTERVAL = float(os.getenv("PRICE_MAX_INTERVAL", 60))
+
+GET_RESERVES = selector("getReserves()")
+
+
+class PriceFeed:
+    """Sync-event driven reserves and prices for a set of tracked pairs."""
+
+    def __init__(self, web3):
+        self.web3 = web3
+        self.pairs = {}  # pair -> (token0, token1)
+        self._wanted = []  # (token_a, token_b, router) not yet resolved
+        self.prices = {}  # pair -> price dict, including the version it changed at
+        self.version = 0
+        self.last_block = None
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def track(self, token_a, token_b, router_address=PRICE_ROUTER):
+        """Adds a token pair to the feed; it is resolved on the next load()."""
+        self._wanted.append((token_a, token_b, router_address))
+
+    def load(self):
+        """
+        Resolves newly tracked pairs and reads every pair's reserves in one
+        Multicall3 snapshot. Tokens without a pair on the router are skipped.
+        """
+        for token_a, token_b, router_address in self._wanted:
+            token_a = Web3.to_checksum_address(token_a)
+            token_b = Web3.to_checksum_address(token_b)
+            factory = swapper.get_factory(router_address)
+            pair = swapper.get_pair_address(factory, token_a, token_b)
+            if pair is None:
+                logging.warning(f"No pair for {token_a} / {token_b}, not streaming")
+                continue
+            self.pairs[pair] = swapper.sort_tokens(token_a, token_b)
+        self._wanted = []
+
+        block_number = self.web3.eth.block_number
+        pairs = list(self.pairs)
+        results = aggregate(
+            self.web3, [(pair, GET_RESERVES) for pair in pairs], block_number
+        )
+        for pair, data in zip(pairs, results):
+            if data:
+                reserve0, reserve1 = decode_uints(data)[:2]
+                self._update(pair, reserve0, reserve1, block_number)
+        self.last_block = block_number
+
+    def _update(self, pair, reserve0, reserve1, block_number):
+        token0, token1 = self.pairs[pair]
+        metadata = swapper.tokens.get_many([token0, token1])
+        decimals0, decimals1 = metadata[token0].decimals, metadata[token1].decimals
+        price = None
+        if reserve0:
+            price = (reserve1 / 10**decimals1) / (reserve0 / 10**decimals0)
+        with self._changed:
+            self.version += 1
+            self.prices[pair] = {
+                "pair": pair,
+                "token0": token0,
+                "token1": token1,
+                "symbol0": metadata[token0].symbol,
+                "symbol1": metadata[token1].symbol,
+                "reserve0": str(reserve0),
+                "reserve1": str(reserve1),
+                "price": price,  # token1 per token0
+                "block_number": block_number,
+                "version": self.version,
+            }
+            self._changed.notify_all()
+
+    def poll(self):
+        """Applies Sync logs of tracked pairs since the last processed block."""
+        head = self.web3.eth.block_number
+        # A fresh snapshot is cheaper than replaying a long gap of logs
+        if (
+            self.last_block is None
+            or self._wanted
+            or head - self.last_block > LOG_CHUNK_SIZE
+        ):
+            self.load()
+            return len(self.pairs)
+        if head <= self.last_block or not self.pairs:
+            return 0
+        logs = self.web3.eth.get_logs(
+            {
+                "fromBlock": self.last_block + 1,
+                "toBlock": head,
+                "address": list(self.pairs),
+                "topics": [SYNC_TOPIC],
+            }
+        )
+        # Only the last Sync of each pair in the range matters
+        latest = {}
+        for log in logs:
+            latest[Web3.to_checksum_address(log["address"])] = log
+        for pair, log in latest.items():
+            reserve0, reserve1 = decode_uints(log["data"])[:2]
+            self._update(pair, reserve0, reserve1, log["blockNumber"])
+        self.last_block = head
+        return len(latest)
+
+    def changes_since(self, version, pairs=None):
+        """
+        Returns (current version, prices changed after `version`).
+
+        Args:
+            version (int): Version the caller last sent (0 = full snapshot)
+            pairs (set | None): Restrict to these pair addresses
+        """
+        with self._changed:
+            changed = [
+                price
+                for pair, price in self.prices.items()
+                if price["version"] > version and (pairs is None or pair in pairs)
+            ]
+            return self.version, changed
+
+    def wait(self, version, timeout):
+        """Blocks until the feed moves past `version`; False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version > version, timeout)
+
+    def start(self):
+        """Follows Sync events in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logging.warning(f"Price feed poll failed: {e}")
+            time.sleep(PRICE_POLL_INTERVAL)
+
+
+def configured_feed(web3):
+    """PriceFeed tracking every PRICE_PAIRS entry on PRICE_ROUTER."""
+    feed = PriceFeed(web3)
+    for entry in filter(None, (e.strip() for e in PRICE_PAIRS.split(","))):
+        token_a, token_b = entry.split(":")
+        feed.track(token_a, token_b)
+    return feed
+
+
+def client_interval(requested):
+    """
+    Per-client throttle interval, between PRICE_MIN_INTERVAL and
+    PRICE_MAX_INTERVAL. Missing, malformed or non-finite values (nan, inf)
+    get PRICE_MIN_INTERVAL.
+    """
+    try:
+        interval = float(requested)
+    except (TypeError, ValueError):
+        return PRICE_MIN_INTERVAL
+    if not math.isfinite(interval):
+        return PRICE_MIN_INTERVAL
+    return min(max(interval, PRICE_MIN_INTERVAL), PRICE_MAX_INTERVAL)
+
+
+def client_pairs(requested):
+    """Parses a ?pairs=0x..,0x.. filter into checksummed addresses (None = all)."""
+    if not requested:
+        return None
+    return {Web3.to_checksum_address(p.strip()) for p in requested.split(",")}
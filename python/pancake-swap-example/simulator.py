@@ -0,0 +1,153 @@
+"""
+simulator.py - Pre-trade eth_call simulation for swap transactions
+
+Before a swap is signed and sent, its exact calldata is executed with
+eth_call against the pending block. A swap that would revert (slippage,
+missing liquidity, insufficient balance or allowance, expired deadline) is
+rejected before any gas is paid, and the gas limit is taken from
+eth_estimateGas instead of a fixed guess.
+
+- eth_call and eth_estimateGas for every swap of a batch go out as a single
+  JSON-RPC batch request.
+- Results are cached per block, keyed by the swap intent, so repeated
+  identical swaps within one block are simulated once.
+"""
+
+import os
+import threading
+from typing import NamedTuple
+from eth_abi import decode
+from web3 import Web3
+
+# Extra headroom added on top of eth_estimateGas for the gas limit
+GAS_BUFFER_PERCENT = int(os.getenv("GAS_BUFFER_PERCENT", 10))
+
+# Error(string) selector used by require()/revert("...")
+ERROR_SELECTOR = "0x08c379a0"
+
+
+class SimulationResult(NamedTuple):
+    success: bool
+    amounts: list  # router `amounts` output, empty for fee-on-transfer variants
+    gas_used: int  # eth_estimateGas result (None on revert)
+    error: str  # revert reason (None on success)
+
+    @property
+    def gas_limit(self):
+        """Gas limit to send with: the estimate plus GAS_BUFFER_PERCENT."""
+        return self.gas_used * (100 + GAS_BUFFER_PERCENT) // 100
+
+
+def _revert_reason(error):
+    data = error.get("data")
+    if isinstance(data, dict):
+        data = data.get("data")
+    if isinstance(data, str) and data.startswith(ERROR_SELECTOR):
+        try:
+            return decode(["string"], bytes.fromhex(data[10:]))[0]
+        except Exception:
+            pass
+    return error.get("message", "execution reverted")
+
+
+def _rpc_tx(txn):
+    """JSON-RPC call object for a built transaction (nonce/gas/fees dropped)."""
+    call = {"from": txn["from"], "to": txn["to"], "data": txn["data"]}
+    if txn.get("value"):
+        call["value"] = hex(txn["value"])
+    return call
+
+
+class SwapSimulator:
+    """Simulates built swap transactions in JSON-RPC batches, cached per block."""
+
+    def __init__(self, web3):
+        self.web3 = web3
+        self._cache = {}  # intent key -> SimulationResult, for _cache_block only
+        self._cache_block = None
+        self._lock = threading.Lock()
+
+    def simulate_many(self, txns, block_number, keys=None):
+        """
+        Simulates several swaps with one JSON-RPC batch.
+
+        Args:
+            txns (list): Transactions from build_transaction()
+            block_number (int): Latest block; cached results expire with it
+            keys (list | None): Cache key per transaction describing the swap
+                intent. Defaults to the raw calldata, which includes the
+                deadline and therefore rarely repeats.
+
+        Returns:
+            list[SimulationResult]: One result per transaction, in order
+        """
+        keys, results, pending = self._lookup(txns, block_number, keys)
+        if pending:
+            # Raw provider batch (sorted by request id) so one reverting call
+            # does not fail the whole batch
+            responses = self.web3.provider.make_batch_request(
+                self._batch(txns, pending)
+            )
+            self._store(keys, results, pending, responses, block_number)
+        return [results[key] for key in keys]
+
+    def _lookup(self, txns, block_number, keys):
+        """Returns (keys, cached results, indexes of txns still to simulate)."""
+        keys = keys or [
+            (txn["from"], txn["to"], txn["data"], txn.get("value")) for txn in txns
+        ]
+        with self._lock:
+            if self._cache_block != block_number:
+                self._cache.clear()
+                self._cache_block = block_number
+            results = {key: self._cache[key] for key in keys if key in self._cache}
+        pending = [i for i, key in enumerate(keys) if key not in results]
+        return keys, results, pending
+
+    def _batch(self, txns, pending):
+        requests = []
+        for i in pending:
+            call = _rpc_tx(txns[i])
+            requests.append(("eth_call", [call, "pending"]))
+            requests.append(("eth_estimateGas", [call, "pending"]))
+        return requests
+
+    def _store(self, keys, results, pending, responses, block_number):
+        if not isinstance(responses, list):
+            raise ValueError(f"Simulation batch failed: {responses.get('error')}")
+        for n, i in enumerate(pending):
+            call, estimate = responses[2 * n], responses[2 * n + 1]
+            results[keys[i]] = self._result(call, estimate)
+        with self._lock:
+            if self._cache_block == block_number:
+                self._cache.update(results)
+
+    def simulate(self, txn, block_number, key=None):
+        return self.simulate_many([txn], block_number, [key] if key else None)[0]
+
+    def _result(self, call, estimate):
+        error = call.get("error") or estimate.get("error")
+        if error:
+            return SimulationResult(False, [], None, _revert_reason(error))
+        output = Web3.to_bytes(hexstr=call["result"])
+        amounts = list(decode(["uint256[]"], output)[0]) if output else []
+        return SimulationResult(True, amounts, int(estimate["result"], 16), None)
+
+
+class AsyncSwapSimulator(SwapSimulator):
+    """SwapSimulator for an AsyncWeb3 client; the same batching and cache."""
+
+    async def simulate_many(self, txns, block_number, keys=None):
+        keys, results, pending = self._lookup(txns, block_number, keys)
+        if pending:
+            responses = await self.web3.provider.make_batch_request(
+                self._batch(txns, pending)
+            )
+            self._store(keys, results, pending, responses, block_number)
+        return [results[key] for key in keys]
+
+    async def simulate(self, txn, block_number, key=None):
+        results = await self.simulate_many(
+            [txn], block_number, [key] if key else None
+        )
+        return results[0]
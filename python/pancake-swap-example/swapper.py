@@ -5,11 +5,23 @@ This module contains two core functions:
 1. perform_swap:       Swaps tBNB (native testnet BNB) to any BEP-20 token.
 2. perform_token_to_token_swap: Swaps any BEP-20 token to another BEP-20 token.
 
+Both derive amountOutMin from the requested slippage using a local quote:
+pair reserves are read with getReserves (cached per block) and the expected
+output is computed with the constant-product formula, so quoting does not
+need a getAmountsOut round trip.
+
+Before signing, each swap is dry-run with eth_call at the pending block
+(simulator.py): swaps that would revert are rejected without spending gas,
+and the gas limit comes from eth_estimateGas instead of a fixed value.
+
 It uses Web3.py to construct, sign, and send transactions to a PancakeSwap-compatible
 router contract. Wallet credentials are securely loaded via mnemonic or private key
 using the wallet_utils module.
 
-The router path includes WBNB when needed, because:
+Swap paths come from the pair graph (pair_graph.py), which indexes every
+pair of the router's factory and picks the best-output route of up to
+ROUTE_MAX_HOPS pairs. Until the graph has finished its first index, the
+router path falls back to including WBNB when needed, because:
 - PancakeSwap liquidity pools are mostly paired with WBNB.
 - Direct pairs between arbitrary tokens are often not available.
 - Router contracts require WBNB when wrapping/unwrapping native BNB (tBNB).
@@ -21,9 +33,15 @@ import os
 import time
 import json
 import logging
+import threading
+from decimal import Decimal
 from web3 import Web3
 from dotenv import load_dotenv
-from wallet_utils import get_wallet  # Secure wallet access via mnemonic or key
+from wallet_pool import WalletPool  # Wallets derived via mnemonic (wallet_utils)
+from pair_graph import PAIR_INDEX_FROM_BLOCK, PairGraph
+from allowance import AllowanceManager
+from token_registry import TokenRegistry, after_transfer_fees, to_base_units
+from simulator import SwapSimulator
 
 # Load environment variables
 load_dotenv()
@@ -35,40 +53,363 @@ logging.basicConfig(level=logging.INFO)
 RPC_URL = os.getenv("RPC_URL")
 web3 = Web3(Web3.HTTPProvider(RPC_URL))
 
+# Allowances of token_in for the router, cached across swaps
+allowances = AllowanceManager(web3)
+
+# Decimals / symbol / fee-on-transfer flags, cached in memory and on disk
+tokens = TokenRegistry(web3)
+
+# eth_call dry runs at the pending block; set ENABLE_SIMULATION=false to skip
+simulator = SwapSimulator(web3)
+ENABLE_SIMULATION = os.getenv("ENABLE_SIMULATION", "true").lower() == "true"
+
 # WBNB testnet address (used for swap paths)
 WBNB = Web3.to_checksum_address("0xae13d989dac2f0debff460ac112a837c89baa7cd")
 
+# PancakeSwap V2 takes a 0.25% fee on every hop
+SWAP_FEE_BPS = int(os.getenv("SWAP_FEE_BPS", 25))
+
+# Seconds a known block number is trusted before asking the node again.
+# Reserves are cached per block, so this bounds how stale a quote can be.
+BLOCK_POLL_INTERVAL = float(os.getenv("BLOCK_POLL_INTERVAL", 1))
+
+# Max pairs in a route found by the pair graph; set ENABLE_ROUTE_FINDER=false
+# to always route through WBNB instead
+ROUTE_MAX_HOPS = int(os.getenv("ROUTE_MAX_HOPS", 3))
+ENABLE_ROUTE_FINDER = os.getenv("ENABLE_ROUTE_FINDER", "true").lower() == "true"
+if ENABLE_ROUTE_FINDER and PAIR_INDEX_FROM_BLOCK is None:
+    logging.warning("PAIR_INDEX_FROM_BLOCK is not set, routing through WBNB")
+    ENABLE_ROUTE_FINDER = False
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+ROUTER_FACTORY_ABI = json.loads(
+    """[
+      {
+        "name": "factory",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "address"}]
+      }
+    ]"""
+)
+
+FACTORY_ABI = json.loads(
+    """[
+      {
+        "name": "getPair",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+          {"name": "tokenA", "type": "address"},
+          {"name": "tokenB", "type": "address"}
+        ],
+        "outputs": [{"name": "pair", "type": "address"}]
+      }
+    ]"""
+)
+
+PAIR_ABI = json.loads(
+    """[
+      {
+        "name": "getReserves",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [
+          {"name": "reserve0", "type": "uint112"},
+          {"name": "reserve1", "type": "uint112"},
+          {"name": "blockTimestampLast", "type": "uint32"}
+        ]
+      }
+    ]"""
+)
+
+# Router swap functions, plain and fee-on-transfer variants
+SWAP_ETH_ABI = json.loads(
+    """[
+      {
+        "name": "swapExactETHForTokens",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [
+          {"name": "amountOutMin", "type": "uint256"},
+          {"name": "path", "type": "address[]"},
+          {"name": "to", "type": "address"},
+          {"name": "deadline", "type": "uint256"}
+        ],
+        "outputs": [{"name": "amounts", "type": "uint256[]"}]
+      },
+      {
+        "name": "swapExactETHForTokensSupportingFeeOnTransferTokens",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [
+          {"name": "amountOutMin", "type": "uint256"},
+          {"name": "path", "type": "address[]"},
+          {"name": "to", "type": "address"},
+          {"name": "deadline", "type": "uint256"}
+        ],
+        "outputs": []
+      }
+    ]"""
+)
+
+SWAP_TOKENS_ABI = json.loads(
+    """[
+      {
+        "name": "swapExactTokensForTokens",
+        "type": "function",
+        "inputs": [
+          {"name": "amountIn", "type": "uint256"},
+          {"name": "amountOutMin", "type": "uint256"},
+          {"name": "path", "type": "address[]"},
+          {"name": "to", "type": "address"},
+          {"name": "deadline", "type": "uint256"}
+        ],
+        "outputs": [{"name": "amounts", "type": "uint256[]"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+      },
+      {
+        "name": "swapExactTokensForTokensSupportingFeeOnTransferTokens",
+        "type": "function",
+        "inputs": [
+          {"name": "amountIn", "type": "uint256"},
+          {"name": "amountOutMin", "type": "uint256"},
+          {"name": "path", "type": "address[]"},
+          {"name": "to", "type": "address"},
+          {"name": "deadline", "type": "uint256"}
+        ],
+        "outputs": [],
+        "stateMutability": "nonpayable"
+      }
+    ]"""
+)
+
+# Quote caches. Factory and pair addresses never change once deployed;
+# reserves are only valid for the block they were read at.
+_factories = {}  # router -> factory
+_pairs = {}  # (factory, token0, token1) -> pair
+_reserves = {}  # pair -> (block_number, reserve0, reserve1)
+_block = {"number": None, "checked_at": 0.0}
+_graphs = {}  # factory -> PairGraph
+_pool = None  # WalletPool, created on first swap
+_quote_lock = threading.Lock()
+
+
+def current_block_number():
+    """Returns the latest block number, polling the node at most once per interval."""
+    now = time.monotonic()
+    with _quote_lock:
+        if (
+            _block["number"] is not None
+            and now - _block["checked_at"] < BLOCK_POLL_INTERVAL
+        ):
+            return _block["number"]
+    number = web3.eth.block_number
+    with _quote_lock:
+        _block["number"] = number
+        _block["checked_at"] = now
+    return number
+
+
+def get_factory(router_address):
+    """Returns (and caches) the factory address behind a router."""
+    router_address = Web3.to_checksum_address(router_address)
+    factory = _factories.get(router_address)
+    if factory is None:
+        router = web3.eth.contract(address=router_address, abi=ROUTER_FACTORY_ABI)
+        factory = router.functions.factory().call()
+        _factories[router_address] = factory
+    return factory
+
+
+def sort_tokens(token_a, token_b):
+    """Orders two tokens the way V2 pairs do (token0 < token1)."""
+    if int(token_a, 16) < int(token_b, 16):
+        return token_a, token_b
+    return token_b, token_a
+
+
+def get_pair_address(factory, token_a, token_b):
+    """Returns the pair address for two tokens, or None when no pair exists."""
+    token0, token1 = sort_tokens(token_a, token_b)
+    key = (factory, token0, token1)
+    if key not in _pairs:
+        contract = web3.eth.contract(address=factory, abi=FACTORY_ABI)
+        pair = contract.functions.getPair(token0, token1).call()
+        # Missing pairs are not cached: they may be created later
+        if pair == ZERO_ADDRESS:
+            return None
+        _pairs[key] = pair
+    return _pairs[key]
+
+
+def get_reserves(token_a, token_b, router_address):
+    """
+    Returns (reserve_a, reserve_b) for a token pair, read once per block.
+
+    Raises:
+        ValueError: If the router's factory has no pair for the two tokens.
+    """
+    token_a = Web3.to_checksum_address(token_a)
+    token_b = Web3.to_checksum_address(token_b)
+    pair = get_pair_address(get_factory(router_address), token_a, token_b)
+    if pair is None:
+        raise ValueError(f"No liquidity pair for {token_a} / {token_b}")
+
+    block_number = current_block_number()
+    cached = _reserves.get(pair)
+    if cached is None or cached[0] != block_number:
+        contract = web3.eth.contract(address=pair, abi=PAIR_ABI)
+        reserve0, reserve1, _ = contract.functions.getReserves().call(
+            block_identifier=block_number
+        )
+        cached = (block_number, reserve0, reserve1)
+        _reserves[pair] = cached
+
+    _, reserve0, reserve1 = cached
+    if sort_tokens(token_a, token_b)[0] == token_a:
+        return reserve0, reserve1
+    return reserve1, reserve0
+
+
+def get_pair_graph(router_address):
+    """Returns the pair graph of the router's factory, indexing it on first use."""
+    factory = get_factory(router_address)
+    with _quote_lock:
+        graph = _graphs.get(factory)
+        if graph is None:
+            graph = PairGraph(web3, factory, fee_bps=SWAP_FEE_BPS)
+            graph.start()
+            _graphs[factory] = graph
+    return graph
+
+
+def find_route(token_in, token_out, amount_in, router_address):
+    """
+    Returns the best-output path from token_in to token_out.
+
+    Falls back to routing through WBNB while the pair graph is still
+    building its initial index (or when the route finder is disabled or
+    PAIR_INDEX_FROM_BLOCK is not set).
+
+    Raises:
+        ValueError: If the indexed graph has no route within ROUTE_MAX_HOPS.
+    """
+    if ENABLE_ROUTE_FINDER:
+        graph = get_pair_graph(router_address)
+        if graph.ready.is_set():
+            _, path = graph.best_route(token_in, token_out, amount_in, ROUTE_MAX_HOPS)
+            if path is None:
+                raise ValueError(
+                    f"No route from {token_in} to {token_out} "
+                    f"within {ROUTE_MAX_HOPS} hops"
+                )
+            return path
+
+    if token_in != WBNB and token_out != WBNB:
+        return [token_in, WBNB, token_out]
+    return [token_in, token_out]
+
+
+def get_wallet_pool():
+    """Returns the shared wallet pool, deriving its wallets on first use."""
+    global _pool
+    with _quote_lock:
+        if _pool is None:
+            _pool = WalletPool(web3)
+            _pool.start_rebalancer()
+    return _pool
+
+
+def get_amount_out(amount_in, reserve_in, reserve_out, fee_bps=SWAP_FEE_BPS):
+    """Constant-product output for one hop, matching the router's integer math."""
+    if amount_in <= 0:
+        raise ValueError("amount_in must be greater than zero")
+    if reserve_in == 0 or reserve_out == 0:
+        raise ValueError("Pair has no liquidity")
+    amount_in_with_fee = amount_in * (10000 - fee_bps)
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * 10000 + amount_in_with_fee
+    return numerator // denominator
+
+
+def quote_amounts_out(amount_in, path, router_address):
+    """Local equivalent of router.getAmountsOut using cached reserves."""
+    amounts = [amount_in]
+    for token_in, token_out in zip(path, path[1:]):
+        reserve_in, reserve_out = get_reserves(token_in, token_out, router_address)
+        amounts.append(get_amount_out(amounts[-1], reserve_in, reserve_out))
+    return amounts
+
+
+def min_amount_out(amount_out, slippage_percent):
+    """Lowest acceptable output for a quote given a slippage tolerance in percent."""
+    slippage = Decimal(str(slippage_percent))
+    if not 0 <= slippage < 100:
+        raise ValueError("slippage_percent must be between 0 and 100")
+    return int(Decimal(amount_out) * (100 - slippage) / 100)
+
+
+def apply_simulation(txn, simulation):
+    """
+    Rejects a swap whose simulation reverted, else sizes its gas limit.
+
+    Raises:
+        ValueError: With the revert reason, before any gas is spent.
+    """
+    if not simulation.success:
+        raise ValueError(f"Swap simulation reverted: {simulation.error}")
+    txn["gas"] = simulation.gas_limit
+    if simulation.amounts:
+        logging.info(
+            f"Simulated output {simulation.amounts[-1]} "
+            f"using {simulation.gas_used} gas"
+        )
+
 
 def perform_swap(token_out, amount_bnb, slippage_percent, router_address):
     """
     Swaps native tBNB to a specified BEP-20 token using swapExactETHForTokens.
 
+    The swap is sent from any free wallet of the pool (see wallet_pool.py), or
+    from the home wallet when that one cannot cover amount_bnb plus gas, and
+    the bought tokens are delivered to the home wallet.
+
     Args:
         token_out (str): Token to buy (BEP-20 address)
         amount_bnb (float): Amount of tBNB to send
-        slippage_percent (float): Not implemented yet (amountOutMin = 0)
+        slippage_percent (float): Max accepted shortfall vs. the quoted output
         router_address (str): PancakeSwap-compatible router
     """
-    wallet = get_wallet()
-
+    pool = get_wallet_pool()
+    # value + the swap's gas budget; pool wallets only hold gas money, so
+    # larger swaps are sent from the home wallet
+    spend = web3.to_wei(amount_bnb, "ether") + 250000 * web3.to_wei("5", "gwei")
+    with pool.acquire(spend=spend) as wallet:
+        try:
+            return _swap_exact_eth_for_tokens(
+                wallet,
+                pool.home.address,
+                token_out,
+                amount_bnb,
+                slippage_percent,
+                router_address,
+            )
+        except Exception:
+            # A reserved nonce may not have been used; re-sync it next time
+            wallet.reset_nonce()
+            raise
+
+
+def _swap_exact_eth_for_tokens(
+    wallet, recipient, token_out, amount_bnb, slippage_percent, router_address
+):
     router = web3.eth.contract(
-        address=Web3.to_checksum_address(router_address),
-        abi=json.loads(
-            """[
-              {
-                "name": "swapExactETHForTokens",
-                "type": "function",
-                "stateMutability": "payable",
-                "inputs": [
-                  {"name": "amountOutMin", "type": "uint256"},
-                  {"name": "path", "type": "address[]"},
-                  {"name": "to", "type": "address"},
-                  {"name": "deadline", "type": "uint256"}
-                ],
-                "outputs": [{"name": "amounts", "type": "uint256[]"}]
-              }
-            ]"""
-        ),
+        address=Web3.to_checksum_address(router_address), abi=SWAP_ETH_ABI
     )
 
     logging.info(
@@ -79,12 +420,27 @@ def perform_swap(token_out, amount_bnb, slippage_percent, router_address):
     deadline = int(time.time()) + 600  # 10 minutes from now
 
     # BNB must be converted to WBNB for routing inside smart contracts
-    path = [WBNB, Web3.to_checksum_address(token_out)]
+    path = find_route(
+        WBNB, Web3.to_checksum_address(token_out), amount_in_wei, router_address
+    )
+
+    # The quote ignores transfer fees, so take them off before the slippage
+    path_metadata = tokens.get_many(path[1:]).values()
+    expected_out = quote_amounts_out(amount_in_wei, path, router_address)[-1]
+    expected_out = after_transfer_fees(expected_out, path_metadata)
+    amount_out_min = min_amount_out(expected_out, slippage_percent)
 
-    txn = router.functions.swapExactETHForTokens(
-        0,  # TODO: implement slippage-based minOut
+    # Fee-on-transfer tokens need the variant that checks balances instead
+    # of the amounts computed up front
+    if any(metadata.fee_on_transfer for metadata in path_metadata):
+        swap_fn = router.functions.swapExactETHForTokensSupportingFeeOnTransferTokens
+    else:
+        swap_fn = router.functions.swapExactETHForTokens
+
+    txn = swap_fn(
+        amount_out_min,
         path,
-        wallet.address,
+        recipient,
         deadline,
     ).build_transaction(
         {
@@ -92,10 +448,14 @@ def perform_swap(token_out, amount_bnb, slippage_percent, router_address):
             "value": amount_in_wei,
             "gas": 250000,
             "gasPrice": web3.to_wei("5", "gwei"),
-            "nonce": web3.eth.get_transaction_count(wallet.address),
+            "nonce": wallet.next_nonce(),
         }
     )
 
+    if ENABLE_SIMULATION:
+        intent = (wallet.address, tuple(path), amount_in_wei, amount_out_min, recipient)
+        apply_simulation(txn, simulator.simulate(txn, current_block_number(), intent))
+
     signed_txn = web3.eth.account.sign_transaction(txn, private_key=wallet.key)
     tx_hash = web3.eth.send_raw_transaction(
         getattr(signed_txn, "rawTransaction", getattr(signed_txn, "raw_transaction"))
@@ -107,103 +467,100 @@ def perform_swap(token_out, amount_bnb, slippage_percent, router_address):
 
 
 def perform_token_to_token_swap(
-    token_in, token_out, amount_in, slippage_percent, router_address
+    token_in, token_out, amount_in, slippage_percent, router_address, before_send=None
 ):
     """
     Swaps token_in → token_out using swapExactTokensForTokens.
 
     Notes:
-    - Will insert WBNB into the path automatically if neither token is WBNB.
-    - Requires token_in to be approved for router first.
+    - Sent from the pool's home wallet, which holds the token balances.
+    - amount_in is converted with token_in's decimals from the token registry.
+    - Paths touching fee-on-transfer tokens use the
+      ...SupportingFeeOnTransferTokens router variant.
+    - Routes through the best-output path of up to ROUTE_MAX_HOPS pairs
+      (WBNB is inserted automatically while the pair graph is indexing).
+    - Approves the router for token_in only when the cached allowance is
+      too small (see allowance.py), so repeat swaps are a single transaction.
 
     Args:
         token_in (str): Input token (BEP-20)
         token_out (str): Output token (BEP-20)
         amount_in (float): Amount of token_in to swap
-        slippage_percent (float): Not yet implemented (minOut = 0)
+        slippage_percent (float): Max accepted shortfall vs. the quoted output
         router_address (str): PancakeSwap-compatible router
+        before_send (callable | None): Called with the signed swap's tx hash
+            right before it is broadcast, e.g. to persist it first
     """
-    wallet = get_wallet()
-
+    with get_wallet_pool().acquire(index=0) as wallet:
+        try:
+            return _swap_exact_tokens_for_tokens(
+                wallet,
+                token_in,
+                token_out,
+                amount_in,
+                slippage_percent,
+                router_address,
+                before_send,
+            )
+        except Exception:
+            wallet.reset_nonce()
+            raise
+
+
+def _swap_exact_tokens_for_tokens(
+    wallet,
+    token_in,
+    token_out,
+    amount_in,
+    slippage_percent,
+    router_address,
+    before_send=None,
+):
     token_in = Web3.to_checksum_address(token_in)
     token_out = Web3.to_checksum_address(token_out)
     router_address = Web3.to_checksum_address(router_address)
 
     # Router contract setup
-    router = web3.eth.contract(
-        address=router_address,
-        abi=json.loads(
-            """[
-              {
-                "name": "swapExactTokensForTokens",
-                "type": "function",
-                "inputs": [
-                  {"name": "amountIn", "type": "uint256"},
-                  {"name": "amountOutMin", "type": "uint256"},
-                  {"name": "path", "type": "address[]"},
-                  {"name": "to", "type": "address"},
-                  {"name": "deadline", "type": "uint256"}
-                ],
-                "outputs": [{"name": "amounts", "type": "uint256[]"}],
-                "stateMutability": "nonpayable",
-                "type": "function"
-              }
-            ]"""
-        ),
-    )
-
-    # ERC20 ABI for approval
-    erc20_abi = json.loads(
-        """[
-          {
-            "constant": false,
-            "inputs": [
-              {"name": "spender", "type": "address"},
-              {"name": "amount", "type": "uint256"}
-            ],
-            "name": "approve",
-            "outputs": [{"name": "", "type": "bool"}],
-            "type": "function"
-          }
-        ]"""
-    )
+    router = web3.eth.contract(address=router_address, abi=SWAP_TOKENS_ABI)
 
-    token_contract = web3.eth.contract(address=token_in, abi=erc20_abi)
-    amount_in_wei = web3.to_wei(amount_in, "ether")
+    # Convert with token_in's own decimals (not every BEP-20 uses 18)
+    token_in_decimals = tokens.get(token_in).decimals
+    amount_in_wei = to_base_units(amount_in, token_in_decimals)
+    gas_price = web3.to_wei("5", "gwei")
     deadline = int(time.time()) + 600
 
-    # Route via WBNB if direct pair doesn't exist (common case)
-    if token_in != WBNB and token_out != WBNB:
-        path = [token_in, WBNB, token_out]
-    else:
-        path = [token_in, token_out]
-
-    # Step 1: Approve router to spend tokens
-    nonce = web3.eth.get_transaction_count(wallet.address)
-    approval_txn = token_contract.functions.approve(
-        router_address, amount_in_wei
-    ).build_transaction(
-        {
-            "from": wallet.address,
-            "gas": 100000,
-            "gasPrice": web3.to_wei("5", "gwei"),
-            "nonce": nonce,
-        }
-    )
-
-    signed_approval = web3.eth.account.sign_transaction(
-        approval_txn, private_key=wallet.key
-    )
-    raw_approval = getattr(
-        signed_approval, "rawTransaction", getattr(signed_approval, "raw_transaction")
+    path = find_route(token_in, token_out, amount_in_wei, router_address)
+
+    # The quote ignores transfer fees, so take them off before the slippage
+    path_metadata = tokens.get_many(path).values()
+    expected_out = quote_amounts_out(amount_in_wei, path, router_address)[-1]
+    expected_out = after_transfer_fees(expected_out, path_metadata)
+    amount_out_min = min_amount_out(expected_out, slippage_percent)
+
+    # Step 1: Approve router to spend tokens, unless the cached allowance
+    # already covers this swap
+    nonce = wallet.next_nonce()
+    approval_tx = allowances.ensure_allowance(
+        wallet,
+        token_in,
+        router_address,
+        amount_in_wei,
+        nonce,
+        gas_price,
+        decimals=token_in_decimals,
     )
-    web3.eth.send_raw_transaction(raw_approval)
-    logging.info("✅ Approved router to spend token_in")
+    if approval_tx is not None:
+        nonce = wallet.next_nonce()
 
     # Step 2: Execute token swap
-    swap_txn = router.functions.swapExactTokensForTokens(
+    if any(metadata.fee_on_transfer for metadata in path_metadata):
+        swap_fn = router.functions.swapExactTokensForTokensSupportingFeeOnTransferTokens
+    else:
+        swap_fn = router.functions.swapExactTokensForTokens
+
+    swap_txn = swap_fn(
         amount_in_wei,
-        0,  # TODO: add slippage-based minOut
+        amount_out_min,
         path,
         wallet.address,
         deadline,
@@ -211,17 +568,34 @@ def perform_token_to_token_swap(
         {
             "from": wallet.address,
             "gas": 300000,
-            "gasPrice": web3.to_wei("5", "gwei"),
-            "nonce": nonce + 1,
+            "gasPrice": gas_price,
+            "nonce": nonce,
         }
     )
 
+    # A just-sent approval is not visible to eth_call yet, so that first
+    # swap keeps the fixed gas limit instead of being simulated
+    if ENABLE_SIMULATION and approval_tx is None:
+        intent = (wallet.address, tuple(path), amount_in_wei, amount_out_min)
+        apply_simulation(
+            swap_txn, simulator.simulate(swap_txn, current_block_number(), intent)
+        )
+
     signed_swap = web3.eth.account.sign_transaction(swap_txn, private_key=wallet.key)
     raw_swap = getattr(
         signed_swap, "rawTransaction", getattr(signed_swap, "raw_transaction")
     )
+    if before_send is not None:
+        before_send(web3.to_hex(signed_swap.hash))
+
+    try:
+        tx_hash = web3.eth.send_raw_transaction(raw_swap)
+    except Exception:
+        # The approval may or may not have landed; re-read it next time
+        allowances.invalidate(token_in, wallet.address, router_address)
+        raise
+    allowances.record_spend(token_in, wallet.address, router_address, amount_in_wei)
 
-    tx_hash = web3.eth.send_raw_transaction(raw_swap)
     tx_hex = web3.to_hex(tx_hash)
     logging.info(f"✅ Token swap submitted: https://testnet.bscscan.com/tx/{tx_hex}")
     return tx_hex
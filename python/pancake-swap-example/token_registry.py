@@ -0,0 +1,214 @@
+"""
+token_registry.py - Cached BEP-20 metadata (decimals, symbol, fee-on-transfer)
+
+Token metadata never changes after deployment, so it is fetched once - in
+bulk through Multicall3 - persisted to a JSON file, and served from memory
+on the swap path. A restarted server therefore needs no RPC calls at all for
+tokens it has seen before.
+
+Fee-on-transfer tokens cannot be detected from a plain read call. A token is
+flagged when it is listed in FEE_ON_TRANSFER_TOKENS, or when one of the fee
+getters used by common reflection/tax token templates returns a fee above
+zero. Those templates report their tax and liquidity fees in percent, which
+is kept as transfer_fee_bps so quotes can be discounted by the fee; tokens
+with no readable rate fall back to DEFAULT_TRANSFER_FEE_PERCENT.
+"""
+
+import os
+import json
+import logging
+import threading
+from decimal import Decimal
+from typing import NamedTuple
+from web3 import Web3
+from multicall import aggregate, selector, decode_uints
+
+TOKEN_CACHE_PATH = os.getenv(
+    "TOKEN_CACHE_PATH", os.path.join(os.path.dirname(__file__), ".token_cache.json")
+)
+
+
+
+def _parse_fee_tokens(value):
+    """Parses "0xToken[:fee percent],..." into {token: fee bps or None}."""
+    fee_tokens = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        token, _, percent = entry.partition(":")
+        fee_tokens[Web3.to_checksum_address(token.strip())] = (
+            int(Decimal(percent) * 100) if percent.strip() else None
+        )
+    return fee_tokens
+
+
+# Comma-separated token addresses to always treat as fee-on-transfer,
+# optionally with their transfer fee in percent (0xToken:5)
+FEE_ON_TRANSFER_TOKENS = _parse_fee_tokens(os.getenv("FEE_ON_TRANSFER_TOKENS", ""))
+# Transfer fee assumed for fee-on-transfer tokens whose rate is unknown
+DEFAULT_TRANSFER_FEE_PERCENT = Decimal(os.getenv("DEFAULT_TRANSFER_FEE_PERCENT", 10))
+
+DECIMALS = selector("decimals()")
+SYMBOL = selector("symbol()")
+# Fee getters of common tax token templates; rate getters report percent,
+# totalFees() (fees collected so far) only shows that a fee is charged
+RATE_GETTERS = [selector(s) for s in ("_taxFee()", "taxFee()", "_liquidityFee()")]
+FEE_GETTERS = RATE_GETTERS + [selector("totalFees()")]
+
+
+class TokenMetadata(NamedTuple):
+    decimals: int
+    symbol: str
+    fee_on_transfer: bool
+    transfer_fee_bps: int = 0  # fee per transfer; 0 when unknown
+
+
+def _decode_symbol(data):
+    """Decodes string or legacy bytes32 symbol() return data."""
+    if not data:
+        return "?"
+    data = bytes(data)
+    if len(data) == 32:
+        return data.rstrip(b"\x00").decode("utf-8", "replace")
+    length = decode_uints(data[32:64])[0]
+    return data[64 : 64 + length].decode("utf-8", "replace")
+
+
+def _charges_fee(data):
+    """Whether a fee getter answered with a non-zero fee."""
+    return bool(data) and decode_uints(data)[0] > 0
+
+
+def _fee_bps(fee_probes):
+    """
+    Transfer fee (bps) read from the rate getters: the tax fee (_taxFee or
+    taxFee) plus the liquidity fee. Values above 100 are not percentages and
+    are ignored.
+    """
+    tax_fee, legacy_tax_fee, liquidity_fee = [
+        decode_uints(data)[0] if data else 0
+        for data in fee_probes[: len(RATE_GETTERS)]
+    ]
+    percent = sum(
+        fee for fee in (tax_fee or legacy_tax_fee, liquidity_fee) if fee <= 100
+    )
+    return min(percent, 100) * 100
+
+
+def transfer_fee_bps(metadata):
+    """Fee (bps) one transfer of the token loses; 0 for plain tokens."""
+    if not metadata.fee_on_transfer:
+        return 0
+    return metadata.transfer_fee_bps or int(DEFAULT_TRANSFER_FEE_PERCENT * 100)
+
+
+def after_transfer_fees(amount, path_metadata):
+    """
+    What is left of a quoted amount once every fee-on-transfer token of the
+    path has taken its fee (each token of a swap path is transferred once).
+    """
+    for metadata in path_metadata:
+        amount = amount * (10000 - transfer_fee_bps(metadata)) // 10000
+    return amount
+
+
+def to_base_units(amount, decimals):
+    """Converts a human amount (e.g. 1.5) to integer base units."""
+    return int(Decimal(str(amount)) * 10**decimals)
+
+
+def from_base_units(amount, decimals):
+    """Converts integer base units back to a human-readable float."""
+    return float(Decimal(amount) / 10**decimals)
+
+
+class TokenRegistry:
+    """In-memory token metadata backed by an on-disk JSON cache."""
+
+    def __init__(self, web3, cache_path=TOKEN_CACHE_PATH):
+        self.web3 = web3
+        self.cache_path = cache_path
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                for token, fields in json.load(f).items():
+                    metadata = TokenMetadata(**fields)
+                    if token in FEE_ON_TRANSFER_TOKENS:
+                        metadata = metadata._replace(
+                            fee_on_transfer=True,
+                            transfer_fee_bps=FEE_ON_TRANSFER_TOKENS[token]
+                            or metadata.transfer_fee_bps,
+                        )
+                    self._tokens[token] = metadata
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable token cache {self.cache_path}: {e}")
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({t: m._asdict() for t, m in self._tokens.items()}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def lookup(self, tokens):
+        """
+        Returns ({token: TokenMetadata}, {token: error message}), fetching
+        unknown tokens in one batch. Tokens that do not answer decimals()
+        (not a BEP-20) are reported in the errors instead of raising.
+        """
+        tokens = [Web3.to_checksum_address(token) for token in tokens]
+        missing = sorted({token for token in tokens if token not in self._tokens})
+        errors = self._fetch(missing) if missing else {}
+        metadata = {
+            token: self._tokens[token] for token in tokens if token not in errors
+        }
+        return metadata, errors
+
+    def get_many(self, tokens):
+        """
+        Returns {token: TokenMetadata}, fetching unknown tokens in one batch.
+
+        Raises:
+            ValueError: If a token does not answer decimals() (not a BEP-20).
+        """
+        metadata, errors = self.lookup(tokens)
+        if errors:
+            raise ValueError(next(iter(errors.values())))
+        return metadata
+
+    def get(self, token):
+        return self.get_many([token])[Web3.to_checksum_address(token)]
+
+    def _fetch(self, tokens):
+        """Fetches and caches metadata; returns {token: error} for failures."""
+        probes = [DECIMALS, SYMBOL] + FEE_GETTERS
+        calls = [(token, probe) for token in tokens for probe in probes]
+        results = aggregate(self.web3, calls)
+
+        fetched, errors = {}, {}
+        for i, token in enumerate(tokens):
+            decimals, symbol, *fee_probes = results[
+                i * len(probes) : (i + 1) * len(probes)
+            ]
+            if not decimals:
+                errors[token] = f"{token} does not look like a BEP-20 token"
+                continue
+            fetched[token] = TokenMetadata(
+                decimals=decode_uints(decimals)[0],
+                symbol=_decode_symbol(symbol),
+                fee_on_transfer=token in FEE_ON_TRANSFER_TOKENS
+                or any(_charges_fee(probe) for probe in fee_probes),
+                transfer_fee_bps=FEE_ON_TRANSFER_TOKENS.get(token)
+                or _fee_bps(fee_probes),
+            )
+
+        if fetched:
+            with self._lock:
+                self._tokens.update(fetched)
+                self._save()
+        return errors
@@ -0,0 +1,223 @@
+"""
+tx_tracker.py - Block-driven confirmation tracking for submitted swaps
+
+Instead of polling eth_getTransactionReceipt once per hash, TxTracker
+follows new blocks and resolves every pending hash in a single pass per
+block: one eth_getBlockReceipts call returns all receipts of the block, and
+any pending hash found in it is marked "success" or "failed". A swap can be
+mined before its hash is tracked, so tracking rescans from the last block
+already processed. A hash is only reported "dropped" after TRACKER_TIMEOUT
+once the node has neither a receipt for it nor the transaction itself; a
+transaction still waiting in the mempool stays pending.
+
+Resolved statuses are kept (bounded) for the /tx/<hash> endpoint and pushed
+to every subscriber queue, which backs the /tx/stream SSE feed.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+# Seconds between checks for a new block
+TRACKER_POLL_INTERVAL = float(os.getenv("TRACKER_POLL_INTERVAL", 1))
+# Seconds after which a hash that never showed up is reported as dropped
+TRACKER_TIMEOUT = float(os.getenv("TRACKER_TIMEOUT", 900))
+# Resolved statuses remembered for /tx/<hash>
+TRACKER_HISTORY = int(os.getenv("TRACKER_HISTORY", 10000))
+
+
+def _method_not_found(error):
+    """Whether an RPC error means the node does not implement the method."""
+    details = getattr(error, "rpc_response", None) or (
+        error.args[0] if error.args else None
+    )
+    if isinstance(details, dict):
+        details = details.get("error", details)
+        if isinstance(details, dict) and details.get("code") == -32601:
+            return True
+    message = str(error).lower()
+    return any(
+        phrase in message
+        for phrase in ("method not found", "does not exist", "not supported")
+    )
+
+
+class TxTracker:
+    """Resolves pending transaction hashes from whole-block receipt fetches."""
+
+    def __init__(self, web3):
+        self.web3 = web3
+        self._pending = {}  # tx hash -> submitted_at
+        self._resolved = OrderedDict()  # tx hash -> status dict
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last_block = None
+        self._rescan_from = None  # earliest block to revisit for new hashes
+        self._thread = None
+        self._block_receipts_supported = True
+
+    @property
+    def last_block(self):
+        """Newest block processed so far (None before the first poll)."""
+        return self._last_block
+
+    def track(self, tx_hash, from_block=None):
+        """
+        Starts watching a submitted transaction.
+
+        Args:
+            from_block (int | None): First block it may be in, e.g. last_block
+                read before sending; defaults to the last block processed
+        """
+        with self._lock:
+            self._pending[tx_hash.lower()] = time.time()
+            if from_block is None:
+                from_block = self._last_block
+            if from_block is not None:
+                self._rescan_from = min(self._rescan_from or from_block, from_block)
+
+    def status(self, tx_hash):
+        """Returns the status dict of a tracked hash, or None if unknown."""
+        tx_hash = tx_hash.lower()
+        with self._lock:
+            if tx_hash in self._resolved:
+                return self._resolved[tx_hash]
+            if tx_hash in self._pending:
+                return {"tx_hash": tx_hash, "status": "pending"}
+        return None
+
+    def subscribe(self):
+        """Returns a queue that receives every resolved status from now on."""
+        subscriber = queue.Queue(maxsize=1000)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _resolve(self, tx_hash, status):
+        with self._lock:
+            self._pending.pop(tx_hash, None)
+            self._resolved[tx_hash] = status
+            while len(self._resolved) > TRACKER_HISTORY:
+                self._resolved.popitem(last=False)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(status)
+            except queue.Full:
+                # A stalled client must not block the tracker
+                pass
+
+    def _block_receipts(self, block_number):
+        if self._block_receipts_supported:
+            try:
+                return self.web3.eth.get_block_receipts(block_number)
+            except Exception as e:
+                # Other errors (timeouts, rate limits) fail this poll only and
+                # the block is retried
+                if not _method_not_found(e):
+                    raise
+                logging.info(f"eth_getBlockReceipts unavailable ({e}), falling back")
+                self._block_receipts_supported = False
+        # Fallback: only fetch receipts for our hashes that are in the block
+        block = self.web3.eth.get_block(block_number)
+        with self._lock:
+            ours = [
+                tx for tx in block["transactions"] if Web3.to_hex(tx) in self._pending
+            ]
+        return [self.web3.eth.get_transaction_receipt(tx) for tx in ours]
+
+    def _resolve_receipt(self, receipt):
+        tx_hash = Web3.to_hex(receipt["transactionHash"])
+        self._resolve(
+            tx_hash,
+            {
+                "tx_hash": tx_hash,
+                "status": "success" if receipt["status"] == 1 else "failed",
+                "block_number": receipt["blockNumber"],
+                "gas_used": receipt["gasUsed"],
+            },
+        )
+
+    def process_block(self, block_number):
+        """Resolves every pending hash included in one block."""
+        with self._lock:
+            if not self._pending:
+                return 0
+        resolved = 0
+        for receipt in self._block_receipts(block_number):
+            tx_hash = Web3.to_hex(receipt["transactionHash"])
+            with self._lock:
+                if tx_hash not in self._pending:
+                    continue
+            self._resolve_receipt(receipt)
+            resolved += 1
+        return resolved
+
+    def _expire(self):
+        cutoff = time.time() - TRACKER_TIMEOUT
+        with self._lock:
+            expired = [h for h, ts in self._pending.items() if ts < cutoff]
+        for tx_hash in expired:
+            # Mined in a block that was not scanned for it
+            try:
+                receipt = self.web3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                receipt = None
+            if receipt is not None:
+                self._resolve_receipt(receipt)
+                continue
+            # Still in the mempool (or mined since): keep waiting, as a
+            # dropped swap may be sent again
+            try:
+                known = self.web3.eth.get_transaction(tx_hash) is not None
+            except TransactionNotFound:
+                known = False
+            if known:
+                with self._lock:
+                    if tx_hash in self._pending:
+                        self._pending[tx_hash] = time.time()
+            else:
+                self._resolve(tx_hash, {"tx_hash": tx_hash, "status": "dropped"})
+
+    def start(self):
+        """Follows new blocks in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                head = self.web3.eth.block_number
+                with self._lock:
+                    if self._last_block is None:
+                        self._last_block = head - 1
+                    start = self._last_block + 1
+                    if self._rescan_from is not None:
+                        start = min(start, self._rescan_from)
+                for block_number in range(start, head + 1):
+                    self.process_block(block_number)
+                    # Cursors only move past processed blocks, so a failed
+                    # poll resumes where it stopped
+                    with self._lock:
+                        self._last_block = max(self._last_block, block_number)
+                        if self._rescan_from == block_number:
+                            self._rescan_from = (
+                                block_number + 1
+                                if block_number < self._last_block
+                                else None
+                            )
+                self._expire()
+            except Exception as e:
+                logging.warning(f"Transaction tracker poll failed: {e}")
+            time.sleep(TRACKER_POLL_INTERVAL)
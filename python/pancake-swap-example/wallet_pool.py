@@ -0,0 +1,323 @@
+"""
+wallet_pool.py - Pool of mnemonic-derived wallets for parallel swaps
+
+A single account serialises every swap on one nonce sequence. WalletPool
+derives WALLET_POOL_SIZE accounts (m/44'/60'/0'/0/0 … /N-1) and hands each
+swap a free one, so independent swaps are signed and submitted concurrently.
+
+- Every wallet keeps a local nonce counter, seeded once from the node's
+  pending transaction count, so consecutive swaps from the same wallet do
+  not wait for inclusion or re-query the nonce.
+- Index 0 is the "home" wallet: it holds the token balances, receives swap
+  output and funds the others. A background rebalancer tops pool wallets
+  back up to POOL_TARGET_BALANCE_BNB whenever they drop below
+  POOL_MIN_BALANCE_BNB, at most one top-up per wallet in flight.
+- A swap that spends more BNB (value + gas) than the pool wallet it was
+  given holds falls back to the home wallet.
+
+AsyncWalletPool is the same pool for an AsyncWeb3 client (async_swapper.py).
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from web3.exceptions import TransactionNotFound
+from wallet_utils import get_wallets
+
+WALLET_POOL_SIZE = int(os.getenv("WALLET_POOL_SIZE", 1))
+POOL_MIN_BALANCE_BNB = float(os.getenv("POOL_MIN_BALANCE_BNB", 0.02))
+POOL_TARGET_BALANCE_BNB = float(os.getenv("POOL_TARGET_BALANCE_BNB", 0.1))
+POOL_REBALANCE_INTERVAL = float(os.getenv("POOL_REBALANCE_INTERVAL", 30))
+
+
+class PooledWallet:
+    """A derived account plus its locally tracked nonce."""
+
+    def __init__(self, web3, index, account):
+        self.web3 = web3
+        self.index = index
+        self.account = account
+        self.address = account.address
+        self.key = account.key
+        self._nonce = None
+
+    def next_nonce(self):
+        """Reserves the next nonce, syncing from the node only when unknown."""
+        if self._nonce is None:
+            self._nonce = self.web3.eth.get_transaction_count(self.address, "pending")
+        nonce = self._nonce
+        self._nonce += 1
+        return nonce
+
+    def reset_nonce(self):
+        """Forces a re-sync from the node, e.g. after a failed submission."""
+        self._nonce = None
+
+
+class AsyncPooledWallet(PooledWallet):
+    """PooledWallet whose nonce is seeded through an AsyncWeb3 client."""
+
+    async def next_nonce(self):
+        if self._nonce is None:
+            self._nonce = await self.web3.eth.get_transaction_count(
+                self.address, "pending"
+            )
+        nonce = self._nonce
+        self._nonce += 1
+        return nonce
+
+
+class WalletPool:
+    """Hands out free wallets and keeps them funded for gas."""
+
+    def __init__(self, web3, size=WALLET_POOL_SIZE):
+        self.web3 = web3
+        self.wallets = [
+            PooledWallet(web3, index, account)
+            for index, account in enumerate(get_wallets(max(size, 1)))
+        ]
+        self.home = self.wallets[0]
+        self._free = set(range(len(self.wallets)))
+        self._available = threading.Condition()
+        self._rebalancer = None
+        self._top_ups = {}  # wallet index -> hash of its last top-up
+
+    def _take(self, index, timeout):
+        with self._available:
+            ready = self._available.wait_for(
+                lambda: (index in self._free) if index is not None else self._free,
+                timeout=timeout,
+            )
+            if not ready:
+                raise TimeoutError("No free wallet in the swap pool")
+            # Prefer non-home wallets so the home wallet stays free for
+            # token swaps and funding
+            chosen = index if index is not None else max(self._free)
+            self._free.remove(chosen)
+        return chosen
+
+    def _release(self, index):
+        with self._available:
+            self._free.add(index)
+            self._available.notify_all()
+
+    @contextmanager
+    def acquire(self, index=None, timeout=None, spend=0):
+        """
+        Exclusively borrows a wallet for one swap.
+
+        Args:
+            index (int | None): Specific wallet to wait for (0 = home wallet),
+                or None for any free wallet
+            timeout (float | None): Seconds to wait before raising TimeoutError
+            spend (int): Wei the transaction needs (value + gas); a pool
+                wallet with less than that is swapped for the home wallet
+        """
+        chosen = self._take(index, timeout)
+        try:
+            short = (
+                spend
+                and chosen != 0
+                and self.web3.eth.get_balance(self.wallets[chosen].address, "pending")
+                < spend
+            )
+        except BaseException:
+            self._release(chosen)
+            raise
+        if short:
+            self._release(chosen)
+            chosen = self._take(0, timeout)
+        try:
+            yield self.wallets[chosen]
+        finally:
+            self._release(chosen)
+
+    def _top_up_pending(self, wallet):
+        """Whether the wallet's last top-up is still waiting to be mined."""
+        tx_hash = self._top_ups.get(wallet.index)
+        if tx_hash is None:
+            return False
+        try:
+            self.web3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            try:
+                # No receipt yet: in flight while the node still knows it
+                return self.web3.eth.get_transaction(tx_hash) is not None
+            except TransactionNotFound:
+                pass
+        del self._top_ups[wallet.index]
+        return False
+
+    def rebalance(self):
+        """Tops up pool wallets whose BNB balance fell below the minimum."""
+        minimum = self.web3.to_wei(POOL_MIN_BALANCE_BNB, "ether")
+        target = self.web3.to_wei(POOL_TARGET_BALANCE_BNB, "ether")
+        for wallet in self.wallets[1:]:
+            if self._top_up_pending(wallet):
+                continue
+            balance = self.web3.eth.get_balance(wallet.address)
+            if balance >= minimum:
+                continue
+            with self.acquire(index=0) as home:
+                txn = {
+                    "from": home.address,
+                    "to": wallet.address,
+                    "value": target - balance,
+                    "gas": 21000,
+                    "gasPrice": self.web3.to_wei("5", "gwei"),
+                    "nonce": home.next_nonce(),
+                    "chainId": self.web3.eth.chain_id,
+                }
+                signed = self.web3.eth.account.sign_transaction(txn, home.key)
+                try:
+                    tx_hash = self.web3.eth.send_raw_transaction(
+                        getattr(
+                            signed, "rawTransaction", getattr(signed, "raw_transaction")
+                        )
+                    )
+                except Exception:
+                    home.reset_nonce()
+                    raise
+                self._top_ups[wallet.index] = tx_hash
+            logging.info(
+                f"⛽ Topped up pool wallet #{wallet.index} {wallet.address} "
+                f"with {self.web3.from_wei(target - balance, 'ether')} BNB"
+            )
+
+    def start_rebalancer(self):
+        """Runs rebalance() every POOL_REBALANCE_INTERVAL seconds in the background."""
+        if self._rebalancer is not None or len(self.wallets) == 1:
+            return
+        self._rebalancer = threading.Thread(target=self._rebalance_loop, daemon=True)
+        self._rebalancer.start()
+
+    def _rebalance_loop(self):
+        while True:
+            try:
+                self.rebalance()
+            except Exception as e:
+                logging.warning(f"Wallet pool rebalance failed: {e}")
+            time.sleep(POOL_REBALANCE_INTERVAL)
+
+
+class AsyncWalletPool(WalletPool):
+    """WalletPool for asyncio servers: awaitable acquire and rebalancing."""
+
+    def __init__(self, web3, size=WALLET_POOL_SIZE):
+        super().__init__(web3, size)
+        self.wallets = [
+            AsyncPooledWallet(web3, wallet.index, wallet.account)
+            for wallet in self.wallets
+        ]
+        self.home = self.wallets[0]
+        self._available = asyncio.Condition()
+
+    async def _take(self, index, timeout):
+        def ready():
+            return (index in self._free) if index is not None else self._free
+
+        async with self._available:
+            try:
+                await asyncio.wait_for(self._available.wait_for(ready), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError("No free wallet in the swap pool")
+            chosen = index if index is not None else max(self._free)
+            self._free.remove(chosen)
+        return chosen
+
+    async def _release(self, index):
+        async with self._available:
+            self._free.add(index)
+            self._available.notify_all()
+
+    @asynccontextmanager
+    async def acquire(self, index=None, timeout=None, spend=0):
+        chosen = await self._take(index, timeout)
+        try:
+            short = (
+                spend
+                and chosen != 0
+                and await self.web3.eth.get_balance(
+                    self.wallets[chosen].address, "pending"
+                )
+                < spend
+            )
+        except BaseException:
+            await self._release(chosen)
+            raise
+        if short:
+            await self._release(chosen)
+            chosen = await self._take(0, timeout)
+        try:
+            yield self.wallets[chosen]
+        finally:
+            await self._release(chosen)
+
+    async def _top_up_pending(self, wallet):
+        tx_hash = self._top_ups.get(wallet.index)
+        if tx_hash is None:
+            return False
+        try:
+            await self.web3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            try:
+                return await self.web3.eth.get_transaction(tx_hash) is not None
+            except TransactionNotFound:
+                pass
+        del self._top_ups[wallet.index]
+        return False
+
+    async def rebalance(self):
+        minimum = self.web3.to_wei(POOL_MIN_BALANCE_BNB, "ether")
+        target = self.web3.to_wei(POOL_TARGET_BALANCE_BNB, "ether")
+        chain_id = await self.web3.eth.chain_id
+        for wallet in self.wallets[1:]:
+            if await self._top_up_pending(wallet):
+                continue
+            balance = await self.web3.eth.get_balance(wallet.address)
+            if balance >= minimum:
+                continue
+            async with self.acquire(index=0) as home:
+                txn = {
+                    "from": home.address,
+                    "to": wallet.address,
+                    "value": target - balance,
+                    "gas": 21000,
+                    "gasPrice": self.web3.to_wei("5", "gwei"),
+                    "nonce": await home.next_nonce(),
+                    "chainId": chain_id,
+                }
+                signed = self.web3.eth.account.sign_transaction(txn, home.key)
+                try:
+                    tx_hash = await self.web3.eth.send_raw_transaction(
+                        getattr(
+                            signed, "rawTransaction", getattr(signed, "raw_transaction")
+                        )
+                    )
+                except Exception:
+                    home.reset_nonce()
+                    raise
+                self._top_ups[wallet.index] = tx_hash
+            logging.info(
+                f"⛽ Topped up pool wallet #{wallet.index} {wallet.address} "
+                f"with {self.web3.from_wei(target - balance, 'ether')} BNB"
+            )
+
+    def start_rebalancer(self):
+        """Schedules rebalance() on the running event loop."""
+        if self._rebalancer is not None or len(self.wallets) == 1:
+            return
+        self._rebalancer = asyncio.get_running_loop().create_task(
+            self._rebalance_loop()
+        )
+
+    async def _rebalance_loop(self):
+        while True:
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logging.warning(f"Wallet pool rebalance failed: {e}")
+            await asyncio.sleep(POOL_REBALANCE_INTERVAL)
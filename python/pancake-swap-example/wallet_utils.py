@@ -1,16 +1,68 @@
 from eth_account import Account
+from eth_account.hdaccount import key_from_seed, seed_from_mnemonic
+import hashlib
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 Account.enable_unaudited_hdwallet_features()
 
+# BIP-44 path for EVM accounts; {index} selects the account in the wallet
+ACCOUNT_PATH = "m/44'/60'/0'/0/{index}"
+
+# BIP-39 seed derivation runs PBKDF2 with 2048 rounds, so derived accounts
+# are kept in process memory instead of being re-derived per swap. The cache
+# does not protect secrets: each account holds its private key, which is as
+# sensitive as the mnemonic. The seed (which unlocks every account) is
+# dropped right after derivation, and entries are keyed by a digest so the
+# cache does not keep a copy of the phrase itself.
+_account_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _mnemonic_digest(mnemonic):
+    return hashlib.sha256(mnemonic.encode("utf-8")).digest()
+
+
+def _derive(mnemonic, account_paths):
+    """Derives (or returns cached) accounts for each path of one mnemonic."""
+    digest = _mnemonic_digest(mnemonic)
+    with _cache_lock:
+        accounts = [_account_cache.get((digest, path)) for path in account_paths]
+        if all(accounts):
+            return accounts
+
+        seed = seed_from_mnemonic(mnemonic, "")
+        for i, path in enumerate(account_paths):
+            if accounts[i] is None:
+                accounts[i] = Account.from_key(key_from_seed(seed, path))
+                _account_cache[(digest, path)] = accounts[i]
+        return accounts
+
+
+def clear_wallet_cache():
+    """Drops every cached account (e.g. after rotating MNEMONIC)."""
+    with _cache_lock:
+        _account_cache.clear()
+
 
 # For Mnemonic Passphrase
-def get_wallet():
+def get_wallet(index=0):
+    mnemonic = os.getenv("MNEMONIC")
+    if not mnemonic:
+        raise ValueError("MNEMONIC not found in environment.")
+    return _derive(mnemonic, [ACCOUNT_PATH.format(index=index)])[0]
+
+
+# Derives several accounts (m/44'/60'/0'/0/i) from one seed, e.g. for a
+# multi-wallet swap pool. One seed derivation covers all of them.
+def get_wallets(count, start=0):
     mnemonic = os.getenv("MNEMONIC")
-    account = Account.from_mnemonic(mnemonic, account_path="m/44'/60'/0'/0/0")
-    return account
+    if not mnemonic:
+        raise ValueError("MNEMONIC not found in environment.")
+    paths = [ACCOUNT_PATH.format(index=i) for i in range(start, start + count)]
+    return _derive(mnemonic, paths)
 
 
 # For Private Key String (Private key is a 256-bit (32 bytes) random integer)